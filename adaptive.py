@@ -0,0 +1,140 @@
+import math
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+import engines
+from online_stats import OnlineStats
+
+# ========== 自适应样本量：置信区间足够窄时停止 ==========
+# 不再固定 rounds，而是按批模拟，每批之后计算三个指标的置信区间半宽：
+#   - 均值：z * s / sqrt(n)
+#   - 标准差：delta 方法，Var(s) ≈ (m4 - σ⁴) / (4 σ² n)，m4 为四阶中心矩
+#   - 坏结局概率：Wilson 区间
+# 全部指标都不超过各自的容差时停止；也可以设置时间预算 / 最大天数。
+# 下一批的天数按“半宽 ∝ 1/sqrt(n)”预估还需多少天（最多翻倍），难的问题多算，简单的问题少算。
+# 每批使用 SeedSequence(seed).spawn 出的子种子，同一 seed 的结果可复现。
+
+DEFAULT_TOLERANCE = {"mean": 0.1, "std": 0.1, "p_bad": 0.002}
+MIN_CHUNK = 10000
+MAX_ROUNDS = 100_000_000
+
+
+class _PowerSums:
+    """以 shift 为中心的 1~4 次幂和，用于计算四阶中心矩（shift 取首批均值以减少抵消误差）。"""
+    def __init__(self):
+        self.shift = None
+        self.n = 0
+        self.s = [0.0, 0.0, 0.0, 0.0]
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        if self.shift is None:
+            self.shift = float(values.mean()) if len(values) else 0.0
+        d = values - self.shift
+        d2 = d * d
+        self.s[0] += float(d.sum())
+        self.s[1] += float(d2.sum())
+        self.s[2] += float((d2 * d).sum())
+        self.s[3] += float((d2 * d2).sum())
+        self.n += len(values)
+
+    def central_m4(self):
+        n = self.n
+        e1, e2, e3, e4 = (x / n for x in self.s)
+        return e4 - 4 * e1 * e3 + 6 * e1 * e1 * e2 - 3 * e1 ** 4
+
+
+def half_widths(stats, sums, confidence=0.95):
+    """当前样本下均值、标准差、坏结局概率的置信区间半宽。"""
+    n = stats.count
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    var = stats.variance
+    hw_mean = z * math.sqrt(var / n)
+    if var > 0:
+        hw_std = z * math.sqrt(max(sums.central_m4() - var * var, 0.0) / (4 * var * n))
+    else:
+        hw_std = 0.0
+    p = stats.p_bad
+    hw_p = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return {"mean": hw_mean, "std": hw_std, "p_bad": hw_p}
+
+
+def _next_chunk(n, widths, tolerance, min_chunk):
+    """按半宽 ∝ 1/sqrt(n) 预估达到容差还需要的天数（至少 min_chunk，最多翻倍）。"""
+    ratio = max((widths[k] / tol) ** 2 for k, tol in tolerance.items())
+    need = int(math.ceil(n * ratio)) - n
+    return max(min_chunk, min(need, n))
+
+
+def run_adaptive(engine, tolerance=None, confidence=0.95, time_budget=None, max_rounds=MAX_ROUNDS,
+                 min_chunk=MIN_CHUNK, seed=None, workers=1, stats_kwargs=None, **kwargs):
+    """
+    按批运行引擎 engine（见 engines.ENGINES），直到置信区间足够窄，返回 (stats, report)。
+      - tolerance: {"mean": 半宽上限, "std": ..., "p_bad": ...}，缺省 DEFAULT_TOLERANCE；
+                   不关心的指标可以省略
+      - confidence: 置信水平
+      - time_budget: 最多运行的秒数（到时即停，即使未达到容差）
+      - max_rounds: 最多模拟的天数
+      - workers: >1 时每批用 parallel.run_parallel 多进程运行
+      - stats_kwargs: 传给 OnlineStats 的参数（坏结局阈值等）
+    report: rounds（实际天数）、chunks、elapsed、stopped_by（"tolerance" / "time_budget" / "max_rounds"）、
+            half_widths（各指标的置信区间半宽）
+    """
+    tolerance = dict(DEFAULT_TOLERANCE if tolerance is None else tolerance)
+    for k in tolerance:
+        if k not in DEFAULT_TOLERANCE:
+            raise ValueError(f"未知指标 {k}，可选 {', '.join(DEFAULT_TOLERANCE)}")
+        if tolerance[k] <= 0:
+            raise ValueError(f"{k} 的容差必须大于 0")
+    stats = OnlineStats(**(stats_kwargs or {}))
+    sums = _PowerSums()
+    root = np.random.SeedSequence(seed)
+    start = time.perf_counter()
+    chunk = min(min_chunk, max_rounds)
+    chunks = 0
+    stopped_by = "max_rounds"
+    widths = {}
+    while stats.count < max_rounds:
+        n = min(chunk, max_rounds - stats.count)
+        seed_seq = root.spawn(1)[0]
+        if workers > 1:
+            import parallel
+            values = parallel.run_parallel(engine, n, workers=workers,
+                                           seed=int(seed_seq.generate_state(1, dtype=np.uint64)[0]), **kwargs)
+        else:
+            values = engines.run_engine(engine, n, seed_seq, **kwargs)
+        stats.update(values)
+        sums.update(values)
+        chunks += 1
+
+        widths = half_widths(stats, sums, confidence)
+        if all(widths[k] <= tol for k, tol in tolerance.items()):
+            stopped_by = "tolerance"
+            break
+        if time_budget is not None and time.perf_counter() - start >= time_budget:
+            stopped_by = "time_budget"
+            break
+        chunk = _next_chunk(stats.count, widths, tolerance, min_chunk)
+
+    report = {
+        "rounds": stats.count,
+        "chunks": chunks,
+        "elapsed": time.perf_counter() - start,
+        "stopped_by": stopped_by,
+        "confidence": confidence,
+        "half_widths": widths,
+        "tolerance": tolerance,
+    }
+    return stats, report
+
+
+def format_report(stats, report):
+    """把 run_adaptive 的结果格式化为一行文字（还没有算出的半宽显示为 nan）。"""
+    hw = report["half_widths"]
+    hw = {k: hw.get(k, math.nan) for k in ("mean", "std", "p_bad")}
+    return (f"自适应仿真：{report['rounds']} 天（{report['chunks']} 批，{report['elapsed']:.2f}s，"
+            f"停止原因 {report['stopped_by']}）=> mean={stats.mean:.3f}±{hw['mean']:.3f}, "
+            f"std={stats.std:.3f}±{hw['std']:.3f}, P(坏结局)={stats.p_bad:.4f}±{hw['p_bad']:.4f} "
+            f"（{report['confidence']:.0%} 置信）")
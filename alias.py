@@ -0,0 +1,61 @@
+import random
+
+# ========== Walker / Vose 别名表：O(1) 离散抽样 ==========
+# random.choices 每次调用都要重建累计权重（O(n) 并分配列表）。
+# 别名表在权重确定时构建一次，之后每次抽样只需一个均匀随机数：
+#   u = random() * n，i = int(u)，若 u - i < prob[i] 取 i，否则取 alias[i]。
+
+
+class AliasTable:
+    def __init__(self, weights):
+        n = len(weights)
+        if n == 0:
+            raise ValueError("别名表至少需要 1 个选项")
+        if any(w < 0 for w in weights):
+            raise ValueError("别名表的权重不能为负")
+        total = float(sum(weights))
+        if total <= 0:
+            raise ValueError("别名表的权重之和必须大于 0")
+
+        scaled = [w * n / total for w in weights]
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, x in enumerate(scaled) if x < 1.0]
+        large = [i for i, x in enumerate(scaled) if x >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+        # 剩下的（含浮点误差导致的）都是“满格”
+        for i in small + large:
+            prob[i] = 1.0
+
+        self.n = n
+        self.prob = tuple(prob)
+        self.alias = tuple(alias)
+
+    def draw(self, rand=random.random):
+        """抽一个下标（只消耗一个均匀随机数，不分配内存）。"""
+        u = rand() * self.n
+        i = int(u)
+        if i >= self.n:
+            i = self.n - 1
+        return i if u - i < self.prob[i] else self.alias[i]
+
+    def draw_many(self, k, rng=None):
+        """
+        一次抽 k 个下标。rng 为 numpy Generator 时向量化抽样并返回数组，
+        否则使用全局 random 返回列表。
+        """
+        if rng is None:
+            return [self.draw() for _ in range(k)]
+        import numpy as np
+        u = rng.random(k) * self.n
+        i = np.minimum(u.astype(np.int64), self.n - 1)
+        return np.where(u - i < np.asarray(self.prob)[i], i, np.asarray(self.alias)[i])
@@ -0,0 +1,145 @@
+import numpy as np
+
+from compiler import FLAG_STATES
+from sim_state import BatchDayState
+
+# ========== 批量仿真引擎：一次模拟 N 天 ==========
+# 在 compiler.CompiledModel 上运行，与逐日循环等价：每个任务先按出现概率判断是否出现，
+# 再按选项概率抽选一个选项；选项的标志位（FLAG_PARTY / FLAG_REPLY）影响场景五。
+# 区别在于所有天数一起以数组形式计算，不再逐条调用 random。
+
+CHUNK_SIZE = 1 << 18   # 每批最多模拟的天数，限制单批内存
+
+
+def pick_options(u, probs):
+    """
+    按选项概率 probs，把 [0,1) 上的均匀数 u 映射为选项下标（逆CDF）。
+    与 random.choices 的做法一致：累计权重上二分查找。
+    """
+    cum = np.cumsum(np.asarray(probs, dtype=float))
+    cum /= cum[-1]
+    return np.minimum(np.searchsorted(cum, u, side="right"), len(cum) - 1)
+
+
+def _pick_task(model, i, u):
+    """第 i 个任务：把均匀数 u 映射为展平数组中的选项下标。"""
+    sl = model.task_options(i)
+    cum = model.cum_probs[sl]
+    return sl.start + np.minimum(np.searchsorted(cum, u, side="right"), len(cum) - 1)
+
+
+def draw_uniforms(model, n, rng):
+    """
+    一次抽出模拟 n 天所需的全部随机数（与 simulate_chunk 的抽取顺序相同）：
+      - appear / pick: 形状 (任务数, n)，每个任务的出现判定与选项抽选
+      - reply / sms_count / relieve: 场景五的回复抽选、短信条数、每条短信的缓解判定
+    同一份随机数可以交给不同参数的模型重复使用（公共随机数），
+    前提是模型的“形状”相同（见 draw_shape）。
+    """
+    appear = np.empty((len(model.tasks), n))
+    pick = np.empty((len(model.tasks), n))
+    for i in range(len(model.tasks)):
+        appear[i] = rng.random(n)
+        pick[i] = rng.random(n)
+    draws = {"n": n, "appear": appear, "pick": pick}
+    ot = model.overtime
+    if ot is not None:
+        draws["reply"] = rng.random(n)
+        draws["sms_count"] = rng.integers(ot.sms_min, ot.sms_max + 1, size=n)
+        relieve = np.empty((len(ot.sms_values), n))
+        for i in range(len(ot.sms_values)):
+            relieve[i] = rng.random(n)
+        draws["relieve"] = relieve
+    return draws
+
+
+def draw_shape(model):
+    """决定 draw_uniforms 抽取内容的模型结构；形状相同的模型可以共用同一份随机数。"""
+    ot = model.overtime
+    if ot is None:
+        return (len(model.tasks), None)
+    return (len(model.tasks), (len(ot.sms_values), ot.sms_min, ot.sms_max))
+
+
+def evaluate_draws(model, draws, record=None, policy=None, state=None):
+    """
+    用 draw_uniforms 抽出的随机数模拟，返回每天的最终累计压力。
+    record 为 dict 时额外写入每天的明细（不影响结果，None 时没有额外开销）：
+      scene_stress: 形状 (场景数 [+1 场景五], n) 的各场景压力变化
+      flags: 一天结束时的标志位；reply: 场景五回复任务的选项下标；sms_count: 短信条数
+    policy: 玩家策略 policy(i, task, state, u) -> 该任务内的选项下标（标量或长度 n 的数组），
+            i 为任务下标（i == len(model.tasks) 表示场景五的回复任务），u 为该任务的抽选均匀数；
+            返回 None 或 policy 为 None 时按选项概率抽选。
+    state: 传入 BatchDayState 时在其上模拟（调用方可读取结束时的剩余时间 / 标志位）。
+    """
+    n = draws["n"]
+    if state is None:
+        state = BatchDayState(n, model.time_budget)
+    ot = model.overtime
+    if record is not None:
+        scene_stress = np.zeros((len(model.scenes) + (ot is not None), n))
+        record["scene_stress"] = scene_stress
+
+    # ============ 普通任务 ============
+    for i, task in enumerate(model.tasks):
+        appear = draws["appear"][i] < task.appear
+        if state.time is not None:
+            appear &= state.has_time()
+        j = None if policy is None else policy(i, task, state, draws["pick"][i])
+        k = _pick_task(model, i, draws["pick"][i]) if j is None else model.opt_start[i] + np.asarray(j)
+        state.apply(appear, model.stress[k], model.time_cost[k], model.flags[k])
+        if record is not None:
+            scene_stress[model.scene_of_task[i]] += np.where(appear, model.stress[k], 0.0)
+
+    # ============ 场景五：下班后加班 ============
+    if ot is not None:
+        before = state.stress.copy() if record is not None else None
+        reply = ot.reply
+        k = None if policy is None else policy(len(model.tasks), reply, state, draws["reply"])
+        k = pick_options(draws["reply"], reply.probs) if k is None else np.asarray(k)
+        state.stress += np.asarray(reply.stress, dtype=float)[k]
+        if state.time is not None:
+            state.time -= np.asarray(reply.time_cost, dtype=float)[k]   # 与逐日循环一致，不影响压力
+        state.flags |= np.asarray(reply.flags, dtype=np.int64)[k]
+
+        # 短信倍率与缓解概率按标志位查表（未回复时缓解概率为 0）
+        table_flags = state.flags & (FLAG_STATES - 1)
+        factor = np.asarray(ot.sms_factor)[table_flags]
+        relieve_prob = np.asarray(ot.sms_relieve)[table_flags]
+        sms_count = draws["sms_count"]
+        for i, value in enumerate(ot.sms_values, start=1):
+            base = value * factor
+            relieved = draws["relieve"][i - 1] < relieve_prob
+            base = np.where(relieved, base - base * ot.relieve_ratio, base)
+            state.stress += np.where(i <= sms_count, base, 0.0)
+        if record is not None:
+            scene_stress[-1] = state.stress - before
+            record["reply"] = k
+            record["sms_count"] = sms_count
+
+    if record is not None:
+        record["flags"] = state.flags
+    return state.stress
+
+
+def simulate_chunk(model, n, rng):
+    """模拟 n 天，返回每天的最终累计压力（长度为 n 的数组）。"""
+    return evaluate_draws(model, draw_uniforms(model, n, rng))
+
+
+def iter_simulate(model, rounds, seed=None, chunk_size=CHUNK_SIZE):
+    """按 chunk_size 分批模拟 rounds 天，逐批产出压力数组，内存占用与总天数无关。"""
+    rng = np.random.default_rng(seed)
+    done = 0
+    while done < rounds:
+        n = min(chunk_size, rounds - done)
+        yield simulate_chunk(model, n, rng)
+        done += n
+
+
+def simulate_days(model, rounds, seed=None, chunk_size=CHUNK_SIZE):
+    """模拟 rounds 天，返回全部天数的最终压力数组。"""
+    chunks = list(iter_simulate(model, rounds, seed, chunk_size))
+    if not chunks:
+        return np.zeros(0)
+    return np.concatenate(chunks)
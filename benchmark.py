@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import compiler
+import engines
+import tracing
+
+# ========== 基准测试：各引擎每秒模拟天数 ==========
+# 对 engines.ENGINES 中的每个引擎（不输出日志、不绘图），在不同场景规模与天数下测量：
+#   - days_per_sec：运行 rounds 天的吞吐量（重复 repeat 次取最快一次，之前先预热一次）
+#   - latency_us：单天耗时的 p50 / p90 / p99（微秒）。逐日循环引擎逐次计时；
+#     批量引擎按 LATENCY_CHUNK 天一批计时后均摊到每天
+#   - peak_mem_mb：tracemalloc 记录的运行 rounds 天的内存峰值
+#   - import_ms：在新进程中 import 各 demo 模块的耗时（启动开销）
+# 场景规模 scale > 1 时把编译后的场景重复 scale 遍（只适用于基于 CompiledModel 的引擎）。
+# 结果写为 JSON；与基线 JSON（缺省为仓库中的 benchmarks/baseline.json）比较时，吞吐量低于基线
+# (1 - threshold) 倍的用例视为性能回退，命令行以退出码 1 结束，便于在 CI 中使用：
+#   python benchmark.py --output bench.json --threshold 0.2
+# 吞吐量随机器而变：在 CI 机器上先用 --no-baseline --output benchmarks/baseline.json 重新生成基线并提交。
+
+DEFAULT_ROUNDS = (1000, 10000)
+DEFAULT_SCALES = (1, 4)
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.2
+LATENCY_SAMPLES = 2000   # 逐日循环引擎计时的天数
+LATENCY_CHUNK = 1000     # 批量引擎每批天数
+LATENCY_BATCHES = 20     # 批量引擎计时的批数
+BENCH_SEED = 12345
+IMPORT_MODULES = ("demo_1", "demo_2", "demo_3", "demo_4", "batch_engine", "engines")
+IMPORT_REPEAT = 3
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "baseline.json")
+
+# 可按场景规模放大的引擎：名字 -> (基础模型所属 demo, 是否为批量引擎)
+SCALABLE = {
+    "demo2": ("demo2", False),
+    "demo3": ("demo3", False),
+    "batch2": ("demo2", True),
+    "batch3": ("demo3", True),
+    "batch4": ("demo4", True),
+}
+
+
+def _base_model(demo):
+    if demo == "demo2":
+        import demo_2
+        return demo_2.compile_model()
+    if demo == "demo3":
+        import demo_3
+        return demo_3.build_model(calibrated=False)
+    import demo_4
+    return demo_4.compile_model()
+
+
+def scaled_model(engine, scale):
+    """engine 的编译模型，普通场景重复 scale 遍（场景五、时间预算不变）。"""
+    model = _base_model(SCALABLE[engine][0])
+    return compiler.CompiledModel(model.scenes * scale, model.overtime, model.time_budget)
+
+
+def _make_runner(engine, scale):
+    """
+    返回 (run, day)：
+      run(rounds, seed_seq) -> 压力数组，day() 模拟一天（批量引擎为 LATENCY_CHUNK 天）。
+    """
+    if scale != 1 and engine not in SCALABLE:
+        raise ValueError(f"引擎 {engine} 不支持场景规模 {scale}（只支持 {', '.join(SCALABLE)}）")
+    tracer = tracing.Tracer(tracing.TRACE_OFF)
+
+    if engine in SCALABLE and SCALABLE[engine][1]:
+        import batch_engine
+        model = scaled_model(engine, scale)
+        rng = np.random.default_rng(BENCH_SEED)
+
+        def run(rounds, seed_seq):
+            return batch_engine.simulate_days(model, rounds, seed=seed_seq)
+        return run, lambda: batch_engine.simulate_chunk(model, LATENCY_CHUNK, rng)
+
+    if engine in ("demo2", "demo3"):
+        module = __import__("demo_" + engine[-1])
+        model = scaled_model(engine, scale)
+
+        def run(rounds, seed_seq):
+            with engines.seeded_random(seed_seq):
+                return np.asarray([module.run_single_day(tracer, model) for _ in range(rounds)], dtype=float)
+        return run, lambda: module.run_single_day(tracer, model)
+
+    def run(rounds, seed_seq):
+        return engines.run_engine(engine, rounds, seed_seq)
+    if engine == "demo1":
+        import demo_1
+        return run, lambda: demo_1.run_single_simulation(100, 25, tracer)
+    if engine == "demo4":
+        import demo_4
+        return run, demo_4.run_single_day_auto
+    raise ValueError(f"未知引擎: {engine}，可选: {', '.join(engines.ENGINES)}")
+
+
+def _percentiles(samples_us):
+    p50, p90, p99 = np.percentile(samples_us, [50, 90, 99])
+    return {"p50": float(p50), "p90": float(p90), "p99": float(p99)}
+
+
+def measure_latency(engine, day):
+    """单天耗时的分位数（微秒）。"""
+    batch = engine in SCALABLE and SCALABLE[engine][1]
+    calls, per_call = (LATENCY_BATCHES, LATENCY_CHUNK) if batch else (LATENCY_SAMPLES, 1)
+    samples = np.empty(calls)
+    clock = time.perf_counter
+    with engines.seeded_random(np.random.SeedSequence(BENCH_SEED)):
+        for i in range(calls):
+            t0 = clock()
+            day()
+            samples[i] = clock() - t0
+    return _percentiles(samples * 1e6 / per_call)
+
+
+def measure_throughput(run, rounds, repeat=DEFAULT_REPEAT):
+    """运行 repeat 次 rounds 天，返回最快一次的 (耗时秒数, 每秒天数)。"""
+    best = float("inf")
+    for i in range(repeat):
+        seed_seq = np.random.SeedSequence([BENCH_SEED, i])
+        t0 = time.perf_counter()
+        run(rounds, seed_seq)
+        best = min(best, time.perf_counter() - t0)
+    return best, rounds / best if best > 0 else float("inf")
+
+
+def measure_peak_memory(run, rounds):
+    """运行 rounds 天过程中 tracemalloc 记录的内存峰值（MB）。"""
+    tracemalloc.start()
+    try:
+        run(rounds, np.random.SeedSequence(BENCH_SEED))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+def measure_import(module, repeat=IMPORT_REPEAT):
+    """在新进程中 import module 的耗时（毫秒，取最快一次）；失败时返回 None。"""
+    code = ("import time; t = time.perf_counter(); import " + module +
+            "; print(time.perf_counter() - t)")
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, MPLBACKEND=os.environ.get("MPLBACKEND", "Agg"))
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", code], cwd=here, env=env,
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            return None
+        elapsed = float(proc.stdout.strip().splitlines()[-1]) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def case_key(engine, scale, rounds):
+    return f"{engine}/x{scale}/{rounds}"
+
+
+def run_benchmarks(engine_names=None, rounds_list=DEFAULT_ROUNDS, scales=DEFAULT_SCALES, repeat=DEFAULT_REPEAT,
+                   memory=True, imports=True, progress=None):
+    """
+    运行全部用例，返回可直接写成 JSON 的 dict：
+      meta（Python / numpy 版本、平台等）、results（每个用例一行）、imports（各模块 import 耗时）
+    不支持某个 scale 的引擎会跳过该规模。progress 为回调，每完成一个用例调用一次。
+    """
+    engine_names = list(engine_names or engines.ENGINES)
+    for name in engine_names:
+        if name not in engines.ENGINES:
+            raise ValueError(f"未知引擎: {name}，可选: {', '.join(engines.ENGINES)}")
+    results = []
+    for name in engine_names:
+        for scale in scales:
+            if scale != 1 and name not in SCALABLE:
+                continue
+            run, day = _make_runner(name, scale)
+            run(min(rounds_list), np.random.SeedSequence(BENCH_SEED))   # 预热（编译、缓存、导入）
+            latency = measure_latency(name, day)
+            for rounds in rounds_list:
+                elapsed, dps = measure_throughput(run, rounds, repeat)
+                row = {
+                    "key": case_key(name, scale, rounds),
+                    "engine": name,
+                    "scale": scale,
+                    "rounds": rounds,
+                    "seconds": elapsed,
+                    "days_per_sec": dps,
+                    "latency_us": latency,
+                    "peak_mem_mb": measure_peak_memory(run, rounds) if memory else None,
+                }
+                results.append(row)
+                if progress is not None:
+                    progress(row)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "results": results,
+        "imports": {m: measure_import(m) for m in IMPORT_MODULES} if imports else {},
+    }
+
+
+def compare_baseline(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    与基线比较吞吐量，返回回退的用例列表（days_per_sec < 基线 × (1 - threshold)）。
+    只比较两边都有的用例（按 key 匹配）。
+    """
+    if not 0 <= threshold < 1:
+        raise ValueError("threshold 必须在 [0, 1) 内")
+    base = {r["key"]: r for r in baseline["results"]}
+    regressions = []
+    for row in current["results"]:
+        old = base.get(row["key"])
+        if old is None:
+            continue
+        ratio = row["days_per_sec"] / old["days_per_sec"]
+        if ratio < 1 - threshold:
+            regressions.append({"key": row["key"], "baseline": old["days_per_sec"],
+                                "current": row["days_per_sec"], "ratio": ratio})
+    return regressions
+
+
+def format_row(row):
+    lat = row["latency_us"]
+    mem = "-" if row["peak_mem_mb"] is None else f"{row['peak_mem_mb']:.2f}MB"
+    return (f"{row['key']:<20}\t{row['days_per_sec']:>12,.0f} 天/秒\t"
+            f"p50={lat['p50']:.1f}us p90={lat['p90']:.1f}us p99={lat['p99']:.1f}us\t峰值内存 {mem}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="各引擎的模拟吞吐量基准测试")
+    parser.add_argument("--engines", nargs="+", default=None, help=f"引擎名（缺省全部：{', '.join(engines.ENGINES)}）")
+    parser.add_argument("--rounds", nargs="+", type=int, default=list(DEFAULT_ROUNDS))
+    parser.add_argument("--scales", nargs="+", type=int, default=list(DEFAULT_SCALES))
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--no-memory", action="store_true", help="不测量内存峰值")
+    parser.add_argument("--no-imports", action="store_true", help="不测量 import 耗时")
+    parser.add_argument("--output", default=None, help="结果 JSON 文件")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线 JSON 文件（缺省 benchmarks/baseline.json）")
+    parser.add_argument("--no-baseline", action="store_true", help="不与基线比较")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="吞吐量允许下降的比例（缺省 0.2）")
+    args = parser.parse_args(argv)
+
+    result = run_benchmarks(args.engines, args.rounds, args.scales, args.repeat,
+                            memory=not args.no_memory, imports=not args.no_imports,
+                            progress=lambda row: print(format_row(row), flush=True))
+    for module, ms in result["imports"].items():
+        print(f"import {module}: {'失败' if ms is None else f'{ms:.1f}ms'}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if not args.no_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_baseline(result, baseline, args.threshold)
+        for r in regressions:
+            print(f"性能回退: {r['key']} {r['baseline']:,.0f} -> {r['current']:,.0f} 天/秒 ({r['ratio']:.0%})")
+        if regressions:
+            return 1
+        print(f"与基线相比没有超过 {args.threshold:.0%} 的吞吐量下降")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
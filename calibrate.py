@@ -0,0 +1,118 @@
+import copy
+import math
+
+import compiler
+import exact_solver
+
+# ========== 压力校准：按精确矩匹配目标均值与标准差 ==========
+# demo_3 原先假设所有任务相互独立、均值为 0，把场景五合并成一个“加班短信(合并)”任务，
+# 忽略了 2~4 条短信、赴约上调 ×party_factor 与回复缓解，实际均值 / 标准差会偏离目标。
+# 这里用完整模型（含真实的场景五）的精确矩来求解：
+#   1) 普通任务与回复任务：按 var_ratio 分配方差（两点分布、均值为 0）。场景五的份额中
+#      reply_share 的部分给回复任务（回复 / 不回复的压力差），其余留给短信
+#   2) 短信压力：sms_a、sms_b 按原有比例同乘系数 s。固定其他参数时总方差是 s 的二次函数
+#      （短信与赴约、回复任务相关），用 s = 0, 1, 2 三次精确计算拟合系数后直接解出 s
+#   3) 场景五的均值（短信压力恒为正）由回复任务的各选项同加一个偏移量抵消（保持选项之间的压力差，
+#      方差不变），使总均值达到目标
+# 校准不修改传入的场景、选项与参数，结果写在返回的副本与编译好的模型中。
+# 每次求解只需几次 exact_solver.solve_moments，耗时在毫秒级。
+
+
+def assign_two_option_stress(tasks, total_var):
+    """
+    按 var_ratio 把总方差 total_var 分给各任务（原地写入 options[*]["stress"]），
+    每个任务出现时为均值 0 的两点分布，方法与 demo_3.auto_set_stress_all_tasks 相同。
+    """
+    sum_ratio = sum(t["var_ratio"] for t in tasks)
+    for t in tasks:
+        if len(t["options"]) != 2:
+            raise ValueError(f"任务 {t['name']} 需要恰好 2 个选项（自动分配压力只支持二选一）")
+        r_i = t["appear_prob"]
+        p = t["options"][0]["prob"]
+        if r_i < 1e-9 or p < 1e-9 or p > 1 - 1e-9:
+            t["options"][0]["stress"] = 0
+            t["options"][1]["stress"] = 0
+            continue
+        local_var = (t["var_ratio"] / sum_ratio) * total_var / r_i
+        t["options"][0]["stress"] = math.sqrt(local_var * (1 - p) / p)
+        t["options"][1]["stress"] = -math.sqrt(local_var * p / (1 - p))
+
+
+def _with_scale(params, scale):
+    p = dict(params)
+    p["sms_a"] = params["sms_a"] * scale
+    p["sms_b"] = params["sms_b"] * scale
+    return p
+
+
+def _moments(scenes, reply_options, params, scale):
+    model = compiler.compile_scenes(scenes, reply_options=reply_options, params=_with_scale(params, scale))
+    return exact_solver.solve_moments(model)
+
+
+def calibrate_scenes(scenes, reply_options, params, desired_mean=0.0, desired_std=25.0, overtime_var_ratio=2.0,
+                     reply_share=0.5):
+    """
+    校准 SCENES 风格的任务与场景五，使完整模型（含场景五）的最终累计压力精确满足
+    均值 = desired_mean、标准差 = desired_std。传入的 scenes / reply_options / params 不会被修改。
+      - scenes: 场景列表（不含合并的场景五），任务需带 appear_prob、var_ratio
+      - reply_options: 场景五“加班短信回复”的两个选项
+      - params: 场景五参数 sms_a / sms_b（只用其比例）/ relieve_prob / relieve_ratio / sms_party_factor
+      - overtime_var_ratio: 场景五在方差分配中的 var_ratio
+      - reply_share: 场景五的份额中分给回复任务的比例（0 表示两个选项压力相同）
+    返回 dict：scenes、reply_options、params（写入了校准压力的副本）、model（编译好的
+    compiler.CompiledModel）、sms_a、sms_b、reply_stress（各回复选项的压力）、mean、std（校准后的精确值）
+    """
+    if desired_std <= 0:
+        raise ValueError("desired_std 必须大于 0")
+    if not 0 <= reply_share < 1:
+        raise ValueError("reply_share 必须在 [0, 1) 内")
+    if params["sms_a"] + params["sms_b"] <= 0:
+        raise ValueError("sms_a、sms_b 不能全为 0（需要用它们的比例确定短信压力的形状）")
+    scenes = copy.deepcopy(scenes)
+    reply_options = copy.deepcopy(reply_options)
+    tasks = [t for sc in scenes for t in sc["tasks"]]
+    task_ratio = sum(t["var_ratio"] for t in tasks)
+    reply = {"name": "加班短信回复", "appear_prob": 1.0, "var_ratio": overtime_var_ratio * reply_share,
+             "options": reply_options}
+    target_var = desired_std ** 2
+
+    # 1) 普通任务与回复任务（回复任务 var_ratio 为 0 时两个选项压力均为 0）
+    if reply_share > 0:
+        tasks.append(reply)
+    else:
+        for opt in reply_options:
+            opt["stress"] = 0.0
+    ratio = sum(t["var_ratio"] for t in tasks)
+    assign_two_option_stress(tasks, target_var * ratio / (task_ratio + overtime_var_ratio))
+
+    # 2) 短信系数 s：Var(s) = a*s² + b*s + c（回复压力的公共偏移不影响方差）
+    v0, v1, v2 = (_moments(scenes, reply_options, params, s)["var"] for s in (0.0, 1.0, 2.0))
+    a = (v2 - 2 * v1 + v0) / 2
+    b = v1 - v0 - a
+    c = v0 - target_var
+    if a <= 0:
+        raise ValueError("短信压力不影响总方差，无法校准")
+    if c > 0:
+        raise ValueError(f"不含短信时方差已达 {v0:.2f}，超过目标 {target_var:.2f}")
+    scale = (-b + math.sqrt(b * b - 4 * a * c)) / (2 * a)
+
+    # 3) 回复任务各选项同加偏移量，抵消场景五的均值
+    offset = desired_mean - _moments(scenes, reply_options, params, scale)["mean"]
+    for opt in reply_options:
+        opt["stress"] += offset
+
+    params = _with_scale(params, scale)
+    model = compiler.compile_scenes(scenes, reply_options=reply_options, params=params)
+    result = exact_solver.solve_moments(model)
+    return {
+        "scenes": scenes,
+        "reply_options": reply_options,
+        "params": params,
+        "model": model,
+        "sms_a": params["sms_a"],
+        "sms_b": params["sms_b"],
+        "reply_stress": [opt["stress"] for opt in reply_options],
+        "mean": result["mean"],
+        "std": result["std"],
+    }
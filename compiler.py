@@ -0,0 +1,193 @@
+import hashlib
+import itertools
+import math
+
+import numpy as np
+
+# ========== 场景编译：把 SCENES / Task 对象转换为紧凑的数组模型 ==========
+# 逐日循环原本每个任务都要读嵌套 dict、重建 weights 列表、比较任务名字符串。
+# 编译一次之后：
+#   - 每个任务保存累计权重、选项压力 / 时间消耗、出现概率，以及整数标志位效果
+#   - 同时展平成 numpy 数组，供批量引擎 / 精确求解使用
+#   - 概率之和、两选项约束等校验只在编译时做一次
+
+# ========== 选项效果：声明式标志位 ==========
+# 特殊行为不再按任务名 / 选项标签中的文字判断，而由选项自己声明：
+#   {"label": "A. 欣然赴约", ..., "effects": ["party"]}      （SCENES 风格）
+#   "A. 回复": {..., "effects": ["reply"]}                    （Task 对象风格）
+# 编译时 effects 转换为整数标志位；标志位对场景五的作用（短信倍率、缓解概率）
+# 由 CompiledOvertime 预先按标志位算成查找表，引擎只做整数运算与查表。
+
+FLAG_PARTY = 1 << 0   # 已答应赴约 => 场景五短信压力 ×party_factor
+FLAG_REPLY = 1 << 1   # 回复了加班短信 => 短信有概率缓解
+EFFECTS = {"party": FLAG_PARTY, "reply": FLAG_REPLY}
+FLAG_STATES = 1 << len(EFFECTS)   # 标志位组合数（查找表长度）
+
+SMS_COUNT = 4          # 老板短信总条数（demo_1 / demo_2 中随机激活 2~4 条）
+PROB_TOL = 1e-6        # 选项概率之和与 1 的允许误差
+
+
+class CompiledTask:
+    """
+    单个任务的紧凑表示。逐日循环直接使用其中的元组 / 列表（避免 numpy 标量开销），
+    选项按 bisect(cum_weights, random() * total, 0, last) 抽选，与 random.choices 一致。
+    """
+    def __init__(self, name, appear, labels, weights, stress, time_cost, flags):
+        self.name = name
+        self.appear = appear
+        self.labels = tuple(labels)
+        self.weights = tuple(weights)
+        self.cum_weights = list(itertools.accumulate(weights))
+        self.total = self.cum_weights[-1]
+        self.last = len(self.cum_weights) - 1
+        self.probs = tuple(w / self.total for w in weights)
+        self.stress = tuple(stress)
+        self.time_cost = tuple(time_cost)
+        self.flags = tuple(flags)
+
+
+class CompiledOvertime:
+    """
+    场景五（下班后加班）：回复任务 + 老板短信。
+    sms_factor[flags] / sms_relieve[flags]: 按标志位查表得到的短信压力倍率与缓解概率。
+    """
+    def __init__(self, reply, sms_values, sms_min, sms_max, party_factor, relieve_prob, relieve_ratio):
+        self.reply = reply                    # CompiledTask，选项可带 FLAG_REPLY
+        self.sms_values = tuple(sms_values)   # 第 i 条短信的基础压力
+        self.sms_min = sms_min                # 激活条数在 [sms_min, sms_max] 内均匀
+        self.sms_max = sms_max
+        self.party_factor = party_factor
+        self.relieve_prob = relieve_prob
+        self.relieve_ratio = relieve_ratio
+        self.sms_factor = tuple(party_factor if f & FLAG_PARTY else 1.0 for f in range(FLAG_STATES))
+        self.sms_relieve = tuple(relieve_prob if f & FLAG_REPLY else 0.0 for f in range(FLAG_STATES))
+
+
+class CompiledModel:
+    def __init__(self, scenes, overtime=None, time_budget=None):
+        """
+        scenes: [(场景名, [CompiledTask, ...]), ...]，按执行顺序
+        overtime: CompiledOvertime 或 None
+        time_budget: 可用时间；为 None 时不检查时间（demo_2 / demo_3），
+                     否则剩余时间 <= 0 时普通任务不再执行（demo_1 / demo_4）
+        """
+        self.scenes = [(name, tuple(tasks)) for name, tasks in scenes]
+        self.tasks = tuple(t for _, tasks in self.scenes for t in tasks)
+        self.overtime = overtime
+        self.time_budget = time_budget
+
+        # 展平数组：第 i 个任务的选项位于 [opt_start[i], opt_start[i+1])
+        sizes = [len(t.labels) for t in self.tasks]
+        self.scene_of_task = np.array([i for i, (_, tasks) in enumerate(self.scenes) for _ in tasks], dtype=np.int64)
+        self.appear = np.array([t.appear for t in self.tasks], dtype=float)
+        self.opt_start = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        self.probs = np.array([p for t in self.tasks for p in t.probs], dtype=float)
+        self.cum_probs = np.array([c / t.total for t in self.tasks for c in t.cum_weights], dtype=float)
+        self.stress = np.array([s for t in self.tasks for s in t.stress], dtype=float)
+        self.time_cost = np.array([c for t in self.tasks for c in t.time_cost], dtype=float)
+        self.flags = np.array([f for t in self.tasks for f in t.flags], dtype=np.int64)
+
+    def task_options(self, i):
+        """第 i 个任务在展平数组中的选项切片。"""
+        return slice(self.opt_start[i], self.opt_start[i + 1])
+
+
+def model_fingerprint(model):
+    """编译后模型的哈希：只要概率、压力、时间、标志位与场景五参数相同，结果就相同。"""
+    h = hashlib.sha1()
+    for arr in (model.appear, model.opt_start, model.probs, model.stress, model.time_cost, model.flags):
+        h.update(np.ascontiguousarray(arr).tobytes())
+    h.update(repr(model.time_budget).encode())
+    ot = model.overtime
+    if ot is not None:
+        h.update(repr((ot.reply.probs, ot.reply.stress, ot.reply.time_cost, ot.reply.flags, ot.sms_values,
+                       ot.sms_min, ot.sms_max, ot.party_factor, ot.relieve_prob, ot.relieve_ratio)).encode())
+    return h.hexdigest()
+
+
+def check_task(name, appear, weights, stress, two_options=False):
+    """
+    校验一个任务：有选项、appear_prob 在 [0,1] 内、概率之和为 1、压力已设置
+    （two_options 时须恰好 2 个选项）；不合法时抛出 ValueError。
+    """
+    if not weights:
+        raise ValueError(f"任务 {name} 没有任何选项")
+    if not 0.0 <= appear <= 1.0:
+        raise ValueError(f"任务 {name} 的 appear_prob={appear} 不在 [0,1] 内")
+    if any(w < 0 for w in weights):
+        raise ValueError(f"任务 {name} 存在负的选项概率")
+    if abs(sum(weights) - 1.0) > PROB_TOL:
+        raise ValueError(f"任务 {name} 的选项概率之和为 {sum(weights)}，应为 1")
+    if two_options and len(weights) != 2:
+        raise ValueError(f"任务 {name} 需要恰好 2 个选项（自动分配压力只支持二选一）")
+    for s in stress:
+        if s is None or not isinstance(s, (int, float)) or math.isnan(s):
+            raise ValueError(f"任务 {name} 存在未设置压力的选项（demo_3 需先调用 auto_set_stress_all_tasks）")
+
+
+def effect_flags(effects, where="选项"):
+    """把声明的效果名（如 ["party"]）转换为整数标志位；未知的效果名抛出 ValueError。"""
+    flag = 0
+    for name in effects:
+        if name not in EFFECTS:
+            raise ValueError(f"{where} 声明了未知效果 {name!r}，可选: {', '.join(EFFECTS)}")
+        flag |= EFFECTS[name]
+    return flag
+
+
+def _compile_dict_task(tdata):
+    options = tdata["options"]
+    weights = [opt["prob"] for opt in options]
+    stress = [opt.get("stress") for opt in options]
+    check_task(tdata["name"], tdata.get("appear_prob", 1.0), weights, stress,
+                two_options="var_ratio" in tdata)
+    flags = [effect_flags(opt.get("effects", ()), f"任务 {tdata['name']} 的选项 {opt['label']}") for opt in options]
+    return CompiledTask(tdata["name"], tdata.get("appear_prob", 1.0), [opt["label"] for opt in options],
+                        weights, stress, [opt["time_cost"] for opt in options], flags)
+
+
+def compile_scenes(scenes, reply_options=None, params=None, time_budget=None):
+    """
+    编译 demo_2 / demo_3 的 SCENES 结构。
+      - reply_options: 场景五“加班短信回复”的选项；为 None 时没有场景五（demo_3）
+      - params: 场景五参数 sms_a / sms_b / relieve_prob / relieve_ratio / sms_party_factor
+    """
+    compiled = [(sc["name"], [_compile_dict_task(t) for t in sc["tasks"]]) for sc in scenes]
+    overtime = None
+    if reply_options is not None:
+        p = params or {}
+        reply = _compile_dict_task({"name": "加班短信回复", "options": reply_options})
+        sms_values = [p.get("sms_a", 5) + i * p.get("sms_b", 3) for i in range(SMS_COUNT)]
+        overtime = CompiledOvertime(reply, sms_values, 2, SMS_COUNT,
+                                    p.get("sms_party_factor", 1.2), p.get("relieve_prob", 0.7),
+                                    p.get("relieve_ratio", 0.2))
+    return CompiledModel(compiled, overtime, time_budget)
+
+
+def compile_task_object(task):
+    """
+    编译 demo_1 / demo_4 的 Task 对象（options 为 {标签: {"prob", "time_cost", "stress_change", "effects"}}，
+    effects 可省略）。
+    """
+    labels = list(task.options.keys())
+    weights = [task.options[k]["prob"] for k in labels]
+    stress = [task.options[k].get("stress_change") for k in labels]
+    check_task(task.description, 1.0, weights, stress)
+    flags = [effect_flags(task.options[k].get("effects", ()), f"任务 {task.description} 的选项 {k}") for k in labels]
+    return CompiledTask(task.description, 1.0, labels, weights, stress,
+                        [task.options[k]["time_cost"] for k in labels], flags)
+
+
+def compile_objects(scenes, overtime=None, time_budget=None):
+    """
+    编译 demo_1 / demo_4 的场景对象（具有 name、tasks 属性）。
+      - overtime: None，或 dict：reply_task（Task 对象）、sms_values、sms_min、sms_max、
+                  party_factor、relieve_prob、relieve_ratio
+    """
+    compiled = [(scene.name, [compile_task_object(t) for t in scene.tasks]) for scene in scenes]
+    ot = None
+    if overtime is not None:
+        ot = CompiledOvertime(compile_task_object(overtime["reply_task"]), overtime["sms_values"],
+                              overtime["sms_min"], overtime["sms_max"], overtime["party_factor"],
+                              overtime["relieve_prob"], overtime["relieve_ratio"])
+    return CompiledModel(compiled, ot, time_budget)
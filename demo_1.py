@@ -1,9 +1,13 @@
 import random
 import math
-import matplotlib.pyplot as plt
 
-plt.rcParams["font.sans-serif"] = ["SimHei"]  # 使用黑体显示中文
-plt.rcParams["axes.unicode_minus"] = False    # 正常显示负号
+import tracing
+from alias import AliasTable
+from compiler import FLAG_PARTY, effect_flags
+from online_stats import OnlineStats
+from sim_state import DayState
+
+# matplotlib 只在绘图时由 report 导入（中文字体设置见 report.FONT_RC）
 
 # 全局参数
 DESIRED_MEAN = 100
@@ -20,6 +24,20 @@ class Task:
         self.description = description
         self.options = options
         self.importance = importance
+        self.refresh_alias()
+
+    def refresh_alias(self):
+        """按当前选项概率重建别名表；直接改动 options 的选项或 prob 后需调用。"""
+        self._labels = tuple(self.options.keys())
+        self._alias = AliasTable([self.options[opt]["prob"] for opt in self._labels])
+        # 选项声明的效果（如 "effects": ["party"]）编译为整数标志位，选中后直接置位
+        self.option_flags = {opt: effect_flags(self.options[opt].get("effects", ()), f"任务 {self.description} 的选项 {opt}")
+                             for opt in self._labels}
+
+    def set_prob(self, option, prob):
+        """修改某个选项的概率并重建别名表。"""
+        self.options[option]["prob"] = prob
+        self.refresh_alias()
 
     def auto_set_stress(self, V):
         if len(self.options) != 2:
@@ -32,63 +50,61 @@ class Task:
         stress2 = -math.sqrt(V * p / (1 - p))
         self.options[option_names[0]]["stress_change"] = stress1
         self.options[option_names[1]]["stress_change"] = stress2
+        self.refresh_alias()
 
     def make_choice(self):
-        option_names = list(self.options.keys())
-        weights = [self.options[opt]["prob"] for opt in option_names]
-        chosen_option = random.choices(option_names, weights=weights, k=1)[0]
+        """按 prob 随机选一个选项（别名表，O(1)）"""
+        chosen_option = self._labels[self._alias.draw()]
         data = self.options[chosen_option]
         return chosen_option, data["stress_change"], data["time_cost"]
 
+    def make_choices(self, k):
+        """一次抽选 k 次，返回 [(选项, 压力变化, 时间消耗), ...]"""
+        results = []
+        for i in self._alias.draw_many(k):
+            chosen_option = self._labels[i]
+            data = self.options[chosen_option]
+            results.append((chosen_option, data["stress_change"], data["time_cost"]))
+        return results
+
 # ================= 场景类 =================
 class Scene:
     def __init__(self, name, tasks):
         self.name = name
         self.tasks = tasks
 
-    def play_scene(self, current_stress, current_time, log_lines):
-        log_lines.append(f"=== 进入场景：{self.name} ===")
+    def play_scene(self, state, log_lines):
+        """
+        执行本场景的任务，结果写入 state（sim_state.DayState），返回本场景的压力变化。
+        log_lines 为 None 表示本日不追踪，跳过所有日志格式化。
+        """
+        trace = log_lines is not None
+        if trace:
+            log_lines.append(f"=== 进入场景：{self.name} ===")
         scene_stress = 0
         scene_time = 0
         for task in self.tasks:
-            if current_time <= 0:
-                log_lines.append("  - 剩余时间不足，无法继续任务！")
+            if state.out_of_time():
+                if trace:
+                    log_lines.append("  - 剩余时间不足，无法继续任务！")
                 break
             chosen_option, stress_change, time_cost = task.make_choice()
-            log_lines.append(f"任务: {task.description} -> 选择: {chosen_option} "
-                             f"(压力变化: {stress_change:.2f}, 时间消耗: {time_cost} 小时)")
+            if trace:
+                log_lines.append(f"任务: {task.description} -> 选择: {chosen_option} "
+                                 f"(压力变化: {stress_change:.2f}, 时间消耗: {time_cost} 小时)")
+            flags = task.option_flags[chosen_option]
+            if flags:
+                state.set_flag(flags)
+                if trace and flags & FLAG_PARTY:
+                    log_lines.append("  -> 已答应赴约，state.is_party 置为 True")
             scene_stress += stress_change
             scene_time += time_cost
-            current_time -= time_cost
-        log_lines.append(f"场景 {self.name}结束，总压力变化: {scene_stress:.2f}, 总时间消耗: {scene_time} 小时")
-        log_lines.append("")
-        return scene_stress, current_time
-
-# ================= 特殊场景类：PartyScene =================
-class PartyScene(Scene):
-    def play_scene(self, current_stress, current_time, log_lines):
-        global IS_PARTY
-        log_lines.append(f"=== 进入场景：{self.name} ===")
-        scene_stress = 0
-        scene_time = 0
-        for task in self.tasks:
-            if current_time <= 0:
-                log_lines.append("  - 剩余时间不足，无法继续任务！")
-                break
-            chosen_option, stress_change, time_cost = task.make_choice()
-            log_lines.append(f"任务: {task.description} -> 选择: {chosen_option} "
-                             f"(压力变化: {stress_change:.2f}, 时间消耗: {time_cost} 小时)")
-            if "朋友邀约" in task.description and "欣然赴约" in chosen_option:
-                IS_PARTY = True
-                log_lines.append("  -> 已答应赴约，IS_PARTY 置为 True")
-            scene_stress += stress_change
-            scene_time += time_cost
-            current_time -= time_cost
-        log_lines.append(f"场景 {self.name}结束，总压力变化: {scene_stress:.2f}, 总时间消耗: {scene_time} 小时")
-        log_lines.append("")
-        return scene_stress, current_time
+            state.apply(stress_change, time_cost)
+        if trace:
+            log_lines.append(f"场景 {self.name}结束，总压力变化: {scene_stress:.2f}, 总时间消耗: {scene_time} 小时")
+            log_lines.append("")
+        return scene_stress
 
-# ================= 特殊短信任务类 =================
 # ================= 特殊短信任务类 =================
 class SMSTask:
     def __init__(self, index, importance=1, a=SMS_a, b=SMS_b):
@@ -98,21 +114,32 @@ class SMSTask:
         self.index = index
         self.a = a
         self.b = b
-        self.active = False
         self.assigned_V = None  # 保存全局分配的目标方差
 
-    def auto_set_stress(self, V):
-        self.assigned_V = V  # 保存目标方差
+    def full_stress(self):
+        """激活时的压力变化（按 assigned_V 计算，不含赴约上调与回复缓解）"""
         base = self.a + (self.index - 1) * self.b
         if base == 0:
-            computed = 0
-        else:
-            k = math.sqrt(V) / abs(base)
-            computed = k * base
-        self.options["A. 接受短信"]["stress_change"] = computed if self.active else 0
+            return 0
+        k = math.sqrt(self.assigned_V) / abs(base)
+        return k * base
 
-    def make_choice(self, relieve=False):
-        stress_change = self.options["A. 接受短信"]["stress_change"]
+    def auto_set_stress(self, V):
+        self.assigned_V = V  # 保存目标方差
+        self.options["A. 接受短信"]["stress_change"] = self.full_stress()
+
+    def stress_for(self, state, active):
+        """本日这条短信的压力：未激活为 0，已赴约（state.is_party）时上调 SMS_PARTY_FACTOR 倍。"""
+        if not active:
+            return 0
+        stress_change = self.full_stress()
+        if state.is_party:
+            stress_change = stress_change * SMS_PARTY_FACTOR
+        return stress_change
+
+    def make_choice(self, state, active=True, relieve=False):
+        """激活状态按天传入（不修改任务本身），因此同一个 SMSTask 可被多天同时使用。"""
+        stress_change = self.stress_for(state, active)
         if relieve and stress_change != 0:
             if random.random() < RELIEVE_PROB:
                 relief = stress_change * RELIEVE_RATIO
@@ -132,7 +159,7 @@ def build_overtime_tasks():
     reply_task = Task(
         "加班短信回复",
         {
-            "A. 回复": {"time_cost": 0.5, "prob": 0.5},
+            "A. 回复": {"time_cost": 0.5, "prob": 0.5, "effects": ["reply"]},
             "B. 不回复": {"time_cost": 0.5, "prob": 0.5}
         },
         importance=2
@@ -141,72 +168,86 @@ def build_overtime_tasks():
     sms_tasks = [SMSTask(i, importance=1) for i in range(1, 5)]
     return [reply_task] + sms_tasks
 
-def play_scene5(overtime_tasks, current_time, log_lines, is_party):
+def play_scene5(overtime_tasks, state, log_lines):
     """
     场景五：下班后加班，融入全局任务计算：
       - 执行“回复短信决策”任务（位于 overtime_tasks 的第一个元素）
       - 对剩下的 SMSTask（老板短信）直接使用传入的任务列表，
         这里任务已全局分配好目标方差（assigned_V 不为 None）。
-      - 根据是否回复和 is_party 状态调整短信任务压力；
+      - 根据是否回复和 state.is_party 调整短信任务压力；
       - 如果选择回复，则以 RELIEVE_PROB 的概率缓解部分压力。
+    结果写入 state，返回本场景的压力变化。
+    log_lines 为 None 表示本日不追踪，跳过所有日志格式化。
     """
-    log_lines.append("=== 进入场景：下班后加班 ===")
+    trace = log_lines is not None
+    if trace:
+        log_lines.append("=== 进入场景：下班后加班 ===")
     scene_stress = 0
-    scene_time = 0
 
     # 第一步：执行回复短信决策任务（普通 Task）
     reply_task = overtime_tasks[0]
     # 此处 reply_task 已在全局分配时调用了 auto_set_stress
     reply_choice, reply_stress, reply_time = reply_task.make_choice()
-    log_lines.append(f"任务: {reply_task.description} -> 选择: {reply_choice} "
-                     f"(压力变化: {reply_stress:.2f}, 时间消耗: {reply_time} 小时)")
+    if trace:
+        log_lines.append(f"任务: {reply_task.description} -> 选择: {reply_choice} "
+                         f"(压力变化: {reply_stress:.2f}, 时间消耗: {reply_time} 小时)")
     scene_stress += reply_stress
-    scene_time += reply_time
-    current_time -= reply_time
-    reply = True if "回复" in reply_choice else False
+    state.apply(reply_stress, reply_time)
+    state.set_flag(reply_task.option_flags[reply_choice])   # 声明了 reply 效果的选项置 FLAG_REPLY
 
     # 第二步：对短信任务进行处理。overtime_tasks[1:] 为 4 个 SMSTask
     # 随机决定激活的短信条数（2~4条）
     sms_count = random.randint(2, 4)
-    log_lines.append(f"随机激活老板短信条数：{sms_count}")
-    for i, sms_task in enumerate(overtime_tasks[1:], start=1):
-        sms_task.active = (i <= sms_count)
-        # 重新调用 auto_set_stress，传入该任务已分配好的目标方差
-        sms_task.auto_set_stress(sms_task.assigned_V)
-    # 遍历短信任务，打印计算结果并根据 is_party 调整
-    for sms_task in overtime_tasks[1:]:
-        log_lines.append(f"{sms_task.description} (active={sms_task.active})：计算后压力变化 = {sms_task.options['A. 接受短信'].get('stress_change', 0):.2f}")
-        if is_party and sms_task.active:
-            original = sms_task.options["A. 接受短信"]["stress_change"]
-            sms_task.options["A. 接受短信"]["stress_change"] = original * SMS_PARTY_FACTOR
-            log_lines.append(f"  因已赴约，上调后压力变化 = {sms_task.options['A. 接受短信']['stress_change']:.2f}")
+    if trace:
+        log_lines.append(f"随机激活老板短信条数：{sms_count}")
+        # 打印每条短信的计算结果（以及因 state.is_party 的上调）
+        for i, sms_task in enumerate(overtime_tasks[1:], start=1):
+            active = i <= sms_count
+            log_lines.append(f"{sms_task.description} (active={active})："
+                             f"计算后压力变化 = {sms_task.full_stress() if active else 0:.2f}")
+            if state.is_party and active:
+                log_lines.append(f"  因已赴约，上调后压力变化 = {sms_task.stress_for(state, active):.2f}")
     # 累加短信任务的压力变化（并考虑回复时的缓解）
     sms_total = 0
-    for sms_task in overtime_tasks[1:]:
-        stress = sms_task.make_choice(relieve=reply)[1]
+    for i, sms_task in enumerate(overtime_tasks[1:], start=1):
+        stress = sms_task.make_choice(state, active=(i <= sms_count), relieve=state.replied)[1]
         sms_total += stress
-    log_lines.append(f"场景五短信任务累计压力变化 = {sms_total:.2f}")
     scene_stress += sms_total
+    state.apply(sms_total)
+    if trace:
+        log_lines.append(f"场景五短信任务累计压力变化 = {sms_total:.2f}")
+        log_lines.append(f"场景 五：下班后加班结束，总压力变化: {scene_stress:.2f}")
+        log_lines.append("")
+    return scene_stress
 
-    log_lines.append(f"场景 五：下班后加班结束，总压力变化: {scene_stress:.2f}")
-    log_lines.append("")
-    return scene_stress, current_time
 
+# ================= 场景构建（带缓存） =================
+# 每天的场景结构只有两处随机：场景三的 2 个额外任务是否出现、场景五激活几条短信。
+# 因此按 (desired_std, 额外任务出现情况) 缓存构建好的场景（已分配压力），
+# 每轮只需抽取用哪个变体，不再重复创建 Task / Scene 对象、重算重要性与压力。
+# 每天的可变状态（赴约、剩余时间、短信激活）都在 sim_state.DayState 中，场景对象只读，可安全复用。
+EXTRA_TASK_PROB = 0.5   # 场景三每个额外任务出现的概率
+EXTRA_VARIANTS = [(False, False), (False, True), (True, False), (True, True)]
 
-# ================= 主仿真函数 =================
-def run_single_simulation(desired_mean=DESIRED_MEAN, desired_std=DESIRED_STD):
-    """
-    运行单次仿真，返回累计压力（最终得分 = desired_mean + 累计压力）。
-    普通任务与特殊分支任务均参与全局重要性计算，目标方差根据各任务 importance 分配。
-    """
-    initial_stress = 0
-    current_time = 999  # 足够大
+_SCENARIO_CACHE = {}
 
-    global IS_PARTY
-    IS_PARTY = False
 
-    log_lines = []
+def _work_task(index):
+    return Task(
+        f"重复高压工作 {index}",
+        {
+            "A. 任务完成！": {"time_cost": 1, "prob": 0.5},
+            "B. 任务失败！": {"time_cost": 1, "prob": 0.5}
+        },
+        importance=1
+    )
 
+
+def build_scenes(desired_std=DESIRED_STD, extra_tasks=(False, False)):
+    """
+    构建场景一~五并按重要性分配压力，返回 scenes 列表。
+    extra_tasks: 场景三的“重复高压工作 3 / 4”是否出现。
+    """
     # ----------------- 场景一：出门上班 -----------------
     task_1 = Task(
         "是否吃早餐",
@@ -230,108 +271,128 @@ def run_single_simulation(desired_mean=DESIRED_MEAN, desired_std=DESIRED_STD):
     scene2 = Scene("场景二：老板骂人", [task_2])
 
     # ----------------- 场景三：开始工作（动态任务生成） -----------------
-    base_task1 = Task(
-        "重复高压工作 1",
-        {
-            "A. 任务完成！": {"time_cost": 1, "prob": 0.5},
-            "B. 任务失败！": {"time_cost": 1, "prob": 0.5}
-        },
-        importance=1
-    )
-    base_task2 = Task(
-        "重复高压工作 2",
-        {
-            "A. 任务完成！": {"time_cost": 1, "prob": 0.5},
-            "B. 任务失败！": {"time_cost": 1, "prob": 0.5}
-        },
-        importance=1
-    )
-    tasks_scene3 = [base_task1, base_task2]
+    tasks_scene3 = [_work_task(1), _work_task(2)]
     # 额外任务（每个以50%概率加入，最多2个）
-    if random.random() < 0.5:
-        extra_task = Task(
-            "重复高压工作 3",
-            {
-                "A. 任务完成！": {"time_cost": 1, "prob": 0.5},
-                "B. 任务失败！": {"time_cost": 1, "prob": 0.5}
-            },
-            importance=1
-        )
-        tasks_scene3.append(extra_task)
-    if random.random() < 0.5:
-        extra_task = Task(
-            "重复高压工作 4",
-            {
-                "A. 任务完成！": {"time_cost": 1, "prob": 0.5},
-                "B. 任务失败！": {"time_cost": 1, "prob": 0.5}
-            },
-            importance=1
-        )
-        tasks_scene3.append(extra_task)
+    for index, appeared in enumerate(extra_tasks, start=3):
+        if appeared:
+            tasks_scene3.append(_work_task(index))
     scene3 = Scene("场景三：开始工作", tasks_scene3)
 
     # ----------------- 场景四：下班后，朋友聚餐 -----------------
     party_task = Task(
         "朋友邀约",
         {
-            "A. 欣然赴约": {"time_cost": 1, "prob": 0.5},
+            "A. 欣然赴约": {"time_cost": 1, "prob": 0.5, "effects": ["party"]},
             "B. 先不去": {"time_cost": 1, "prob": 0.5}
         },
         importance=3
     )
-    scene4 = PartyScene("场景四：下班后，朋友聚餐", [party_task])
+    scene4 = Scene("场景四：下班后，朋友聚餐", [party_task])
 
     # ----------------- 场景五：下班后加班 -----------------
     overtime_tasks = build_overtime_tasks()  # 返回列表：[reply_task, sms_task1, sms_task2, sms_task3, sms_task4]
     scene5 = Scene("场景五：下班后加班", overtime_tasks)
 
-    # ----------------- 场景六：一天结束，睡前 -----------------
-    scene6 = Scene("场景六：一天结束，睡前", [])
-    # ----------------- 场景七：Ending -----------------
-    scene7 = Scene("场景七：Ending", [])
-
-    # 将所有场景组合（场景5为普通场景，这里后续用特殊函数处理其逻辑）
+    # 场景六（睡前）、场景七（Ending）没有任务，只在日志中体现
     scenes = [scene1, scene2, scene3, scene4, scene5]
+    assign_stress(scenes, desired_std)
+    return scenes
+
+
+def assign_stress(scenes, desired_std=DESIRED_STD):
+    """按各任务 importance 分配目标方差并写入压力（修改了选项概率后可重新调用）。"""
     total_importance = sum(task.importance for scene in scenes for task in scene.tasks)
     for scene in scenes:
         for task in scene.tasks:
             V_i = (task.importance / total_importance) * (desired_std ** 2)
-            if isinstance(task, SMSTask):
-                task.auto_set_stress(V_i)
-            else:
-                task.auto_set_stress(V_i)
+            task.auto_set_stress(V_i)
+
+
+def get_scenes(desired_std=DESIRED_STD, extra_tasks=(False, False)):
+    """
+    取缓存中的场景变体；首次使用某个 desired_std 时一次性构建全部 4 个变体。
+    压力只取决于 desired_std（desired_mean 只是最终得分的偏移），因此不参与缓存键。
+    """
+    key = (desired_std, tuple(extra_tasks))
+    scenes = _SCENARIO_CACHE.get(key)
+    if scenes is None:
+        for variant in EXTRA_VARIANTS:
+            _SCENARIO_CACHE[(desired_std, variant)] = build_scenes(desired_std, variant)
+        scenes = _SCENARIO_CACHE[key]
+    return scenes
+
+
+def clear_scenario_cache():
+    """清空场景缓存（修改了任务定义或全局参数后调用）。"""
+    _SCENARIO_CACHE.clear()
+
+
+# ================= 主仿真函数 =================
+def run_single_simulation(desired_mean=DESIRED_MEAN, desired_std=DESIRED_STD, tracer=None):
+    """
+    运行单次仿真，返回累计压力（最终得分 = desired_mean + 累计压力）。
+    普通任务与特殊分支任务均参与全局重要性计算，目标方差根据各任务 importance 分配。
+    tracer: tracing.Tracer，决定本次是否生成/输出日志；缺省为每次都打印到 stdout。
+    返回的 scenes 来自场景缓存，由后续仿真共享，不要修改。
+    """
+    state = DayState(time=999)  # 时间足够大
+
+    if tracer is None:
+        tracer = tracing.Tracer(tracing.TRACE_FULL)
+    log_lines = tracer.start_day()
+
+    # 本轮唯一需要抽取的结构：场景三的额外任务是否出现
+    extra_tasks = (random.random() < EXTRA_TASK_PROB, random.random() < EXTRA_TASK_PROB)
+    scenes = get_scenes(desired_std, extra_tasks)
+    scene5 = scenes[4]
 
     # 依次执行场景1-4
-    cumulative_stress = initial_stress
-    for scene in [scene1, scene2, scene3, scene4]:
-        scene_stress, current_time = scene.play_scene(cumulative_stress, current_time, log_lines)
-        cumulative_stress += scene_stress
+    for scene in scenes[:4]:
+        scene.play_scene(state, log_lines)
 
     # 执行场景5：下班后加班，特殊逻辑封装在 play_scene5 中
-    scene5_stress, current_time = play_scene5(scene5.tasks, current_time, log_lines, IS_PARTY)
-    cumulative_stress += scene5_stress
-
-    # 场景六：结局判定
-    log_lines.append("=== 进入场景：一天结束，睡前 ===")
-    log_lines.append(f"累计压力为 {cumulative_stress:.2f}")
-    if cumulative_stress > 100:
-        log_lines.append("结局：坏结局")
-    else:
-        log_lines.append("结局：好结局")
-    log_lines.append("场景 六结束\n")
-    # 场景七：Ending
-    log_lines.append("=== 进入场景：Ending ===")
-    log_lines.append("重置每日基础压力，进入下一日（模拟结束）")
-    log_lines.append("场景 七结束\n")
-
-    final_score = desired_mean + cumulative_stress
-    log_lines.append(f"最终累计压力: {cumulative_stress:.2f}, 最终得分: {final_score:.2f}")
-
-    for line in log_lines:
-        print(line)
+    play_scene5(scene5.tasks, state, log_lines)
+    cumulative_stress = state.stress
+
+    # 场景六：结局判定 & 场景七：Ending（只影响日志）
+    if log_lines is not None:
+        log_lines.append("=== 进入场景：一天结束，睡前 ===")
+        log_lines.append(f"累计压力为 {cumulative_stress:.2f}")
+        if cumulative_stress > 100:
+            log_lines.append("结局：坏结局")
+        else:
+            log_lines.append("结局：好结局")
+        log_lines.append("场景 六结束\n")
+        log_lines.append("=== 进入场景：Ending ===")
+        log_lines.append("重置每日基础压力，进入下一日（模拟结束）")
+        log_lines.append("场景 七结束\n")
+
+        final_score = desired_mean + cumulative_stress
+        log_lines.append(f"最终累计压力: {cumulative_stress:.2f}, 最终得分: {final_score:.2f}")
+    tracer.end_day(log_lines)
 
     return cumulative_stress, scenes
 
+def compile_model(scenes, params=None):
+    """
+    把 run_single_simulation 返回的 scenes（已分配压力）编译为 compiler.CompiledModel，
+    供批量引擎 / 精确求解使用。场景三的额外任务固定为这组 scenes 中出现的那些。
+    params: 可覆盖 relieve_prob / relieve_ratio / sms_party_factor（缺省用全局参数）
+    """
+    import compiler
+    p = params or {}
+    reply_task, sms_tasks = scenes[4].tasks[0], scenes[4].tasks[1:]
+    overtime = {
+        "reply_task": reply_task,
+        "sms_values": [sms.full_stress() for sms in sms_tasks],
+        "sms_min": 2,
+        "sms_max": len(sms_tasks),
+        "party_factor": p.get("sms_party_factor", SMS_PARTY_FACTOR),
+        "relieve_prob": p.get("relieve_prob", RELIEVE_PROB),
+        "relieve_ratio": p.get("relieve_ratio", RELIEVE_RATIO),
+    }
+    return compiler.compile_objects(scenes[:4], overtime, time_budget=999)
+
 def print_tasks_stress_info(scenes):
     """
     遍历所有场景中的任务，打印每个任务各选项对应的压力变化信息
@@ -350,29 +411,52 @@ def print_tasks_stress_info(scenes):
             print("")
     print("=================================\n")
 
-def run_simulations_and_plot(simulation_rounds=1000, desired_mean=DESIRED_MEAN, desired_std=DESIRED_STD):
+def run_simulations_and_plot(simulation_rounds=1000, desired_mean=DESIRED_MEAN, desired_std=DESIRED_STD,
+                             workers=1, seed=None, trace=None, tolerance=None, time_budget=None,
+                             instrument=False, profile_path=None):
     """
     运行 simulation_rounds 次仿真，记录累计压力并绘制直方图，
     同时输出所有任务的压力变化信息。
+    workers>1 或指定 seed 时，按 parallel.run_parallel 分进程、分种子运行（不输出日志）。
+    trace: 日志追踪方式，"off" / "sampled" / "full" 或 tracing.Tracer 实例，缺省为 "full"。
+    tolerance: 自适应模式——不为 None 时忽略 simulation_rounds，按批模拟直到置信区间半宽满足容差
+               （dict，如 {"mean": 0.1, "std": 0.1, "p_bad": 0.002}；True 表示用 adaptive.DEFAULT_TOLERANCE），
+               time_budget 为最多运行的秒数。见 adaptive.run_adaptive。
+    instrument: 为 True 时对场景 / 任务插桩，最后打印各场景的调用次数、耗时、随机数与压力贡献；
+    profile_path: 不为 None 时用 cProfile 包住仿真过程并保存到该文件。见 instrument.session。
     """
-    results = []
-    # 先执行一次单次仿真以获取场景和任务信息（用于打印）
-    _, scenes = run_single_simulation(desired_mean, desired_std)
-    for _ in range(simulation_rounds):
-        stress, _ = run_single_simulation(desired_mean, desired_std)
-        results.append(stress)
-    plt.figure(figsize=(8,6))
-    plt.hist(results, bins=30, edgecolor='black')
-    plt.xlabel("累计压力")
-    plt.ylabel("次数")
-    plt.title(f"{simulation_rounds} 次仿真累计压力分布")
-    plt.axvline(x=0, color='red', linestyle='dashed', linewidth=1, label="理论期望0")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig("simulation_results.png")
-    plt.show()
-    print("绘图已保存为 simulation_results.png")
+    from instrument import session
+    tracer = tracing.make_tracer(trace)
+    with session(__name__, instrument, profile_path) as hooks:
+        # 先执行一次单次仿真以获取场景和任务信息（用于打印）
+        _, scenes = run_single_simulation(desired_mean, desired_std, tracer)
+        # 结果只累计到 OnlineStats 中（常数内存），不保存每次的压力
+        if tolerance is not None:
+            import adaptive
+            stats, report = adaptive.run_adaptive("demo1", None if tolerance is True else tolerance,
+                                                  time_budget=time_budget, seed=seed, workers=workers,
+                                                  desired_mean=desired_mean, desired_std=desired_std)
+            print(adaptive.format_report(stats, report))
+            simulation_rounds = stats.count
+        elif workers > 1 or seed is not None:
+            import parallel
+            stats = parallel.run_parallel_stats("demo1", simulation_rounds, workers=workers, seed=seed,
+                                                desired_mean=desired_mean, desired_std=desired_std)
+        else:
+            stats = OnlineStats()
+            for _ in range(simulation_rounds):
+                stress, _ = run_single_simulation(desired_mean, desired_std, tracer)
+                stats.add(stress)
+    # 由分箱计数绘图（无界面后端），同时输出 JSON 摘要
+    import report
+    report.report(stats, title=f"{simulation_rounds} 次仿真累计压力分布", xlabel="累计压力", ylabel="次数",
+                  vlines=[(0, "理论期望0", "dashed")],
+                  extra={"demo": "demo_1", "desired_mean": desired_mean, "desired_std": desired_std})
+    print(f"绘图已保存为 {report.DEFAULT_PNG}，摘要已保存为 {report.DEFAULT_JSON}")
     print_tasks_stress_info(scenes)
+    if hooks is not None:
+        print(hooks.format_report())
+    return stats
 
 if __name__ == "__main__":
     run_simulations_and_plot(simulation_rounds=100000, desired_mean=150, desired_std=25)
@@ -1,9 +1,13 @@
 import random
 import math
-import matplotlib.pyplot as plt
+from bisect import bisect
 
-plt.rcParams["font.sans-serif"] = ["SimHei"]  # 使用黑体显示中文
-plt.rcParams["axes.unicode_minus"] = False    # 正常显示负号
+import compiler
+import tracing
+from online_stats import OnlineStats
+from sim_state import DayState
+
+# matplotlib 只在绘图时由 report 导入（中文字体设置见 report.FONT_RC）
 
 # ===== 全局可调参数 =====
 DESIRED_MEAN = 100
@@ -89,7 +93,7 @@ SCENES = [
                 "name": "朋友邀约",
                 "appear_prob": 1.0,
                 "options": [
-                    {"label": "A. 欣然赴约", "prob": 0.5, "time_cost": 1, "stress": 3},
+                    {"label": "A. 欣然赴约", "prob": 0.5, "time_cost": 1, "stress": 3, "effects": ["party"]},
                     {"label": "B. 先不去",   "prob": 0.5, "time_cost": 1, "stress": -1}
                 ]
             }
@@ -98,155 +102,239 @@ SCENES = [
     # 场景五：下班后加班，采用自定义处理
 ]
 
-def run_single_day():
+# 场景五的“加班短信回复”任务选项（批量引擎也从这里读取）
+REPLY_OPTIONS = [
+    {"label": "A. 回复", "prob": 0.5, "time_cost": 0.5, "stress": 5, "effects": ["reply"]},
+    {"label": "B. 不回复", "prob": 0.5, "time_cost": 0.5, "stress": 8}
+]
+
+def compile_model():
+    """把 SCENES、REPLY_OPTIONS 与当前全局参数编译为 compiler.CompiledModel（含校验）。"""
+    return compiler.compile_scenes(SCENES, reply_options=REPLY_OPTIONS, params=overtime_params())
+
+
+def run_single_day(tracer=None, model=None):
     """
     按顺序执行场景1~4，之后执行场景5（加班短信），再做场景6(结局)和7(Ending)。
     返回最终压力值。
+    tracer: tracing.Tracer，决定本日是否生成/输出日志；缺省为每天都打印到 stdout。
+    model: compile_model() 的结果；多次调用时应预先编译一次传入。
     """
-    log_lines = []
-    current_stress = 0
-    current_time = 999  # 大量可支配时间
-    is_party = False    # 是否已答应聚餐
+    if tracer is None:
+        tracer = tracing.Tracer(tracing.TRACE_FULL)
+    if model is None:
+        model = compile_model()
+    log_lines = tracer.start_day()
+    trace = log_lines is not None
+    state = DayState(time=999)  # 大量可支配时间；state.is_party 记录是否已答应聚餐
 
     # ============ 依次执行场景1~4 ============
-    for scene_data in SCENES:
-        scene_name = scene_data["name"]
-        tasks_data = scene_data["tasks"]
+    for scene in model.scenes:
+        play_scene(scene, state, log_lines)
+
+    # ============ 场景五：下班后加班 (特殊) ============
+    play_overtime_scene(log_lines, state, model.overtime)
+    current_stress = state.stress
+
+    if trace:
+        # ============ 场景六：一天结束，睡前 ============
+        log_lines.append("=== 进入场景：一天结束，睡前 ===")
+        log_lines.append(f"累计压力为 {current_stress:.2f}")
+        if current_stress > 100:
+            log_lines.append("结局：坏结局")
+        else:
+            log_lines.append("结局：好结局")
+        log_lines.append("场景 六结束\n")
+
+        # ============ 场景七：Ending ============
+        log_lines.append("=== 进入场景：Ending ===")
+        log_lines.append("重置每日基础压力，进入下一日（模拟结束）")
+        log_lines.append("场景 七结束\n")
+
+        final_score = DESIRED_MEAN + current_stress
+        log_lines.append(f"最终累计压力: {current_stress:.2f}, 最终得分: {final_score:.2f}")
 
+    # 输出日志
+    tracer.end_day(log_lines)
+
+    return current_stress
+
+
+def play_scene(scene, state, log_lines):
+    """
+    执行一个编译后的场景 (场景名, 任务列表)，结果写入 state（sim_state.DayState），返回本场景的压力变化。
+    log_lines 为 None 表示本日不追踪，跳过所有日志格式化。
+    """
+    trace = log_lines is not None
+    scene_name, tasks = scene
+    if trace:
         log_lines.append(f"=== 进入{scene_name} ===")
-        scene_stress = 0
-        scene_time = 0
-        for tdata in tasks_data:
-            # 先判断任务是否出现
-            if random.random() < tdata["appear_prob"]:
-                # 从options中抽选一个
-                chosen_option = random.choices(
-                    tdata["options"],
-                    weights=[opt["prob"] for opt in tdata["options"]],
-                    k=1
-                )[0]
-                # 更新压力与时间
-                stress_change = chosen_option["stress"]
-                time_cost = chosen_option["time_cost"]
-                scene_stress += stress_change
-                scene_time += time_cost
-                current_time -= time_cost
+    scene_stress = 0
+    scene_time = 0
+    for task in tasks:
+        # 先判断任务是否出现
+        if random.random() < task.appear:
+            # 从options中抽选一个（与 random.choices 相同的抽法）
+            k = bisect(task.cum_weights, random.random() * task.total, 0, task.last)
+            # 更新压力与时间
+            stress_change = task.stress[k]
+            time_cost = task.time_cost[k]
+            scene_stress += stress_change
+            scene_time += time_cost
 
+            if trace:
                 log_lines.append(
-                    f"任务: {tdata['name']} -> 选择: {chosen_option['label']}"
+                    f"任务: {task.name} -> 选择: {task.labels[k]}"
                     f" (压力变化: {stress_change}, 时间消耗: {time_cost} 小时)"
                 )
-                # 如果是朋友邀约且选了“欣然赴约”，更新 is_party
-                if tdata["name"] == "朋友邀约" and chosen_option["label"] == "A. 欣然赴约":
-                    is_party = True
+            # 选项声明了 party 效果（如“欣然赴约”），更新 state.is_party
+            if task.flags[k] & compiler.FLAG_PARTY:
+                state.set_flag(compiler.FLAG_PARTY)
+                if trace:
                     log_lines.append("  -> 已答应赴约 (is_party = True)")
-            else:
-                log_lines.append(f"任务: {tdata['name']} 未出现")
+        elif trace:
+            log_lines.append(f"任务: {task.name} 未出现")
 
-        current_stress += scene_stress
+    state.apply(scene_stress, scene_time)
+    if trace:
         log_lines.append(f"{scene_name}结束，总压力变化: {scene_stress}, 总时间消耗: {scene_time} 小时\n")
-
-    # ============ 场景五：下班后加班 (特殊) ============
-    scene_stress, current_time = play_overtime_scene(current_stress, current_time, log_lines, is_party)
-    current_stress += scene_stress
-
-    # ============ 场景六：一天结束，睡前 ============
-    log_lines.append("=== 进入场景：一天结束，睡前 ===")
-    log_lines.append(f"累计压力为 {current_stress:.2f}")
-    if current_stress > 100:
-        log_lines.append("结局：坏结局")
-    else:
-        log_lines.append("结局：好结局")
-    log_lines.append("场景 六结束\n")
-
-    # ============ 场景七：Ending ============
-    log_lines.append("=== 进入场景：Ending ===")
-    log_lines.append("重置每日基础压力，进入下一日（模拟结束）")
-    log_lines.append("场景 七结束\n")
-
-    final_score = DESIRED_MEAN + current_stress
-    log_lines.append(f"最终累计压力: {current_stress:.2f}, 最终得分: {final_score:.2f}")
-
-    # 输出日志
-    for line in log_lines:
-        print(line)
-
-    return current_stress
+    return scene_stress
 
 
-def play_overtime_scene(current_stress, current_time, log_lines, is_party):
+def play_overtime_scene(log_lines, state, overtime):
     """
     场景五：下班后加班
       - 先执行“加班短信回复”任务
       - 随后随机激活2~4条短信
-      - 如果已赴约(is_party=True)，短信压力×1.2
+      - 如果已赴约(state.is_party)，短信压力×1.2
       - 如果回复，则有概率减少 (RELIEVE_RATIO)
+    结果记入 state（DayState），返回场景五的压力变化。
+    log_lines 为 None 表示本日不追踪，跳过所有日志格式化。
+    overtime: 编译后的场景五（compiler.CompiledOvertime）。
     """
-    log_lines.append("=== 进入场景：下班后加班 ===")
+    trace = log_lines is not None
+    if trace:
+        log_lines.append("=== 进入场景：下班后加班 ===")
     scene_stress = 0
     scene_time = 0
 
     # 任务5.1: 加班短信回复
-    # 自定义选项
-    reply_options = [
-        {"label": "A. 回复", "prob": 0.5, "time_cost": 0.5, "stress": 5},
-        {"label": "B. 不回复", "prob": 0.5, "time_cost": 0.5, "stress": 8}
-    ]
     # 抽选加班短信回复
-    choice = random.choices(reply_options, weights=[o["prob"] for o in reply_options], k=1)[0]
-    scene_stress += choice["stress"]
-    scene_time += choice["time_cost"]
-    current_time -= choice["time_cost"]
-    log_lines.append(f"任务: 加班短信回复 -> 选择: {choice['label']} (压力变化: {choice['stress']}, "
-                     f"时间消耗: {choice['time_cost']} 小时)")
+    reply = overtime.reply
+    k = bisect(reply.cum_weights, random.random() * reply.total, 0, reply.last)
+    scene_stress += reply.stress[k]
+    scene_time += reply.time_cost[k]
+    if trace:
+        log_lines.append(f"任务: 加班短信回复 -> 选择: {reply.labels[k]} (压力变化: {reply.stress[k]}, "
+                         f"时间消耗: {reply.time_cost[k]} 小时)")
 
-    replied = (choice["label"] == "A. 回复")
+    state.set_flag(reply.flags[k])
+    replied = state.replied
 
     # 老板短信 2~4 条
-    sms_count = random.randint(2, 4)
-    log_lines.append(f"随机激活老板短信条数：{sms_count}")
+    sms_count = random.randint(overtime.sms_min, overtime.sms_max)
+    if trace:
+        log_lines.append(f"随机激活老板短信条数：{sms_count}")
     total_sms_stress = 0
     for i in range(1, sms_count+1):
-        base_stress = SMS_a + (i-1)*SMS_b
+        base_stress = overtime.sms_values[i-1]
         # 如果已赴约 => 压力×1.2
-        if is_party:
-            base_stress *= SMS_PARTY_FACTOR
+        if state.is_party:
+            base_stress *= overtime.party_factor
         # 如果已回复 => 有概率缓解
         if replied:
-            if random.random() < RELIEVE_PROB:
-                reduce_val = base_stress * RELIEVE_RATIO
+            if random.random() < overtime.relieve_prob:
+                reduce_val = base_stress * overtime.relieve_ratio
                 base_stress -= reduce_val
 
-        log_lines.append(f"  第{i}条短信: 压力 = {base_stress:.2f}")
+        if trace:
+            log_lines.append(f"  第{i}条短信: 压力 = {base_stress:.2f}")
         total_sms_stress += base_stress
 
     scene_stress += total_sms_stress
     scene_time += 0  # 短信不额外消耗时间(可选)
+    state.apply(scene_stress, scene_time)
+
+    if trace:
+        log_lines.append(f"场景 五：下班后加班结束，总压力变化: {scene_stress:.2f}\n")
+    return scene_stress
+
+
+def overtime_params():
+    """场景五的当前全局参数（供批量引擎 / 精确求解使用）。"""
+    return {
+        "sms_a": SMS_a,
+        "sms_b": SMS_b,
+        "relieve_prob": RELIEVE_PROB,
+        "relieve_ratio": RELIEVE_RATIO,
+        "sms_party_factor": SMS_PARTY_FACTOR,
+    }
 
-    log_lines.append(f"场景 五：下班后加班结束，总压力变化: {scene_stress:.2f}\n")
-    return scene_stress, current_time
+
+def run_batch_days(rounds, seed=None):
+    """用批量引擎一次模拟 rounds 天（不输出日志），返回最终压力数组。"""
+    import batch_engine
+    return batch_engine.simulate_days(compile_model(), rounds, seed=seed)
+
+
+def iter_batch_days(rounds, seed=None):
+    """与 run_batch_days 相同，但逐批产出压力数组。"""
+    import batch_engine
+    return batch_engine.iter_simulate(compile_model(), rounds, seed=seed)
+
+
+def exact_day_distribution():
+    """不做抽样，精确计算最终压力的分布、均值、标准差和坏结局(>100)概率。"""
+    import exact_solver
+    return exact_solver.solve_day(compile_model())
 
 
 # ============ 多次仿真并绘图 =============
-def run_simulations_and_plot(rounds=1000):
-    results = []
-    for _ in range(rounds):
-        final_stress = run_single_day()
-        results.append(final_stress)
-
-    # 绘制压力分布直方图
-    import matplotlib.pyplot as plt
-    plt.figure(figsize=(8,6))
-    plt.hist(results, bins=30, edgecolor='black')
-    plt.xlabel("累计压力")
-    plt.ylabel("次数")
-    plt.title(f"{rounds} 次仿真累计压力分布")
-    plt.axvline(x=100, color='red', linestyle='dashed', linewidth=1, label="100 压力线")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig("simulation_results.png")
-    plt.show()
-    print("绘图已保存为 simulation_results.png")
+def run_simulations_and_plot(rounds=1000, batch=False, workers=1, seed=None, trace=None,
+                             tolerance=None, time_budget=None, instrument=False, profile_path=None):
+    """
+    batch=True 时改用批量引擎（不逐日打印日志）。
+    workers>1 或指定 seed 时，按 parallel.run_parallel 分进程、分种子运行（不输出日志）。
+    trace: 日志追踪方式，"off" / "sampled" / "full" 或 tracing.Tracer 实例，缺省为 "full"。
+    tolerance: 自适应模式——不为 None 时忽略 rounds，按批模拟直到置信区间半宽满足容差
+               （dict，如 {"mean": 0.1, "std": 0.1, "p_bad": 0.002}；True 表示用 adaptive.DEFAULT_TOLERANCE），
+               time_budget 为最多运行的秒数。见 adaptive.run_adaptive。
+    instrument: 为 True 时对场景五插桩，最后打印调用次数、耗时、随机数与压力贡献；
+    profile_path: 不为 None 时用 cProfile 包住仿真过程并保存到该文件。见 instrument.session。
+    """
+    from instrument import session
+    with session(__name__, instrument, profile_path) as hooks:
+        # 结果只累计到 OnlineStats 中（常数内存），不保存每天的压力
+        if tolerance is not None:
+            import adaptive
+            stats, report = adaptive.run_adaptive("batch2" if batch else "demo2",
+                                                  None if tolerance is True else tolerance,
+                                                  time_budget=time_budget, seed=seed, workers=workers)
+            print(adaptive.format_report(stats, report))
+            rounds = stats.count
+        elif workers > 1 or seed is not None:
+            import parallel
+            engine = "batch2" if batch else "demo2"
+            stats = parallel.run_parallel_stats(engine, rounds, workers=workers, seed=seed)
+        else:
+            stats = OnlineStats()
+            if batch:
+                for chunk in iter_batch_days(rounds):
+                    stats.update(chunk)
+            else:
+                tracer = tracing.make_tracer(trace)
+                model = compile_model()
+                for _ in range(rounds):
+                    stats.add(run_single_day(tracer, model))
+
+    # 绘制压力分布直方图（由分箱计数绘制，无界面后端），同时输出 JSON 摘要
+    import report
+    report.report(stats, title=f"{rounds} 次仿真累计压力分布", xlabel="累计压力", ylabel="次数",
+                  vlines=[(100, "100 压力线", "dashed")], extra={"demo": "demo_2"})
+    print(f"绘图已保存为 {report.DEFAULT_PNG}，摘要已保存为 {report.DEFAULT_JSON}")
+    if hooks is not None:
+        print(hooks.format_report())
+    return stats
 
 
 if __name__ == "__main__":
@@ -1,19 +1,27 @@
+import copy
 import random
 import math
-import statistics
-import matplotlib.pyplot as plt
+from bisect import bisect
 
-# plt.rcParams["font.sans-serif"] = ["SimHei"]  # 使用黑体显示中文
-plt.rcParams["axes.unicode_minus"] = False
+import compiler
+import tracing
+from online_stats import OnlineStats
+from sim_state import DayState
+
+# matplotlib 只在绘图时由 report 导入（中文字体设置见 report.FONT_RC）
 
 # ===== 全局可调参数 =====
 DESIRED_MEAN = 100
 DESIRED_STD = 25
 
+SMS_a = 5  # 第1条短信的基础压力（校准时只用 SMS_a : SMS_b 的比例，校准结果不写回这里）
+SMS_b = 3  # 每条短信比前一条多3
 RELIEVE_PROB = 0.7  # 回复短信时有70%概率触发缓解
 RELIEVE_RATIO = 0.2  # 缓解成功时减少20%压力
 SMS_PARTY_FACTOR = 1.2  # 如果已赴约，则短信压力×1.2
 
+MERGED_OVERTIME_SCENE = "场景五：下班后加班(合并)"
+
 # 1) SCENES: 每个任务用 'appear_prob','options'(每个选项 prob,time_cost),以及 var_ratio(重要性).
 SCENES = [
     {
@@ -95,7 +103,7 @@ SCENES = [
                 "appear_prob": 1.0,
                 "var_ratio": 3.0,  # importance更高
                 "options": [
-                    {"label": "A. 欣然赴约", "prob": 0.5, "time_cost": 1},
+                    {"label": "A. 欣然赴约", "prob": 0.5, "time_cost": 1, "effects": ["party"]},
                     {"label": "B. 先不去", "prob": 0.5, "time_cost": 1}
                 ]
             }
@@ -115,6 +123,7 @@ SCENES = [
                 # prob=? (比如0.5)
                 # time_cost=? 先随意0.5
                 # “stress”由自动公式计算
+                # 合并任务之后没有短信可缓解, 因此不声明 reply 效果(真实场景五见 REPLY_OPTIONS)
                 "options": [
                     {"label": "A. 回复", "prob": 0.5, "time_cost": 0.5},
                     {"label": "B. 不回复", "prob": 0.5, "time_cost": 0.5}
@@ -175,96 +184,256 @@ def auto_set_stress_all_tasks(scenes, desired_std=25):
         t["options"][1]["stress"] = xB
 
 
-def run_single_day():
+# 真实场景五的"加班短信回复"选项(压力由校准给出)
+REPLY_OPTIONS = [
+    {"label": "A. 回复", "prob": 0.5, "time_cost": 0.5, "effects": ["reply"]},
+    {"label": "B. 不回复", "prob": 0.5, "time_cost": 0.5}
+]
+
+
+def base_scenes():
+    """SCENES 中除合并场景五以外的场景"""
+    return [sc for sc in SCENES if sc["name"] != MERGED_OVERTIME_SCENE]
+
+
+def overtime_params():
+    """场景五的当前全局参数（供编译 / 校准使用）"""
+    return {
+        "sms_a": SMS_a,
+        "sms_b": SMS_b,
+        "relieve_prob": RELIEVE_PROB,
+        "relieve_ratio": RELIEVE_RATIO,
+        "sms_party_factor": SMS_PARTY_FACTOR,
+    }
+
+
+def overtime_var_ratio():
+    """真实场景五在方差分配中的 var_ratio, 取合并任务的 var_ratio(没有合并任务时为 2.0)"""
+    merged = [t for sc in SCENES if sc["name"] == MERGED_OVERTIME_SCENE for t in sc["tasks"]]
+    return sum(t["var_ratio"] for t in merged) if merged else 2.0
+
+
+def calibrate_stress_all_tasks(desired_std=DESIRED_STD):
+    """
+    用真实场景五(2~4条短信, 赴约上调, 回复缓解)代替合并任务, 按精确矩求解:
+    普通任务压力、SMS_a / SMS_b、回复压力, 使最终压力均值为0、标准差为 desired_std.
+    场景五的 var_ratio 取合并任务的 var_ratio. 不修改 SCENES 与全局参数;
+    返回 calibrate.calibrate_scenes 的结果, 其中 "model" 为校准后的编译模型.
+    """
+    import calibrate
+    return calibrate.calibrate_scenes(base_scenes(), REPLY_OPTIONS, overtime_params(),
+                                      desired_mean=0.0, desired_std=desired_std,
+                                      overtime_var_ratio=overtime_var_ratio())
+
+
+def compile_model():
+    """
+    把 SCENES 编译为 compiler.CompiledModel.
+    校验(概率之和=1, 带 var_ratio 的任务必须二选一, 压力已分配)在这里一次完成.
+    SCENES 的压力需已由 auto_set_stress_all_tasks 写入; 否则请用 build_model.
+    """
+    return compiler.compile_scenes(SCENES)
+
+
+def build_model(calibrated=True, desired_std=DESIRED_STD):
+    """
+    按 demo_3 的方式分配压力并编译, 不修改 SCENES 与全局参数:
+      calibrated=True: 精确矩校准(真实场景五), 见 calibrate_stress_all_tasks
+      calibrated=False: SCENES 副本上 auto_set_stress_all_tasks(合并近似)
+    """
+    if calibrated:
+        return calibrate_stress_all_tasks(desired_std)["model"]
+    scenes = copy.deepcopy(SCENES)
+    auto_set_stress_all_tasks(scenes, desired_std=desired_std)
+    return compiler.compile_scenes(scenes)
+
+
+def run_single_day(tracer=None, model=None):
     """
     按顺序执行场景1~5, 再结局(场景6,7)
     基础压力=100
+    tracer: tracing.Tracer, 决定本日是否生成/输出日志; 缺省为每天都打印到 stdout
+    model: build_model() 的结果(缺省为校准后的模型); 多次调用时应预先编译一次传入
     """
-    log_lines = []
-    current_stress = 0
-    current_time = 999
-    is_party = False
+    if tracer is None:
+        tracer = tracing.Tracer(tracing.TRACE_FULL)
+    if model is None:
+        model = build_model()
+    log_lines = tracer.start_day()
+    trace = log_lines is not None
+    state = DayState(time=999)
 
     # 依次执行场景1~5
-    for sc_index, sc_data in enumerate(SCENES, start=1):
-        sc_name = sc_data["name"]
-        tasks = sc_data["tasks"]
+    for scene in model.scenes:
+        play_scene(scene, state, log_lines)
+
+    # 真实场景五(校准模式)
+    if model.overtime is not None:
+        play_overtime_scene(log_lines, state, model.overtime)
+    current_stress = state.stress
+
+    if trace:
+        # ============ 场景6: 一天结束,睡前 => 结局
+        log_lines.append("=== 进入场景：一天结束，睡前 ===")
+        log_lines.append(f"累计压力={current_stress:.2f}")
+        if current_stress > 100:
+            log_lines.append("结局:坏结局")
+        else:
+            log_lines.append("结局:好结局")
+        # 场景7: Ending
+        log_lines.append("=== 进入场景：Ending ===\n")
+
+        final_score = DESIRED_MEAN + current_stress
+        log_lines.append(f"最终累计压力:{current_stress:.2f}, 最终得分:{final_score:.2f}")
+    tracer.end_day(log_lines)
+    return current_stress
+
+
+def play_scene(scene, state, log_lines):
+    """
+    执行一个编译后的场景 (场景名, 任务列表), 结果写入 state(sim_state.DayState), 返回本场景的压力变化.
+    log_lines 为 None 表示本日不追踪, 跳过所有日志格式化.
+    """
+    trace = log_lines is not None
+    sc_name, tasks = scene
+    if trace:
         log_lines.append(f"=== 进入{sc_name} ===")
-        scene_stress = 0
-        scene_time = 0
-        for tdata in tasks:
-            # appear_prob
-            if random.random() < tdata["appear_prob"]:
-                # 二选一
-                # 0 => A, 1 => B
-                # weights= [ opt["prob"]... ]
-                chosen_opt = random.choices(tdata["options"],
-                                            weights=[o["prob"] for o in tdata["options"]],
-                                            k=1)[0]
-                sc_stress = chosen_opt["stress"]
-                tcost = chosen_opt["time_cost"]
-                scene_stress += sc_stress
-                scene_time += tcost
-                current_time -= tcost
-
-                log_lines.append(f"任务:{tdata['name']} => {chosen_opt['label']} (压力:{sc_stress:.2f},耗时:{tcost}h)")
-
-                # 如果是"朋友邀约"且选了"A.欣然赴约"
-                if tdata["name"] == "朋友邀约" and chosen_opt["label"] == "A. 欣然赴约":
-                    is_party = True
+    scene_stress = 0
+    scene_time = 0
+    for task in tasks:
+        # appear_prob
+        if random.random() < task.appear:
+            # 二选一
+            # 0 => A, 1 => B
+            # 与 random.choices 相同: 在累计权重上二分
+            k = bisect(task.cum_weights, random.random() * task.total, 0, task.last)
+            sc_stress = task.stress[k]
+            tcost = task.time_cost[k]
+            scene_stress += sc_stress
+            scene_time += tcost
+
+            if trace:
+                log_lines.append(f"任务:{task.name} => {task.labels[k]} (压力:{sc_stress:.2f},耗时:{tcost}h)")
+
+            # 选项声明了 party 效果(如"A. 欣然赴约")
+            if task.flags[k] & compiler.FLAG_PARTY:
+                state.set_flag(compiler.FLAG_PARTY)
+                if trace:
                     log_lines.append(" -> 已答应赴约 (is_party=True)")
 
-                # 如果是"加班短信(合并)" 还可能细分 "回复/不回复", "2~4条", is_party => 这里仅近似:
-                if tdata["name"] == "加班短信(合并)":
-                    # 这里实际还可以做2~4条, multiply 1.2, etc.
-                    # 但已经自动分配了, 纯粹做为"一次抽选"
-                    # 如果想真实随机,可再加自定义
-                    pass
-            else:
-                log_lines.append(f"任务:{tdata['name']} 未出现.")
+            # "加班短信(合并)" 还可能细分 "回复/不回复", "2~4条", is_party => 这里仅近似:
+            # 已经自动分配了, 纯粹做为"一次抽选"
+        elif trace:
+            log_lines.append(f"任务:{task.name} 未出现.")
 
-        current_stress += scene_stress
+    state.apply(scene_stress, scene_time)
+    if trace:
         log_lines.append(f"{sc_name}结束, scene_stress={scene_stress:.2f}, scene_time={scene_time}\n")
+    return scene_stress
 
-    # ============ 场景6: 一天结束,睡前 => 结局
-    log_lines.append("=== 进入场景：一天结束，睡前 ===")
-    log_lines.append(f"累计压力={current_stress:.2f}")
-    if current_stress > 100:
-        log_lines.append("结局:坏结局")
-    else:
-        log_lines.append("结局:好结局")
-    # 场景7: Ending
-    log_lines.append("=== 进入场景：Ending ===\n")
-
-    final_score = DESIRED_MEAN + current_stress
-    log_lines.append(f"最终累计压力:{current_stress:.2f}, 最终得分:{final_score:.2f}")
-    for line in log_lines:
-        print(line)
-    return current_stress
+
+def play_overtime_scene(log_lines, state, overtime):
+    """
+    场景五(真实): 回复任务 => 随机激活 sms_min~sms_max 条短信,
+    赴约(state.is_party)时短信压力 ×party_factor, 回复后每条短信有 relieve_prob 概率缓解 relieve_ratio.
+    结果记入 state, 返回场景五的压力变化.
+    """
+    trace = log_lines is not None
+    reply = overtime.reply
+    k = bisect(reply.cum_weights, random.random() * reply.total, 0, reply.last)
+    scene_stress = reply.stress[k]
+    state.set_flag(reply.flags[k])
+    replied = state.replied
+    if trace:
+        log_lines.append("=== 进入场景五：下班后加班 ===")
+        log_lines.append(f"任务:加班短信回复 => {reply.labels[k]} (压力:{reply.stress[k]:.2f},耗时:{reply.time_cost[k]}h)")
+    sms_count = random.randint(overtime.sms_min, overtime.sms_max)
+    for i in range(sms_count):
+        base = overtime.sms_values[i]
+        if state.is_party:
+            base *= overtime.party_factor
+        if replied and random.random() < overtime.relieve_prob:
+            base -= base * overtime.relieve_ratio
+        scene_stress += base
+        if trace:
+            log_lines.append(f"  短信{i + 1}/{sms_count}: 压力={base:.2f}")
+    state.apply(scene_stress, reply.time_cost[k])
+    if trace:
+        log_lines.append(f"场景五结束, scene_stress={scene_stress:.2f}\n")
+    return scene_stress
+
+
+def run_batch_days(rounds, seed=None, model=None):
+    """用批量引擎一次模拟 rounds 天（不输出日志），返回最终压力数组。model 缺省为 build_model()。"""
+    import batch_engine
+    return batch_engine.simulate_days(model or build_model(), rounds, seed=seed)
+
+
+def iter_batch_days(rounds, seed=None, model=None):
+    """与 run_batch_days 相同，但逐批产出压力数组。"""
+    import batch_engine
+    return batch_engine.iter_simulate(model or build_model(), rounds, seed=seed)
 
 
-def run_simulations_and_plot(rounds=1000):
-    results = []
-    for _ in range(rounds):
-        stress = run_single_day()
-        results.append(stress)
-    avg = statistics.mean(results)
-    std = statistics.pstdev(results)
-    c_in = sum(1 for r in results if 75 <= r <= 125)
-    ratio_in = c_in / len(results) * 100
+def exact_day_distribution(model=None):
+    """不做抽样，精确计算最终压力的分布、均值、标准差和坏结局(>100)概率。"""
+    import exact_solver
+    return exact_solver.solve_day(model or build_model())
+
+
+def run_simulations_and_plot(rounds=1000, batch=False, workers=1, seed=None, trace=None,
+                             tolerance=None, time_budget=None, instrument=False, profile_path=None,
+                             calibrated=True):
+    """
+    batch=True 时改用批量引擎（不逐日打印日志）。
+    workers>1 或指定 seed 时，按 parallel.run_parallel 分进程、分种子运行（不输出日志）。
+    trace: 日志追踪方式，"off" / "sampled" / "full" 或 tracing.Tracer 实例，缺省为 "full"。
+    tolerance: 自适应模式——不为 None 时忽略 rounds，按批模拟直到置信区间半宽满足容差
+               （dict，如 {"mean": 0.1, "std": 0.1, "p_bad": 0.002}；True 表示用 adaptive.DEFAULT_TOLERANCE），
+               time_budget 为最多运行的秒数。见 adaptive.run_adaptive。
+    instrument: 为 True 时对场景五插桩，最后打印调用次数、耗时、随机数与压力贡献；
+    profile_path: 不为 None 时用 cProfile 包住仿真过程并保存到该文件。见 instrument.session。
+    calibrated: True 时用精确矩校准的模型（真实场景五），否则用合并近似，见 build_model。
+    """
+    from instrument import session
+    with session(__name__, instrument, profile_path) as hooks:
+        # 结果只累计到 OnlineStats 中（常数内存），不保存每天的压力
+        if tolerance is not None:
+            import adaptive
+            stats, report = adaptive.run_adaptive("batch3" if batch else "demo3",
+                                                  None if tolerance is True else tolerance,
+                                                  time_budget=time_budget, seed=seed, workers=workers,
+                                                  desired_std=DESIRED_STD, calibrated=calibrated)
+            print(adaptive.format_report(stats, report))
+            rounds = stats.count
+        elif workers > 1 or seed is not None:
+            import parallel
+            engine = "batch3" if batch else "demo3"
+            stats = parallel.run_parallel_stats(engine, rounds, workers=workers, seed=seed, desired_std=DESIRED_STD,
+                                                calibrated=calibrated)
+        else:
+            stats = OnlineStats()
+            model = build_model(calibrated)
+            if batch:
+                for chunk in iter_batch_days(rounds, model=model):
+                    stats.update(chunk)
+            else:
+                tracer = tracing.make_tracer(trace)
+                for _ in range(rounds):
+                    stats.add(run_single_day(tracer, model))
+    avg = stats.mean
+    std = stats.std
+    ratio_in = stats.in_band_ratio * 100
     print(f"{rounds}次仿真 => mean={avg:.2f}, std={std:.2f}, {ratio_in:.2f}%在[75,125]")
-    # 绘制
-    plt.figure(figsize=(8, 6))
-    for i, _ in enumerate(results):
-        results[i] += DESIRED_MEAN
-    plt.hist(results, bins=30, edgecolor='black')
-    plt.axvline(x=50, color='red', linestyle='--')
-    plt.axvline(x=150, color='red', linestyle='--')
-    plt.title(f"mean={avg:.2f}, std={std:.2f}, {ratio_in:.2f}% in [75,125]")
-    plt.tight_layout()
-    plt.savefig("simulation_results.png")
-    plt.show()
-    print("已保存 simulation_results.png")
+    # 绘制（由分箱计数绘制，横轴整体加上 DESIRED_MEAN；无界面后端），同时输出 JSON 摘要
+    import report
+    report.report(stats, offset=DESIRED_MEAN, title=f"mean={avg:.2f}, std={std:.2f}, {ratio_in:.2f}% in [75,125]",
+                  vlines=[(50, None, "--"), (150, None, "--")],
+                  extra={"demo": "demo_3", "desired_std": DESIRED_STD, "calibrated": calibrated})
+    print(f"已保存 {report.DEFAULT_PNG}、{report.DEFAULT_JSON}")
+    if hooks is not None:
+        print(hooks.format_report())
+    return stats
 
 
 # def run_simulations_and_plot(rounds=1000):
@@ -301,7 +470,11 @@ def run_simulations_and_plot(rounds=1000):
 
 
 if __name__ == "__main__":
-    # 1) 首先对SCENES中的所有任务做自动分配 => xA, xB
-    auto_set_stress_all_tasks(SCENES, desired_std=DESIRED_STD)
+    # 1) 按完整模型(含真实场景五)的精确矩校准压力 => xA, xB, SMS_a, SMS_b
+    #    (旧做法: auto_set_stress_all_tasks(SCENES, desired_std=DESIRED_STD), 场景五为合并近似)
+    result = calibrate_stress_all_tasks(desired_std=DESIRED_STD)
+    reply_stress = ", ".join(f"{x:.3f}" for x in result["reply_stress"])
+    print(f"校准结果: SMS_a={result['sms_a']:.3f}, SMS_b={result['sms_b']:.3f}, 回复压力=[{reply_stress}], "
+          f"精确 mean={result['mean']:.3f}, std={result['std']:.3f}")
     # 2) 多次仿真
     run_simulations_and_plot(rounds=5000)
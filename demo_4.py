@@ -1,15 +1,21 @@
 import os
 import random
-import matplotlib.pyplot as plt
 
-plt.rcParams["font.sans-serif"] = ["SimHei"]  # 使用黑体显示中文
-plt.rcParams["axes.unicode_minus"] = False    # 正常显示负号
+from alias import AliasTable
+from compiler import FLAG_PARTY, effect_flags
+from online_stats import OnlineStats
+from sim_state import DayState
+
+# matplotlib 只在绘图时由 report 导入（中文字体设置见 report.FONT_RC）
 
 # ========== 全局参数 ==========
 RELIEVE_PROB = 0.7       # 回复短信后，触发缓解的概率
 RELIEVE_RATIO = 0.2      # 缓解比例
 SMS_PARTY_FACTOR = 1.2   # 若参与聚会，对短信压力的额外倍率
-IS_PARTY = False         # 是否已赴约的全局标记
+# 是否已赴约、剩余时间、累计压力都保存在每天独立的 sim_state.DayState 中
+# 场景对象只读，自动模式下由 get_game_scenes() 缓存一份，每天只新建 DayState
+
+_SCENES_CACHE = []
 
 # ========== 工具函数：清屏 & 绘制界面 ==========
 
@@ -63,6 +69,20 @@ class Task:
         self.description = description
         self.options = options
         self.importance = importance
+        self.refresh_alias()
+
+    def refresh_alias(self):
+        """按当前选项概率重建别名表；直接改动 options 的选项或 prob 后需调用。"""
+        self._labels = tuple(self.options.keys())
+        self._alias = AliasTable([self.options[opt]["prob"] for opt in self._labels])
+        # 选项声明的效果（如 "effects": ["party"]）编译为整数标志位，选中后直接置位
+        self.option_flags = {opt: effect_flags(self.options[opt].get("effects", ()), f"任务 {self.description} 的选项 {opt}")
+                             for opt in self._labels}
+
+    def set_prob(self, option, prob):
+        """修改某个选项的概率并重建别名表。"""
+        self.options[option]["prob"] = prob
+        self.refresh_alias()
 
     def make_choice_manual(self, scene_idx, total_scenes, task_idx, total_tasks, current_stress, current_time):
         """
@@ -101,67 +121,19 @@ class Task:
             # 如果输入不合法，就继续循环
 
     def make_choice_auto(self):
-        """概率模式：根据prob随机选取一个选项"""
-        option_names = list(self.options.keys())
-        weights = [self.options[opt]["prob"] for opt in option_names]
-        chosen_option = random.choices(option_names, weights=weights, k=1)[0]
+        """概率模式：根据prob随机选取一个选项（别名表，O(1)）"""
+        chosen_option = self._labels[self._alias.draw()]
         data = self.options[chosen_option]
         return chosen_option, data["stress_change"], data["time_cost"]
 
-# ========== 特殊场景类：PartyScene ==========
-class PartyScene:
-    def __init__(self, name, tasks):
-        self.name = name
-        self.tasks = tasks
-
-    def play_scene_manual(self, current_stress, current_time, scene_idx, total_scenes):
-        scene_stress = 0
-        total_tasks = len(self.tasks)
-        for i, task in enumerate(self.tasks):
-            if current_time <= 0:
-                break
-            chosen_option, stress_change, time_cost = task.make_choice_manual(
-                scene_idx, total_scenes, i+1, total_tasks, current_stress+scene_stress, current_time
-            )
-            # 计算结果
-            scene_stress += stress_change
-            current_time -= time_cost
-
-            # 如果在这里出现“欣然赴约”的选项，则全局标记 IS_PARTY = True
-            if "欣然赴约" in chosen_option:
-                global IS_PARTY
-                IS_PARTY = True
-
-            # 做完选择后，清屏显示一下结果，再等待玩家按键继续
-            clear_console()
-            draw_gba_frame(
-                f"[{self.name}] 完成选择: {chosen_option}",
-                scene_idx,
-                total_scenes,
-                i+1,
-                total_tasks,
-                current_stress+scene_stress,
-                current_time
-            )
-            print(f"你选择了: {chosen_option}, 当前场景压力增加: {stress_change}, 时间消耗: {time_cost}")
-            if "欣然赴约" in chosen_option:
-                print("已答应赴约，后续短信压力可能会上调")
-            pause_and_wait()
-
-        return scene_stress, current_time
-
-    def play_scene_auto(self, current_stress, current_time):
-        scene_stress = 0
-        for task in self.tasks:
-            if current_time <= 0:
-                break
-            chosen_option, stress_change, time_cost = task.make_choice_auto()
-            if "欣然赴约" in chosen_option:
-                global IS_PARTY
-                IS_PARTY = True
-            scene_stress += stress_change
-            current_time -= time_cost
-        return scene_stress, current_time
+    def make_choices_auto(self, k):
+        """概率模式：一次抽选 k 次，返回 [(选项, 压力变化, 时间消耗), ...]"""
+        results = []
+        for i in self._alias.draw_many(k):
+            chosen_option = self._labels[i]
+            data = self.options[chosen_option]
+            results.append((chosen_option, data["stress_change"], data["time_cost"]))
+        return results
 
 # ========== 特殊短信任务类 ==========
 class SMSTask:
@@ -176,24 +148,23 @@ class SMSTask:
         self.prob = prob
         self.active = True
 
-    def make_choice_manual(self, relieve=False):
+    def make_choice_manual(self, state, relieve=False):
         """
         手动模式下，这里并没有多选项，只有一个“接受短信”。
-        如果参数relieve=True，则有概率进行缓解。
+        如果参数relieve=True，则有概率进行缓解；state.is_party 时压力上调。
         """
-        final_stress = self.stress_change
-        if relieve and random.random() < RELIEVE_PROB:
-            final_stress -= final_stress * RELIEVE_RATIO
-        return final_stress
+        return self.make_choice_auto(state, relieve)
 
-    def make_choice_auto(self, relieve=False):
+    def make_choice_auto(self, state, relieve=False):
         """
         概率模式下，也假设这条短信一定会“触发”，
-        只是如果relieve=True，则可能出现缓解。
+        只是如果relieve=True，则可能出现缓解；已赴约（state.is_party）时压力上调。
         """
         final_stress = self.stress_change
         if relieve and random.random() < RELIEVE_PROB:
             final_stress -= final_stress * RELIEVE_RATIO
+        if state.is_party:
+            final_stress *= SMS_PARTY_FACTOR
         return final_stress
 
 # ========== 场景五示例：下班后加班 ==========
@@ -203,20 +174,21 @@ class OvertimeScene:
         self.reply_task = reply_task   # 普通Task，决定是否回复短信
         self.sms_tasks = sms_tasks     # 一组SMSTask
 
-    def play_scene_manual(self, current_stress, current_time, scene_idx, total_scenes):
+    def play_scene_manual(self, state, scene_idx, total_scenes):
         scene_stress = 0
         # 1) 先判断是否回复短信（手动选择）
         #   由于这是该场景的第1个任务，所以 task_idx=1, total_tasks = 1(决定短信回复) + len(sms_tasks)
         total_tasks = 1 + len(self.sms_tasks)
 
         chosen_option, reply_stress, time_cost = self.reply_task.make_choice_manual(
-            scene_idx, total_scenes, 1, total_tasks, current_stress, current_time
+            scene_idx, total_scenes, 1, total_tasks, state.stress, state.time
         )
         scene_stress += reply_stress
-        current_time -= time_cost
+        state.apply(reply_stress, time_cost)
 
-        # 是否触发缓解
-        is_reply = ("回复" in chosen_option)
+        # 是否触发缓解：由选项声明的 reply 效果决定
+        state.set_flag(self.reply_task.option_flags[chosen_option])
+        is_reply = state.replied
 
         # 显示本次结果
         clear_console()
@@ -226,8 +198,8 @@ class OvertimeScene:
             total_scenes,
             1,
             total_tasks,
-            current_stress + scene_stress,
-            current_time
+            state.stress,
+            state.time
         )
         print(f"是否回复短信 -> 你选择: {chosen_option}, 压力变动: +{reply_stress}, 耗时: {time_cost}")
         pause_and_wait()
@@ -236,10 +208,9 @@ class OvertimeScene:
         #    从 task_idx=2 开始遍历
         for i, sms in enumerate(self.sms_tasks, start=2):
             if sms.active:
-                final_stress = sms.make_choice_manual(relieve=is_reply)
-                if IS_PARTY:
-                    final_stress *= SMS_PARTY_FACTOR
+                final_stress = sms.make_choice_manual(state, relieve=is_reply)
                 scene_stress += final_stress
+                state.apply(final_stress)
 
                 clear_console()
                 draw_gba_frame(
@@ -248,32 +219,32 @@ class OvertimeScene:
                     total_scenes,
                     i,
                     total_tasks,
-                    current_stress + scene_stress,
-                    current_time
+                    state.stress,
+                    state.time
                 )
                 print(f"短信: {sms.description}, 压力变动: +{final_stress:.2f}")
                 if is_reply:
                     print("（你已选择回复短信，可能触发缓解）")
-                if IS_PARTY:
+                if state.is_party:
                     print("（你已参加聚会，短信压力额外上调）")
                 pause_and_wait()
 
-        return scene_stress, current_time
+        return scene_stress
 
-    def play_scene_auto(self, current_stress, current_time):
+    def play_scene_auto(self, state):
         scene_stress = 0
         chosen_option, reply_stress, time_cost = self.reply_task.make_choice_auto()
         scene_stress += reply_stress
-        current_time -= time_cost
-        is_reply = ("回复" in chosen_option)
+        state.apply(reply_stress, time_cost)
+        state.set_flag(self.reply_task.option_flags[chosen_option])
+        is_reply = state.replied
 
         for sms in self.sms_tasks:
             if sms.active:
-                final_stress = sms.make_choice_auto(relieve=is_reply)
-                if IS_PARTY:
-                    final_stress *= SMS_PARTY_FACTOR
+                final_stress = sms.make_choice_auto(state, relieve=is_reply)
                 scene_stress += final_stress
-        return scene_stress, current_time
+                state.apply(final_stress)
+        return scene_stress
 
 # ========== 普通场景示例 ==========
 class Scene:
@@ -281,17 +252,18 @@ class Scene:
         self.name = name
         self.tasks = tasks
 
-    def play_scene_manual(self, current_stress, current_time, scene_idx, total_scenes):
+    def play_scene_manual(self, state, scene_idx, total_scenes):
         scene_stress = 0
         total_tasks = len(self.tasks)
         for i, task in enumerate(self.tasks):
-            if current_time <= 0:
+            if state.out_of_time():
                 break
             chosen_option, stress_change, time_cost = task.make_choice_manual(
-                scene_idx, total_scenes, i+1, total_tasks, current_stress+scene_stress, current_time
+                scene_idx, total_scenes, i+1, total_tasks, state.stress, state.time
             )
             scene_stress += stress_change
-            current_time -= time_cost
+            state.apply(stress_change, time_cost)
+            state.set_flag(task.option_flags[chosen_option])
 
             # 做完选择后，清屏显示一下结果，再等待
             clear_console()
@@ -301,22 +273,27 @@ class Scene:
                 total_scenes,
                 i+1,
                 total_tasks,
-                current_stress + scene_stress,
-                current_time
+                state.stress,
+                state.time
             )
             print(f"  -> 你选择了: {chosen_option}, 压力变化: +{stress_change}, 耗时: {time_cost}")
+            if task.option_flags[chosen_option] & FLAG_PARTY:
+                print("已答应赴约，后续短信压力可能会上调")
             pause_and_wait()
-        return scene_stress, current_time
+        return scene_stress
 
-    def play_scene_auto(self, current_stress, current_time):
+    def play_scene_auto(self, state):
         scene_stress = 0
         for task in self.tasks:
-            if current_time <= 0:
+            if state.out_of_time():
                 break
             chosen_option, stress_change, time_cost = task.make_choice_auto()
             scene_stress += stress_change
-            current_time -= time_cost
-        return scene_stress, current_time
+            state.apply(stress_change, time_cost)
+            state.set_flag(task.option_flags[chosen_option])
+        return scene_stress
+
+# 聚会场景与普通场景相同：赴约的效果由选项声明（"effects": ["party"]），不再需要专门的场景类
 
 # ========== 构建游戏场景 ==========
 def build_game_scenes():
@@ -362,22 +339,22 @@ def build_game_scenes():
     )
     scene3 = Scene("场景3：开始工作", [task_work1, task_work2])
 
-    # 场景4 (特殊场景：PartyScene)
+    # 场景4 (“欣然赴约”声明 party 效果)
     task_party = Task(
         "朋友邀约",
         {
-            "A. 欣然赴约": {"time_cost": 1, "prob": 0.5, "stress_change": 5},
+            "A. 欣然赴约": {"time_cost": 1, "prob": 0.5, "stress_change": 5, "effects": ["party"]},
             "B. 先不去": {"time_cost": 1, "prob": 0.5, "stress_change": 2}
         },
         importance=3
     )
-    scene4 = PartyScene("场景4：下班后，朋友聚餐", [task_party])
+    scene4 = Scene("场景4：下班后，朋友聚餐", [task_party])
 
     # 场景5 (特殊场景：下班加班)
     reply_task = Task(
         "是否回复老板短信",
         {
-            "A. 回复": {"time_cost": 0.5, "prob": 0.5, "stress_change": 5},
+            "A. 回复": {"time_cost": 0.5, "prob": 0.5, "stress_change": 5, "effects": ["reply"]},
             "B. 不回复": {"time_cost": 0.5, "prob": 0.5, "stress_change": 10}
         },
         importance=2
@@ -390,17 +367,47 @@ def build_game_scenes():
 
     return [scene1, scene2, scene3, scene4, scene5]
 
+def get_game_scenes():
+    """取缓存中的场景（首次使用时构建）；返回的场景由后续仿真共享，不要修改。"""
+    if not _SCENES_CACHE:
+        _SCENES_CACHE.extend(build_game_scenes())
+    return _SCENES_CACHE
+
+def clear_scene_cache():
+    """清空场景缓存（修改了任务定义或全局参数后调用）。"""
+    _SCENES_CACHE.clear()
+
+def compile_model(current_time=10, scenes=None, params=None):
+    """
+    把 build_game_scenes() 编译为 compiler.CompiledModel，供批量引擎 / 精确求解使用。
+    current_time 为可用时间（剩余时间 <= 0 时普通任务不再执行，场景五不受限制）。
+    scenes: 可传入已修改过的场景列表（缺省重新构建）
+    params: 可覆盖 relieve_prob / relieve_ratio / sms_party_factor（缺省用全局参数）
+    """
+    import compiler
+    if scenes is None:
+        scenes = build_game_scenes()
+    p = params or {}
+    overtime_scene = scenes[-1]
+    sms_values = [sms.stress_change for sms in overtime_scene.sms_tasks if sms.active]
+    overtime = {
+        "reply_task": overtime_scene.reply_task,
+        "sms_values": sms_values,
+        "sms_min": len(sms_values),
+        "sms_max": len(sms_values),
+        "party_factor": p.get("sms_party_factor", SMS_PARTY_FACTOR),
+        "relieve_prob": p.get("relieve_prob", RELIEVE_PROB),
+        "relieve_ratio": p.get("relieve_ratio", RELIEVE_RATIO),
+    }
+    return compiler.compile_objects(scenes[:-1], overtime, time_budget=current_time)
+
 # ========== 运行游戏(手动) ==========
 def run_game_manual():
     """模式A：手动模式——玩家亲自为每个任务做选择，带有GBA风格的刷新界面"""
-    global IS_PARTY
-    IS_PARTY = False
-
     scenes = build_game_scenes()
     total_scenes = len(scenes)
 
-    current_stress = 0
-    current_time = 10  # 假设今天只有10小时可用
+    state = DayState(time=10)  # 假设今天只有10小时可用
 
     for scene_idx, scene in enumerate(scenes, start=1):
         # 进入新的场景前先清屏 & 显示场景标题
@@ -411,30 +418,18 @@ def run_game_manual():
             total_scenes,
             0,
             0,  # 还没开始做任务
-            current_stress,
-            current_time
+            state.stress,
+            state.time
         )
         pause_and_wait()
 
-        # 根据不同的场景类型，调用不同的play函数
-        if isinstance(scene, PartyScene):
-            scene_stress, current_time = scene.play_scene_manual(
-                current_stress, current_time, scene_idx, total_scenes
-            )
-        elif isinstance(scene, OvertimeScene):
-            scene_stress, current_time = scene.play_scene_manual(
-                current_stress, current_time, scene_idx, total_scenes
-            )
-        else:
-            scene_stress, current_time = scene.play_scene_manual(
-                current_stress, current_time, scene_idx, total_scenes
-            )
-        current_stress += scene_stress
+        # 各类场景的 play 函数接口相同，结果都写入 state
+        scene.play_scene_manual(state, scene_idx, total_scenes)
 
     # 最后进入场景6: 睡前 & 结局
     clear_console()
-    draw_gba_frame("场景6：一天结束，睡前", total_scenes, total_scenes, 1, 1, current_stress, current_time)
-    if current_stress >= 60:
+    draw_gba_frame("场景6：一天结束，睡前", total_scenes, total_scenes, 1, 1, state.stress, state.time)
+    if state.stress >= 60:
         print("结局：坏结局（压力过高）")
     else:
         print("结局：好结局（压力正常）")
@@ -442,42 +437,59 @@ def run_game_manual():
 
     # 场景7: Ending
     clear_console()
-    draw_gba_frame("场景7：Ending", total_scenes, total_scenes, 1, 1, current_stress, current_time)
+    draw_gba_frame("场景7：Ending", total_scenes, total_scenes, 1, 1, state.stress, state.time)
     print("本日结束，游戏结束。")
     pause_and_wait()
 
 # ========== 运行游戏(自动) ==========
-def run_game_auto(num_simulations=1000):
+def run_single_day_auto():
+    """概率模式下模拟一天，返回最终压力"""
+    scenes = get_game_scenes()
+    state = DayState(time=10)
+    for scene in scenes:
+        scene.play_scene_auto(state)
+    return state.stress
+
+def run_game_auto(num_simulations=1000, workers=1, seed=None, tolerance=None, time_budget=None,
+                  instrument=False, profile_path=None):
     """
     模式B：概率模式——为每个选项预先设定概率，通过多次重复模拟估计压力分布
     （此模式不展示“GBA风格界面”，仅做自动仿真）
+    workers>1 或指定 seed 时，按 parallel.run_parallel 分进程、分种子运行。
+    结果只累计到 OnlineStats 中（常数内存），坏结局为压力 >= 60。
+    tolerance: 自适应模式——不为 None 时忽略 num_simulations，按批模拟直到置信区间半宽满足容差
+               （dict，如 {"mean": 0.1, "std": 0.1, "p_bad": 0.002}；True 表示用 adaptive.DEFAULT_TOLERANCE），
+               time_budget 为最多运行的秒数。见 adaptive.run_adaptive。
+    instrument: 为 True 时对场景 / 任务插桩，最后打印各场景的调用次数、耗时、随机数与压力贡献；
+    profile_path: 不为 None 时用 cProfile 包住仿真过程并保存到该文件。见 instrument.session。
     """
-    global IS_PARTY
-
-    final_stress_list = []
-    for _ in range(num_simulations):
-        IS_PARTY = False
-        scenes = build_game_scenes()
-        current_stress = 0
-        current_time = 10
-        for scene in scenes:
-            if isinstance(scene, PartyScene):
-                scene_stress, current_time = scene.play_scene_auto(current_stress, current_time)
-            elif isinstance(scene, OvertimeScene):
-                scene_stress, current_time = scene.play_scene_auto(current_stress, current_time)
-            else:
-                scene_stress, current_time = scene.play_scene_auto(current_stress, current_time)
-            current_stress += scene_stress
-        final_stress_list.append(current_stress)
-
-    # 简单绘制一下分布
-    plt.figure()
-    plt.hist(final_stress_list, bins=30, edgecolor='black')
-    plt.xlabel("最终压力")
-    plt.ylabel("出现次数")
-    plt.title(f"重复 {num_simulations} 次后的最终压力分布")
-    plt.show()
-    print(f"模拟完成。平均压力: {sum(final_stress_list)/len(final_stress_list):.2f}")
+    from instrument import session
+    stats_kwargs = {"bad_threshold": 60, "bad_inclusive": True}
+    with session(__name__, instrument, profile_path) as hooks:
+        if tolerance is not None:
+            import adaptive
+            stats, report = adaptive.run_adaptive("demo4", None if tolerance is True else tolerance,
+                                                  time_budget=time_budget, seed=seed, workers=workers,
+                                                  stats_kwargs=stats_kwargs)
+            print(adaptive.format_report(stats, report))
+            num_simulations = stats.count
+        elif workers > 1 or seed is not None:
+            import parallel
+            stats = parallel.run_parallel_stats("demo4", num_simulations, workers=workers, seed=seed,
+                                                stats_kwargs=stats_kwargs)
+        else:
+            stats = OnlineStats(**stats_kwargs)
+            for _ in range(num_simulations):
+                stats.add(run_single_day_auto())
+
+    # 简单绘制一下分布（由分箱计数绘制，无界面后端），同时输出 JSON 摘要
+    import report
+    report.report(stats, title=f"重复 {num_simulations} 次后的最终压力分布", xlabel="最终压力", ylabel="出现次数",
+                  figsize=(6.4, 4.8), extra={"demo": "demo_4"})
+    print(f"模拟完成。平均压力: {stats.mean:.2f}（绘图已保存为 {report.DEFAULT_PNG}）")
+    if hooks is not None:
+        print(hooks.format_report())
+    return stats
 
 # ========== 主程序入口 ==========
 if __name__ == "__main__":
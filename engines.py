@@ -0,0 +1,96 @@
+import random
+from contextlib import contextmanager
+
+import numpy as np
+
+import tracing
+
+# ========== 引擎注册表：按名字运行某个 demo 的规则 ==========
+# 每个引擎都是 run(rounds, seed_seq, **kwargs) -> 最终压力数组，
+# 其中 seed_seq 为 numpy.random.SeedSequence，决定该批次用到的全部随机数。
+# 逐日循环的引擎（demo1~demo4）使用全局 random 模块：运行期间按 seed_seq 临时播种，
+# 结束后恢复原来的状态，不影响调用方的随机数序列（但不能在多个线程中同时运行）。
+# 运行时关闭日志追踪。
+
+
+@contextmanager
+def seeded_random(seed_seq):
+    """
+    with 块内用 SeedSequence 为全局 random 模块播种（同一 seed_seq 结果完全一致），
+    退出时恢复进入前的状态。
+    """
+    saved = random.getstate()
+    state = seed_seq.generate_state(4, dtype=np.uint64)
+    random.seed(int.from_bytes(state.tobytes(), "little"))
+    try:
+        yield
+    finally:
+        random.setstate(saved)
+
+
+def run_demo1(rounds, seed_seq, desired_mean=100, desired_std=25):
+    import demo_1
+    tracer = tracing.Tracer(tracing.TRACE_OFF)
+    with seeded_random(seed_seq):
+        results = [demo_1.run_single_simulation(desired_mean, desired_std, tracer)[0] for _ in range(rounds)]
+    return np.asarray(results, dtype=float)
+
+
+def run_demo2(rounds, seed_seq):
+    import demo_2
+    tracer = tracing.Tracer(tracing.TRACE_OFF)
+    model = demo_2.compile_model()
+    with seeded_random(seed_seq):
+        results = [demo_2.run_single_day(tracer, model) for _ in range(rounds)]
+    return np.asarray(results, dtype=float)
+
+
+def run_demo3(rounds, seed_seq, desired_std=None, calibrated=False):
+    import demo_3
+    model = demo_3.build_model(calibrated, desired_std or demo_3.DESIRED_STD)
+    tracer = tracing.Tracer(tracing.TRACE_OFF)
+    with seeded_random(seed_seq):
+        results = [demo_3.run_single_day(tracer, model) for _ in range(rounds)]
+    return np.asarray(results, dtype=float)
+
+
+def run_demo4(rounds, seed_seq):
+    import demo_4
+    with seeded_random(seed_seq):
+        results = [demo_4.run_single_day_auto() for _ in range(rounds)]
+    return np.asarray(results, dtype=float)
+
+
+def run_batch2(rounds, seed_seq):
+    import demo_2
+    return demo_2.run_batch_days(rounds, seed=seed_seq)
+
+
+def run_batch3(rounds, seed_seq, desired_std=None, calibrated=False):
+    import demo_3
+    model = demo_3.build_model(calibrated, desired_std or demo_3.DESIRED_STD)
+    return demo_3.run_batch_days(rounds, seed=seed_seq, model=model)
+
+
+def run_batch4(rounds, seed_seq):
+    import batch_engine
+    import demo_4
+    return batch_engine.simulate_days(demo_4.compile_model(), rounds, seed=seed_seq)
+
+
+ENGINES = {
+    "demo1": run_demo1,
+    "demo2": run_demo2,
+    "demo3": run_demo3,
+    "demo4": run_demo4,
+    "batch2": run_batch2,
+    "batch3": run_batch3,
+    "batch4": run_batch4,
+}
+
+
+def run_engine(name, rounds, seed_seq, **kwargs):
+    """按名字运行引擎，返回 rounds 天的最终压力数组。"""
+    if name not in ENGINES:
+        raise ValueError(f"未知引擎: {name}，可选: {', '.join(ENGINES)}")
+    return ENGINES[name](rounds, seed_seq, **kwargs)
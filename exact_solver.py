@@ -0,0 +1,271 @@
+import math
+
+from compiler import FLAG_PARTY, FLAG_REPLY
+
+# ========== 精确求解：最终压力的完整分布（不做抽样） ==========
+# 每个任务都是一个小的离散随机变量（先按出现概率出现，再按 prob 选一个选项），
+# 因此最终压力的分布可以逐任务卷积得到。is_party 会影响场景五的短信压力，
+# 所以卷积过程中维护 (标志位, 累计压力) 的联合分布，到场景五再按分支处理。
+
+DIGITS = 9   # 压力值取整到的小数位数，用于合并浮点误差导致的“同一个值”
+
+
+def _add(dist, key, prob):
+    dist[key] = dist.get(key, 0.0) + prob
+
+
+def _task_outcomes(task):
+    """返回任务的所有结果 [(压力变化, 概率, 标志位), ...]，包括“未出现”。"""
+    outcomes = []
+    if task.appear < 1.0:
+        outcomes.append((0.0, 1.0 - task.appear, 0))
+    for stress, prob, flags in zip(task.stress, task.probs, task.flags):
+        outcomes.append((stress, task.appear * prob, flags))
+    return outcomes
+
+
+def _sms_distribution(ot, is_party, replied):
+    """场景五中老板短信的总压力分布 {压力: 概率}，条数在 sms_min~sms_max 间均匀。"""
+    dist = {}
+    count_prob = 1.0 / (ot.sms_max - ot.sms_min + 1)
+    for sms_count in range(ot.sms_min, ot.sms_max + 1):
+        partial = {0.0: count_prob}
+        for base in ot.sms_values[:sms_count]:
+            if is_party:
+                base *= ot.party_factor
+            if replied:
+                relieved = base - base * ot.relieve_ratio
+                branches = [(relieved, ot.relieve_prob), (base, 1.0 - ot.relieve_prob)]
+            else:
+                branches = [(base, 1.0)]
+            nxt = {}
+            for s, prob in partial.items():
+                for value, bp in branches:
+                    if bp > 0:
+                        _add(nxt, round(s + value, DIGITS), prob * bp)
+            partial = nxt
+        for s, prob in partial.items():
+            _add(dist, s, prob)
+    return dist
+
+
+def solve_day(model, threshold=100, bad_inclusive=False):
+    """
+    精确计算一天最终累计压力的分布。
+      - model: compiler.CompiledModel
+      - threshold, bad_inclusive: 坏结局定义。缺省为压力 > threshold（demo_1 ~ demo_3）；
+        bad_inclusive=True 时为压力 >= threshold（demo_4 为 >= 60）
+    返回 dict：values（升序压力值）、probs（对应概率）、mean、std、p_bad
+    时间预算可能提前截断任务时（demo_4 等）改用 solve_timed，返回值中另含剩余时间的分布。
+    """
+    if model.time_budget is not None and model.time_cost.sum() >= model.time_budget:
+        return solve_timed(model, threshold=threshold, bad_inclusive=bad_inclusive)
+
+    # (标志位, 累计压力) -> 概率
+    dist = {(0, 0.0): 1.0}
+    for task in model.tasks:
+        outcomes = _task_outcomes(task)
+        nxt = {}
+        for (flags, s), prob in dist.items():
+            for value, op, f in outcomes:
+                if op > 0:
+                    _add(nxt, (flags | f, round(s + value, DIGITS)), prob * op)
+        dist = nxt
+
+    # 场景五：按是否赴约与是否回复分支，卷积短信压力
+    ot = model.overtime
+    if ot is not None:
+        sms_cache = {}
+        nxt = {}
+        for (flags, s), prob in dist.items():
+            is_party = bool(flags & FLAG_PARTY)
+            for stress, op, f in zip(ot.reply.stress, ot.reply.probs, ot.reply.flags):
+                if op <= 0:
+                    continue
+                key = (is_party, bool(f & FLAG_REPLY))
+                if key not in sms_cache:
+                    sms_cache[key] = _sms_distribution(ot, *key)
+                for sms, sp in sms_cache[key].items():
+                    _add(nxt, (flags, round(s + stress + sms, DIGITS)), prob * op * sp)
+        dist = nxt
+
+    # 合并标志位分支，得到最终压力的分布
+    pmf = {}
+    for (_, s), prob in dist.items():
+        _add(pmf, s, prob)
+    return _summarize(pmf, threshold, bad_inclusive)
+
+
+def _summarize(pmf, threshold, bad_inclusive=False):
+    values = sorted(pmf)
+    probs = [pmf[v] for v in values]
+    mean = sum(v * q for v, q in zip(values, probs))
+    var = sum(q * (v - mean) ** 2 for v, q in zip(values, probs))
+    p_bad = sum(q for v, q in zip(values, probs) if (v >= threshold if bad_inclusive else v > threshold))
+    return {
+        "values": values,
+        "probs": probs,
+        "mean": mean,
+        "std": math.sqrt(var),
+        "p_bad": p_bad,
+    }
+
+
+# ========== 时间预算：(剩余时间, 累计压力) 的联合分布 ==========
+# demo_1 / demo_4 中剩余时间 <= 0 后普通任务不再执行，最终压力取决于走过的时间路径，
+# 不能逐任务直接卷积。这里按任务传播 (标志位, 剩余时间, 累计压力, 是否被截断) 的联合分布：
+#   - 剩余时间 > 0 时任务照常出现 / 抽选，扣除选项的时间消耗（0.25 / 0.5 / 1 等离散值）
+#   - 剩余时间 <= 0 时任务跳过，状态记为“被截断”
+# 场景五不受时间限制（回复任务的耗时只计入剩余时间），与逐日循环 / 批量引擎一致。
+# 时间消耗都是离散值，剩余时间的取值很少，状态数远小于按天抽样所需的样本量。
+
+
+def solve_timed(model, time_budget=None, threshold=100, bad_inclusive=False):
+    """
+    在时间预算 time_budget（缺省用 model.time_budget）下精确计算一天的最终压力分布。
+    返回 dict：values、probs、mean、std、p_bad（同 solve_day），以及
+      time_left: {剩余时间: 概率}（含场景五回复任务的耗时）
+      joint: {(剩余时间, 最终压力): 概率}
+      p_truncated: 至少有一个任务因时间不足被跳过的概率
+    """
+    budget = model.time_budget if time_budget is None else time_budget
+    if budget is None:
+        raise ValueError("模型没有时间预算，请用 solve_day 或传入 time_budget")
+
+    # (标志位, 剩余时间, 累计压力, 是否被截断) -> 概率
+    dist = {(0, round(float(budget), DIGITS), 0.0, False): 1.0}
+    for task in model.tasks:
+        outcomes = [(x, q, f, c) for x, q, f, c in
+                    zip(task.stress, (task.appear * p for p in task.probs), task.flags, task.time_cost) if q > 0]
+        nxt = {}
+        for (flags, t, s, cut), prob in dist.items():
+            if t <= 0:
+                _add(nxt, (flags, t, s, True), prob)
+                continue
+            if task.appear < 1.0:
+                _add(nxt, (flags, t, s, cut), prob * (1.0 - task.appear))
+            for x, q, f, c in outcomes:
+                _add(nxt, (flags | f, round(t - c, DIGITS), round(s + x, DIGITS), cut), prob * q)
+        dist = nxt
+
+    p_truncated = sum(prob for (_, _, _, cut), prob in dist.items() if cut)
+    joint = {}
+    ot = model.overtime
+    if ot is None:
+        for (_, t, s, _), prob in dist.items():
+            _add(joint, (t, s), prob)
+    else:
+        sms_cache = {}
+        for (flags, t, s, _), prob in dist.items():
+            is_party = bool(flags & FLAG_PARTY)
+            for stress, op, f, c in zip(ot.reply.stress, ot.reply.probs, ot.reply.flags, ot.reply.time_cost):
+                if op <= 0:
+                    continue
+                key = (is_party, bool(f & FLAG_REPLY))
+                if key not in sms_cache:
+                    sms_cache[key] = _sms_distribution(ot, *key)
+                left = round(t - c, DIGITS)
+                for sms, sp in sms_cache[key].items():
+                    _add(joint, (left, round(s + stress + sms, DIGITS)), prob * op * sp)
+
+    pmf, time_left = {}, {}
+    for (t, s), prob in joint.items():
+        _add(pmf, s, prob)
+        _add(time_left, t, prob)
+    result = _summarize(pmf, threshold, bad_inclusive)
+    result.update({
+        "time_left": dict(sorted(time_left.items())),
+        "joint": joint,
+        "p_truncated": p_truncated,
+    })
+    return result
+
+
+def sweep_budgets(model, budgets, threshold=100, bad_inclusive=False):
+    """
+    对每个时间预算精确求解，返回 [{budget, mean, std, p_bad, p_truncated, time_left_mean}, ...]。
+    每个预算只需一次 solve_timed（毫秒级），无需为每个预算重新抽样。
+    """
+    rows = []
+    for budget in budgets:
+        r = solve_timed(model, budget, threshold, bad_inclusive)
+        rows.append({
+            "budget": budget,
+            "mean": r["mean"],
+            "std": r["std"],
+            "p_bad": r["p_bad"],
+            "p_truncated": r["p_truncated"],
+            "time_left_mean": sum(t * q for t, q in r["time_left"].items()),
+        })
+    return rows
+
+
+# ========== 精确矩：只要均值与方差时，不展开整个分布 ==========
+# 按 (标志位) 维护 [概率, E[S·1{状态}], E[S²·1{状态}]]，逐任务传播一阶、二阶矩，
+# 场景五按 (是否赴约, 是否回复) 条件计算短信总压力的一、二阶矩。
+# 复杂度只与任务数、选项数有关，与压力取值的个数无关，校准时可反复调用。
+
+
+def _sms_moments(ot, is_party, replied):
+    """场景五短信总压力的 (E[M], E[M²])，条数在 sms_min~sms_max 间均匀。"""
+    count_prob = 1.0 / (ot.sms_max - ot.sms_min + 1)
+    m1 = m2 = 0.0
+    for sms_count in range(ot.sms_min, ot.sms_max + 1):
+        mean = var = 0.0
+        for base in ot.sms_values[:sms_count]:
+            if is_party:
+                base *= ot.party_factor
+            if replied:
+                cut = base * ot.relieve_ratio
+                mean += base - ot.relieve_prob * cut
+                var += ot.relieve_prob * (1.0 - ot.relieve_prob) * cut * cut
+            else:
+                mean += base
+        m1 += count_prob * mean
+        m2 += count_prob * (var + mean * mean)
+    return m1, m2
+
+
+def _add_moments(dist, flags, prob, m1, m2):
+    acc = dist.setdefault(flags, [0.0, 0.0, 0.0])
+    acc[0] += prob
+    acc[1] += m1
+    acc[2] += m2
+
+
+def solve_moments(model):
+    """
+    精确计算一天最终累计压力的均值与方差（不展开分布，比 solve_day 快得多）。
+    返回 dict：mean、var、std
+    """
+    if model.time_budget is not None and model.time_cost.sum() >= model.time_budget:
+        raise ValueError("时间预算可能提前截断任务，逐任务计算不再精确")
+
+    # 标志位 -> [P, E[S;状态], E[S²;状态]]
+    dist = {0: [1.0, 0.0, 0.0]}
+    for task in model.tasks:
+        nxt = {}
+        for flags, (p, m1, m2) in dist.items():
+            for x, q, f in _task_outcomes(task):
+                if q > 0:
+                    _add_moments(nxt, flags | f, p * q, q * (m1 + x * p), q * (m2 + 2 * x * m1 + x * x * p))
+        dist = nxt
+
+    ot = model.overtime
+    if ot is not None:
+        nxt = {}
+        for flags, (p, m1, m2) in dist.items():
+            is_party = bool(flags & FLAG_PARTY)
+            for x, q, f in zip(ot.reply.stress, ot.reply.probs, ot.reply.flags):
+                if q <= 0:
+                    continue
+                # 回复压力 x 与短信压力 M 一起加到 S 上：S' = S + (x + M)
+                e1, e2 = _sms_moments(ot, is_party, bool(f & FLAG_REPLY))
+                y1 = x + e1
+                y2 = x * x + 2 * x * e1 + e2
+                _add_moments(nxt, flags, p * q, q * (m1 + y1 * p), q * (m2 + 2 * y1 * m1 + y2 * p))
+        dist = nxt
+
+    mean = sum(m1 for _, m1, _ in dist.values())
+    var = max(sum(m2 for _, _, m2 in dist.values()) - mean * mean, 0.0)
+    return {"mean": mean, "var": var, "std": math.sqrt(var)}
@@ -0,0 +1,218 @@
+import math
+
+import numpy as np
+
+import batch_engine
+from compiler import FLAG_REPLY
+
+# ========== 重要性抽样：估计极端高压尾部概率 ==========
+# P(最终压力 > 150) 这类尾部概率很小，普通抽样几乎抽不到。这里改从“倾斜”后的分布抽样：
+#   任务出现概率、选项概率、回复选项、短信条数、每条短信的缓解概率都可以偏向高压结果，
+# 再用似然比 LR = Π p(x) / q(x) 加权，尾部概率的估计仍然无偏：P = E_q[LR · 1{Y > level}]。
+# 倾斜参数用交叉熵方法（CE）自动选取：每轮取压力最高的 rho 比例样本（阈值逐轮升到 level），
+# 用它们的加权频率更新各离散变量的抽样分布，几轮之后即可用于最终估计。
+# 抽样结果换算成 batch_engine 的 draws（均匀数落在原分布对应选项的区间内），仍由
+# batch_engine.evaluate_draws 计算压力，因此与普通模拟的规则完全一致。
+
+CE_SAMPLES = 20000     # 交叉熵每轮的样本数
+CE_RHO = 0.1           # 每轮精英样本比例
+CE_SMOOTH = 0.7        # 新旧参数的平滑系数
+CE_MAX_ITER = 30
+PROB_FLOOR = 1e-3      # 倾斜后概率的下限，避免似然比过大
+
+
+def nominal_proposal(model):
+    """不倾斜的抽样分布（即原模型本身）。"""
+    proposal = {
+        "appear": np.array([t.appear for t in model.tasks], dtype=float),
+        "probs": [np.array(t.probs, dtype=float) for t in model.tasks],
+    }
+    ot = model.overtime
+    if ot is not None:
+        proposal["reply"] = np.array(ot.reply.probs, dtype=float)
+        proposal["sms"] = np.full(ot.sms_max - ot.sms_min + 1, 1.0 / (ot.sms_max - ot.sms_min + 1))
+        proposal["relieve"] = np.full(len(ot.sms_values), float(ot.relieve_prob))
+    return proposal
+
+
+def _pick(probs, rng, n):
+    cum = np.cumsum(probs)
+    cum /= cum[-1]
+    return np.minimum(np.searchsorted(cum, rng.random(n), side="right"), len(cum) - 1)
+
+
+def _uniform_in_option(probs, k, rng):
+    """原分布下落在选项 k 区间内的均匀数（使 batch_engine 抽到同一个选项）。"""
+    probs = np.asarray(probs, dtype=float)
+    probs = probs / probs.sum()
+    lo = np.concatenate([[0.0], np.cumsum(probs)[:-1]])
+    return lo[k] + rng.random(len(k)) * probs[k]
+
+
+def _uniform_for_bool(hit, p, rng):
+    """原分布下 (u < p) == hit 的均匀数。"""
+    u = rng.random(len(hit))
+    return np.where(hit, u * p, p + u * (1.0 - p))
+
+
+def _log_ratio(p, q):
+    with np.errstate(divide="ignore"):
+        return np.where(p > 0, np.log(p) - np.log(np.where(q > 0, q, 1.0)), 0.0)
+
+
+def sample(model, proposal, n, rng):
+    """
+    从倾斜分布 proposal 抽 n 天，返回 (压力, log 似然比, 抽样记录)。
+    似然比只计入实际用到的变量（未出现任务的选项、未激活 / 未回复时的缓解不计入）。
+    """
+    nominal = nominal_proposal(model)
+    draws = {"n": n, "appear": np.empty((len(model.tasks), n)), "pick": np.empty((len(model.tasks), n))}
+    record = {"appear": [], "pick": []}
+    log_lr = np.zeros(n)
+    for i, task in enumerate(model.tasks):
+        p, q = nominal["appear"][i], proposal["appear"][i]
+        hit = rng.random(n) < q
+        draws["appear"][i] = _uniform_for_bool(hit, p, rng)
+        log_lr += np.where(hit, _log_ratio(p, q), _log_ratio(1.0 - p, 1.0 - q))
+        k = _pick(proposal["probs"][i], rng, n)
+        draws["pick"][i] = _uniform_in_option(task.probs, k, rng)
+        log_lr += np.where(hit, _log_ratio(nominal["probs"][i][k], proposal["probs"][i][k]), 0.0)
+        record["appear"].append(hit)
+        record["pick"].append(k)
+
+    ot = model.overtime
+    if ot is not None:
+        k = _pick(proposal["reply"], rng, n)
+        draws["reply"] = _uniform_in_option(ot.reply.probs, k, rng)
+        log_lr += _log_ratio(nominal["reply"][k], proposal["reply"][k])
+        replied = (np.asarray(ot.reply.flags, dtype=np.int64)[k] & FLAG_REPLY) != 0
+
+        c = _pick(proposal["sms"], rng, n)
+        draws["sms_count"] = ot.sms_min + c
+        log_lr += _log_ratio(nominal["sms"][c], proposal["sms"][c])
+
+        relieve = np.empty((len(ot.sms_values), n))
+        record["relieve"] = []
+        record["relieve_used"] = []
+        for j in range(len(ot.sms_values)):
+            p, q = nominal["relieve"][j], proposal["relieve"][j]
+            hit = rng.random(n) < q
+            relieve[j] = _uniform_for_bool(hit, p, rng)
+            used = replied & (j + 1 <= draws["sms_count"])
+            log_lr += np.where(used, np.where(hit, _log_ratio(p, q), _log_ratio(1.0 - p, 1.0 - q)), 0.0)
+            record["relieve"].append(hit)
+            record["relieve_used"].append(used)
+        draws["relieve"] = relieve
+        record["reply"] = k
+        record["sms"] = c
+
+    return batch_engine.evaluate_draws(model, draws), log_lr, record
+
+
+def _weighted_freq(values, weights, size, old):
+    total = weights.sum()
+    if total <= 0:
+        return old
+    return np.bincount(values, weights=weights, minlength=size)[:size] / total
+
+
+def _smooth(old, new, nominal):
+    """平滑更新并设置概率下限；原分布中概率为 0 的结果保持为 0。"""
+    q = CE_SMOOTH * new + (1 - CE_SMOOTH) * old
+    q = np.where(nominal > 0, np.maximum(q, PROB_FLOOR), 0.0)
+    return q / q.sum()
+
+
+def _smooth_bool(old, new, nominal):
+    """伯努利参数的平滑更新；原概率为 0 / 1 时不倾斜。"""
+    if nominal <= 0 or nominal >= 1:
+        return nominal
+    q = CE_SMOOTH * new + (1 - CE_SMOOTH) * old
+    return min(max(q, PROB_FLOOR), 1 - PROB_FLOOR)
+
+
+def _ce_update(model, proposal, record, w):
+    nominal = nominal_proposal(model)
+    new = {"appear": proposal["appear"].copy(), "probs": list(proposal["probs"])}
+    for i in range(len(model.tasks)):
+        hit = record["appear"][i]
+        freq = (w * hit).sum() / w.sum()
+        new["appear"][i] = _smooth_bool(proposal["appear"][i], freq, nominal["appear"][i])
+        size = len(nominal["probs"][i])
+        freq = _weighted_freq(record["pick"][i], w * hit, size, proposal["probs"][i])
+        new["probs"][i] = _smooth(proposal["probs"][i], freq, nominal["probs"][i])
+    if model.overtime is not None:
+        size = len(nominal["reply"])
+        new["reply"] = _smooth(proposal["reply"], _weighted_freq(record["reply"], w, size, proposal["reply"]),
+                               nominal["reply"])
+        size = len(nominal["sms"])
+        new["sms"] = _smooth(proposal["sms"], _weighted_freq(record["sms"], w, size, proposal["sms"]),
+                             nominal["sms"])
+        new["relieve"] = proposal["relieve"].copy()
+        for j in range(len(new["relieve"])):
+            ww = w * record["relieve_used"][j]
+            if ww.sum() > 0:
+                freq = (ww * record["relieve"][j]).sum() / ww.sum()
+                new["relieve"][j] = _smooth_bool(proposal["relieve"][j], freq, nominal["relieve"][j])
+    return new
+
+
+def _hits(values, level, inclusive):
+    return (values >= level) if inclusive else (values > level)
+
+
+def cross_entropy_tilt(model, level, inclusive=False, n=CE_SAMPLES, rho=CE_RHO, max_iter=CE_MAX_ITER, rng=None):
+    """
+    用交叉熵方法为事件 {压力 > level} 选择倾斜参数，返回 (proposal, 每轮阈值列表)。
+    达到的阈值始终低于 level 时（max_iter 用完）返回当时的参数。
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    proposal = nominal_proposal(model)
+    levels = []
+    for _ in range(max_iter):
+        y, log_lr, record = sample(model, proposal, n, rng)
+        gamma = min(float(np.quantile(y, 1 - rho)), level)
+        levels.append(gamma)
+        elite = (y >= gamma) if gamma < level else _hits(y, level, inclusive)
+        w = np.where(elite, np.exp(log_lr), 0.0)
+        if w.sum() <= 0:
+            break
+        proposal = _ce_update(model, proposal, record, w)
+        if gamma >= level:
+            break
+    return proposal, levels
+
+
+def tail_probability(model, level, inclusive=False, n=200000, seed=None, proposal=None, ce_samples=CE_SAMPLES):
+    """
+    估计 P(压力 > level)（inclusive=True 时为 >=），返回 dict：
+      p、se（标准误）、rel_err、n、hits（倾斜后命中的天数）、ess（有效样本量）、
+      ce_levels（交叉熵每轮阈值）、proposal（最终使用的倾斜参数）
+    proposal 为 None 时先用交叉熵自动选择倾斜参数。
+    """
+    rng = np.random.default_rng(seed)
+    levels = []
+    if proposal is None:
+        proposal, levels = cross_entropy_tilt(model, level, inclusive, n=ce_samples, rng=rng)
+    y, log_lr, _ = sample(model, proposal, n, rng)
+    w = np.where(_hits(y, level, inclusive), np.exp(log_lr), 0.0)
+    p = float(w.mean())
+    se = float(w.std(ddof=1) / math.sqrt(n))
+    ess = float(w.sum() ** 2 / (w * w).sum()) if w.any() else 0.0
+    return {
+        "p": p,
+        "se": se,
+        "rel_err": se / p if p > 0 else math.inf,
+        "n": n,
+        "hits": int(np.count_nonzero(w)),
+        "ess": ess,
+        "ce_levels": levels,
+        "proposal": proposal,
+    }
+
+
+if __name__ == "__main__":
+    import demo_2
+    result = tail_probability(demo_2.compile_model(), 120, seed=0)
+    print(f"P(压力 > 120) = {result['p']:.4e} ± {result['se']:.1e}（命中 {result['hits']} 天，"
+          f"交叉熵 {len(result['ce_levels'])} 轮）")
@@ -0,0 +1,222 @@
+import cProfile
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+
+import alias
+
+# ========== 场景级插桩与性能分析（按需开启） ==========
+# 开启时临时替换（monkeypatch）各 demo 中场景 / 任务的热点函数，记录：
+#   - 调用次数、累计耗时（含内部调用）
+#   - 消耗的随机数个数（demo 模块中的 random.random / randint / choices 与别名表抽样各计 1 个）
+#   - 返回的压力变化的均值与方差（每个场景的压力贡献）
+# 关闭时恢复原函数，因此未开启时没有任何额外开销。
+# 场景方法按 “类名.方法名[场景名]” 分别统计；demo_2 / demo_3 的 play_scene(scene, ...) 按
+# “play_scene[场景名]” 统计（scene 为编译后的 (场景名, 任务列表)）。
+# 注意：只统计当前进程内的调用（workers>1 的子进程、批量引擎不经过这些函数）。
+
+
+def _scalar(result):
+    return result
+
+
+def _second(result):
+    return result[1]
+
+
+# 各模块的插桩目标：(类名或 None（模块级函数）, 函数名, 从返回值取压力变化的函数)
+TARGETS = {
+    "demo_1": [
+        ("Scene", "play_scene", _scalar),
+        (None, "play_scene5", _scalar),
+        ("Task", "make_choice", _second),
+        ("SMSTask", "make_choice", _second),
+    ],
+    "demo_2": [
+        (None, "play_scene", _scalar),
+        (None, "play_overtime_scene", _scalar),
+    ],
+    "demo_3": [
+        (None, "play_scene", _scalar),
+        (None, "play_overtime_scene", _scalar),
+    ],
+    "demo_4": [
+        ("Scene", "play_scene_auto", _scalar),
+        ("OvertimeScene", "play_scene_auto", _scalar),
+        ("Task", "make_choice_auto", _second),
+        ("SMSTask", "make_choice_auto", _scalar),
+    ],
+}
+
+
+def _module_key(module):
+    """TARGETS 中的模块名（直接运行 demo 脚本时模块名为 __main__，改用文件名）。"""
+    if module.__name__ in TARGETS or getattr(module, "__file__", None) is None:
+        return module.__name__
+    return os.path.splitext(os.path.basename(module.__file__))[0]
+
+
+class _Record:
+    """单个插桩点的累计量；压力用 Welford 方法在线计算均值 / 方差。"""
+    __slots__ = ("calls", "seconds", "draws", "mean", "m2")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.draws = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, seconds, draws, stress):
+        self.calls += 1
+        self.seconds += seconds
+        self.draws += draws
+        delta = stress - self.mean
+        self.mean += delta / self.calls
+        self.m2 += delta * (stress - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / self.calls if self.calls > 0 else 0.0
+
+
+class _CountingRandom:
+    """替换 demo 模块中的 random 名字：计数后转发给全局 random 模块。"""
+    def __init__(self, owner):
+        self._owner = owner
+
+    def random(self):
+        self._owner.draws += 1
+        return random.random()
+
+    def randint(self, a, b):
+        self._owner.draws += 1
+        return random.randint(a, b)
+
+    def choices(self, population, weights=None, *, cum_weights=None, k=1):
+        self._owner.draws += k
+        return random.choices(population, weights, cum_weights=cum_weights, k=k)
+
+    def __getattr__(self, name):
+        return getattr(random, name)
+
+
+class Instrumentation:
+    """
+    对给定的 demo 模块插桩，用法：
+        with Instrumentation([demo_1]) as inst:
+            ...
+        print(inst.format_report())
+    """
+    def __init__(self, modules):
+        self.modules = list(modules)
+        for module in self.modules:
+            if _module_key(module) not in TARGETS:
+                raise ValueError(f"模块 {module.__name__} 没有插桩目标，可选: {', '.join(TARGETS)}")
+        self.records = {}
+        self.draws = 0
+        self._saved = []   # (对象, 属性名, 原值)
+
+    def _record(self, key):
+        rec = self.records.get(key)
+        if rec is None:
+            rec = self.records[key] = _Record()
+        return rec
+
+    def _wrap(self, func, label, stress_of, method):
+        inst = self
+        clock = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            if method:
+                obj = args[0]
+                name = getattr(obj, "name", None)
+                key = f"{type(obj).__name__}.{label}" + (f"[{name}]" if name is not None else "")
+            elif args and isinstance(args[0], tuple):
+                key = f"{label}[{args[0][0]}]"   # 编译后的场景 (场景名, 任务列表)
+            else:
+                key = label
+            rec = inst._record(key)   # 调用前登记，报告按首次进入的顺序排列
+            d0 = inst.draws
+            t0 = clock()
+            result = func(*args, **kwargs)
+            rec.add(clock() - t0, inst.draws - d0, stress_of(result))
+            return result
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def _patch(self, owner, name, value):
+        self._saved.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, value)
+
+    def enable(self):
+        if self._saved:
+            return self
+        orig_draw = alias.AliasTable.draw
+
+        def draw(table, rand=random.random):
+            self.draws += 1
+            return orig_draw(table, rand)
+        self._patch(alias.AliasTable, "draw", draw)
+        for module in self.modules:
+            self._patch(module, "random", _CountingRandom(self))
+            for cls_name, name, stress_of in TARGETS[_module_key(module)]:
+                owner = module if cls_name is None else getattr(module, cls_name)
+                if cls_name is not None and name not in vars(owner):
+                    continue   # 继承自父类的方法由父类的插桩统计
+                self._patch(owner, name, self._wrap(getattr(owner, name), name, stress_of, cls_name is not None))
+        return self
+
+    def disable(self):
+        while self._saved:
+            owner, name, value = self._saved.pop()
+            setattr(owner, name, value)
+
+    def __enter__(self):
+        return self.enable()
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    def reset(self):
+        self.records.clear()
+        self.draws = 0
+
+    def format_report(self):
+        if not self.records:
+            return "插桩报告：没有记录到调用（批量引擎或子进程中的调用不会被统计）"
+        lines = ["===== 插桩报告 =====",
+                 "插桩点\t调用次数\t累计耗时(ms)\t每次(us)\t随机数\t每次随机数\t压力均值\t压力方差"]
+        for key, r in self.records.items():
+            lines.append(f"{key}\t{r.calls}\t{r.seconds * 1e3:.1f}\t{r.seconds * 1e6 / r.calls:.2f}\t"
+                         f"{r.draws}\t{r.draws / r.calls:.2f}\t{r.mean:.3f}\t{r.variance:.3f}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def session(module, instrument=False, profile_path=None):
+    """
+    run_simulations_and_plot 等入口使用：instrument=True 时对 module 插桩（产出 Instrumentation，
+    报告由调用方在最后打印），否则产出 None；profile_path 不为 None 时用 cProfile 包住整个过程，
+    并把结果保存到该文件（可用 pstats / snakeviz 查看）。两者都关闭时什么也不做。
+    """
+    if isinstance(module, str):
+        module = sys.modules[module]
+    inst = Instrumentation([module]) if instrument else None
+    profiler = cProfile.Profile() if profile_path is not None else None
+    if inst is not None:
+        inst.enable()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield inst
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+        if inst is not None:
+            inst.disable()
+    if profiler is not None:
+        print(f"cProfile 结果已保存到 {profile_path}")
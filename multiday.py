@@ -0,0 +1,141 @@
+import math
+import time
+
+import numpy as np
+
+import batch_engine
+from compiler import FLAG_PARTY
+
+# ========== 多日连续模拟：P 个玩家 × D 天 ==========
+# 原来场景七“重置每日基础压力，进入下一日”之后模拟就结束了。这里让压力与标志位跨天延续：
+#   - 当天压力 daily：用批量引擎按原规则模拟一天
+#   - 次日效果：前一天结束时带有某个标志位的玩家，当天额外增加压力（如赴约后的第二天）
+#   - 结转压力 carried：carried_明天 = decay × carried_今天 + carry × (daily + 次日效果)
+#   - 当天的总压力 total = carried + daily + 次日效果；total 超过 bad_threshold 为坏结局，
+#     首次达到 burnout_threshold 记为倦怠（记录是第几天）
+# 每天对全部玩家按 chunk_size 分块向量化计算，状态只有每个玩家的 carried / 标志位 / 倦怠日，
+# 内存与天数无关；每天结束时产出一条汇总（均值、标准差、坏结局比例、新增与累计倦怠比例等）。
+# 第 d 天第 c 块使用 SeedSequence(entropy, spawn_key=(d, c))，结果只取决于 seed 与 chunk_size。
+
+CHUNK_SIZE = 1 << 18
+DEFAULT_CONFIG = {
+    "carry": 0.2,                     # 当天压力结转到次日的比例
+    "decay": 0.5,                     # 已结转压力每天保留的比例
+    "flag_effects": {FLAG_PARTY: 5.0},   # 标志位 -> 次日额外压力
+    "burnout_threshold": 150.0,       # total 达到该值记为倦怠；None 表示不统计
+}
+
+
+def _check_config(cfg):
+    if cfg["carry"] < 0:
+        raise ValueError("carry 不能为负")
+    if not 0 <= cfg["decay"] <= 1:
+        raise ValueError("decay 必须在 [0, 1] 内")
+
+
+def iter_days(model, players, days, config=None, seed=None, chunk_size=CHUNK_SIZE, bad_threshold=100,
+              bad_inclusive=False, state=None):
+    """
+    逐天模拟 players 个玩家，每天产出一条汇总 dict：
+      day、mean / std（total）、daily_mean、carried_mean、p_bad、party_rate、
+      new_burnout（当天首次倦怠的比例）、burnout_rate（累计倦怠比例）
+    config: 覆盖 DEFAULT_CONFIG 中的项。
+    state: 传入 dict 时，结束后其中保存 carried / flags / burnout_day 数组（burnout_day 为 -1 表示未倦怠）。
+    """
+    cfg = dict(DEFAULT_CONFIG, **(config or {}))
+    _check_config(cfg)
+    if players < 1 or days < 0:
+        raise ValueError("players 必须 >= 1，days 必须 >= 0")
+    carry, decay = cfg["carry"], cfg["decay"]
+    effects = list(cfg["flag_effects"].items())
+    burnout_threshold = cfg["burnout_threshold"]
+
+    carried = np.zeros(players)
+    flags = np.zeros(players, dtype=np.int64)
+    burnout_day = np.full(players, -1, dtype=np.int32)
+    if state is not None:
+        state.update(carried=carried, flags=flags, burnout_day=burnout_day)
+    entropy = np.random.SeedSequence(seed).entropy
+    burned = 0
+
+    for d in range(days):
+        s1 = s2 = daily_sum = carried_sum = 0.0
+        bad = party = new_burnout = 0
+        for c, start in enumerate(range(0, players, chunk_size)):
+            sl = slice(start, min(start + chunk_size, players))
+            n = sl.stop - sl.start
+            rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=(d, c)))
+            record = {}
+            daily = batch_engine.evaluate_draws(model, batch_engine.draw_uniforms(model, n, rng), record)
+            for flag, delta in effects:
+                daily += np.where(flags[sl] & flag, delta, 0.0)
+            total = carried[sl] + daily
+
+            carried_sum += float(carried[sl].sum())
+            daily_sum += float(daily.sum())
+            s1 += float(total.sum())
+            s2 += float(np.dot(total, total))
+            bad += int(np.count_nonzero((total >= bad_threshold) if bad_inclusive else (total > bad_threshold)))
+            party += int(np.count_nonzero(record["flags"] & FLAG_PARTY))
+            if burnout_threshold is not None:
+                new = (burnout_day[sl] < 0) & (total >= burnout_threshold)
+                burnout_day[sl][new] = d
+                new_burnout += int(np.count_nonzero(new))
+
+            carried[sl] = decay * carried[sl] + carry * daily
+            flags[sl] = record["flags"]
+
+        burned += new_burnout
+        mean = s1 / players
+        yield {
+            "day": d,
+            "mean": mean,
+            "std": math.sqrt(max(s2 / players - mean * mean, 0.0)),
+            "daily_mean": daily_sum / players,
+            "carried_mean": carried_sum / players,
+            "p_bad": bad / players,
+            "party_rate": party / players,
+            "new_burnout": new_burnout / players,
+            "burnout_rate": burned / players,
+        }
+
+
+def simulate(model, players, days, config=None, seed=None, chunk_size=CHUNK_SIZE, bad_threshold=100,
+             bad_inclusive=False, progress=None):
+    """
+    运行 iter_days 并汇总，返回 dict：
+      days（每天的汇总列表）、burnout_rate、burnout_day_mean / burnout_day_median（倦怠玩家是第几天倦怠的）、
+      players、elapsed
+    progress: 回调 progress(当天汇总)，每天调用一次（可用于流式输出）。
+    """
+    start = time.perf_counter()
+    state = {}
+    rows = []
+    for row in iter_days(model, players, days, config, seed, chunk_size, bad_threshold, bad_inclusive, state):
+        rows.append(row)
+        if progress is not None:
+            progress(row)
+    burnout_day = state.get("burnout_day", np.zeros(0, dtype=np.int32))
+    hit = burnout_day[burnout_day >= 0]
+    return {
+        "players": players,
+        "days": rows,
+        "burnout_rate": len(hit) / players,
+        "burnout_day_mean": float(hit.mean()) if len(hit) else math.nan,
+        "burnout_day_median": float(np.median(hit)) if len(hit) else math.nan,
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+def format_day(row):
+    return (f"第{row['day'] + 1}天: mean={row['mean']:.2f}, std={row['std']:.2f}, "
+            f"结转={row['carried_mean']:.2f}, P(坏结局)={row['p_bad']:.4f}, "
+            f"新增倦怠={row['new_burnout']:.4%}, 累计倦怠={row['burnout_rate']:.4%}")
+
+
+if __name__ == "__main__":
+    import demo_2
+    result = simulate(demo_2.compile_model(), players=100000, days=30, seed=0,
+                      progress=lambda row: print(format_day(row)))
+    print(f"30 天累计倦怠比例 {result['burnout_rate']:.2%}，平均在第 {result['burnout_day_mean'] + 1:.1f} 天，"
+          f"耗时 {result['elapsed']:.1f}s")
@@ -0,0 +1,184 @@
+import math
+
+import numpy as np
+
+# ========== 在线统计：常数内存、可合并 ==========
+# 不再保存每一天的结果列表，而是随模拟过程累计：
+#   - 计数、均值、方差（Welford / Chan 合并公式）、最小值、最大值
+#   - 坏结局次数（压力 > bad_threshold，或 bad_inclusive=True 时 >=）
+#   - 落在 band 区间 [lo, hi] 内的次数（demo_3 的“75~125”指标）
+#   - 固定宽度的细直方图（超出范围的计入 underflow / overflow），
+#     分位数与绘图用的粗直方图都从它得到
+# 不同批次、不同进程的 OnlineStats 可以用 merge() 合并，结果与一次性统计相同
+# （分位数精度为一个细分箱宽度）。
+
+DEFAULT_RANGE = (-200.0, 400.0)
+DEFAULT_BIN_WIDTH = 0.25
+
+
+class OnlineStats:
+    def __init__(self, lo=DEFAULT_RANGE[0], hi=DEFAULT_RANGE[1], bin_width=DEFAULT_BIN_WIDTH,
+                 bad_threshold=100, bad_inclusive=False, band=(75, 125)):
+        if hi <= lo or bin_width <= 0:
+            raise ValueError("直方图范围或箱宽不合法")
+        self.lo = float(lo)
+        self.hi = float(hi)
+        self.bin_width = float(bin_width)
+        self.bad_threshold = bad_threshold
+        self.bad_inclusive = bad_inclusive
+        self.band = band
+
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.bad = 0
+        self.in_band = 0
+        self.counts = np.zeros(int(math.ceil((self.hi - self.lo) / self.bin_width)), dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+
+    # ---------- 累计 ----------
+    def add(self, x):
+        """累计单个结果（逐日循环使用）。"""
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        if x > self.bad_threshold or (self.bad_inclusive and x == self.bad_threshold):
+            self.bad += 1
+        if self.band[0] <= x <= self.band[1]:
+            self.in_band += 1
+        idx = int(math.floor((x - self.lo) / self.bin_width))
+        if idx < 0:
+            self.underflow += 1
+        elif idx >= len(self.counts):
+            self.overflow += 1
+        else:
+            self.counts[idx] += 1
+
+    def update(self, values):
+        """累计一批结果（数组）。"""
+        values = np.asarray(values, dtype=float).ravel()
+        n = len(values)
+        if n == 0:
+            return
+        chunk = OnlineStats(self.lo, self.hi, self.bin_width, self.bad_threshold, self.bad_inclusive, self.band)
+        chunk.count = n
+        chunk.mean = float(values.mean())
+        chunk.m2 = float(((values - chunk.mean) ** 2).sum())
+        chunk.min = float(values.min())
+        chunk.max = float(values.max())
+        if self.bad_inclusive:
+            chunk.bad = int(np.count_nonzero(values >= self.bad_threshold))
+        else:
+            chunk.bad = int(np.count_nonzero(values > self.bad_threshold))
+        chunk.in_band = int(np.count_nonzero((values >= self.band[0]) & (values <= self.band[1])))
+        idx = np.floor((values - self.lo) / self.bin_width).astype(np.int64)
+        inside = (idx >= 0) & (idx < len(self.counts))
+        chunk.underflow = int(np.count_nonzero(idx < 0))
+        chunk.overflow = int(np.count_nonzero(idx >= len(self.counts)))
+        chunk.counts = np.bincount(idx[inside], minlength=len(self.counts))
+        self.merge(chunk)
+
+    def merge(self, other):
+        """并入另一个 OnlineStats（直方图设置与坏结局 / 区间定义必须相同），返回 self。"""
+        if (other.lo, other.hi, other.bin_width) != (self.lo, self.hi, self.bin_width):
+            raise ValueError("只能合并直方图范围与箱宽相同的 OnlineStats")
+        if (other.bad_threshold, other.bad_inclusive, tuple(other.band)) != \
+                (self.bad_threshold, self.bad_inclusive, tuple(self.band)):
+            raise ValueError("只能合并坏结局阈值（bad_threshold / bad_inclusive）与区间 band 相同的 OnlineStats")
+        if other.count == 0:
+            return self
+        n = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / n
+        self.m2 += other.m2 + delta * delta * self.count * other.count / n
+        self.count = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.bad += other.bad
+        self.in_band += other.in_band
+        self.counts = self.counts + other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        return self
+
+    # ---------- 结果 ----------
+    @property
+    def variance(self):
+        """总体方差（与 statistics.pvariance 一致）。"""
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def p_bad(self):
+        return self.bad / self.count if self.count else 0.0
+
+    @property
+    def in_band_ratio(self):
+        return self.in_band / self.count if self.count else 0.0
+
+    def quantile(self, q):
+        """由细直方图插值得到的 q 分位数（0<=q<=1），精度约为一个箱宽。"""
+        if self.count == 0:
+            return math.nan
+        target = q * self.count
+        if target <= self.underflow:
+            return self.min
+        cum = self.underflow + np.cumsum(self.counts)
+        i = int(np.searchsorted(cum, target))
+        if i >= len(self.counts):
+            return self.max
+        before = cum[i] - self.counts[i]
+        frac = (target - before) / self.counts[i] if self.counts[i] else 0.0
+        value = float(self.lo + (i + frac) * self.bin_width)
+        return min(max(value, self.min), self.max)
+
+    def histogram(self, bins=30):
+        """
+        把细直方图合并为 bins 个等宽箱（覆盖 [min, max]），返回 (counts, edges)，
+        可直接用于 plt.hist(edges[:-1], bins=edges, weights=counts)。
+        粗箱的边界对齐到细箱边界，因此每个细箱完整地落在一个粗箱内。
+        超出细直方图范围 [lo, hi) 的结果（underflow / overflow）计入最外侧的箱，
+        这时该箱的外边界放宽到 min / max，使每个箱的计数都落在它的边界内（最外侧的箱可能更宽）。
+        """
+        if self.count == 0:
+            return np.zeros(bins, dtype=np.int64), np.linspace(0.0, 1.0, bins + 1)
+        first = int(np.clip(math.floor((self.min - self.lo) / self.bin_width), 0, len(self.counts) - 1))
+        last = int(np.clip(math.floor((self.max - self.lo) / self.bin_width), 0, len(self.counts) - 1))
+        per_bin = max(1, -(-(last - first + 1) // bins))
+        fine = np.zeros(per_bin * bins, dtype=np.int64)
+        stop = min(first + len(fine), len(self.counts))
+        fine[:stop - first] = self.counts[first:stop]
+        counts = fine.reshape(bins, per_bin).sum(axis=1)
+        counts[0] += self.underflow
+        counts[-1] += self.overflow
+        edges = self.lo + (first + per_bin * np.arange(bins + 1)) * self.bin_width
+        edges[0] = min(edges[0], self.min)
+        edges[-1] = max(edges[-1], self.max)
+        return counts, edges
+
+    def summary(self):
+        """常用统计量汇总为 dict（可直接写成 JSON：没有结果时最小 / 最大值与分位数为 None）。"""
+        empty = self.count == 0
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "std": self.std,
+            "min": None if empty else self.min,
+            "max": None if empty else self.max,
+            "p_bad": self.p_bad,
+            "in_band_ratio": self.in_band_ratio,
+            "p05": None if empty else self.quantile(0.05),
+            "p50": None if empty else self.quantile(0.5),
+            "p95": None if empty else self.quantile(0.95),
+        }
@@ -0,0 +1,177 @@
+import itertools
+import math
+
+from compiler import FLAG_PARTY, FLAG_REPLY
+
+# ========== 最优策略：对手动模式做精确动态规划 ==========
+# demo_4 手动模式中玩家为每个任务选择选项，受 10 小时时间预算约束；赴约（FLAG_PARTY）使短信压力上调，
+# 回复（FLAG_REPLY）使每条短信有概率缓解。这里在编译后的模型上做带记忆的动态规划：
+#   状态 = (任务下标, 剩余时间, 标志位, 已累计压力)，最后一步为场景五的回复选择
+#   - 任务出现概率 < 1 时为机会节点（先看到是否出现，再做选择）；剩余时间 <= 0 时任务跳过
+#   - 场景五的短信条数、缓解都是随机的，按精确分布计算
+# 两种目标：
+#   - "mean": 最小化最终压力的期望（同值时取坏结局概率小的）
+#   - "p_bad": 最小化坏结局概率（同值时取期望压力小的）
+# 结果精确（没有抽样），demo_4 的规模在毫秒级完成。
+# 标志位来自编译结果（选项声明的 effects），与逐日循环一致。
+
+OBJECTIVES = ("mean", "p_bad")
+ROUND = 9   # 记忆化时对时间 / 压力取整的小数位，避免浮点误差产生重复状态
+
+
+def overtime_distribution(overtime, flags, k):
+    """在标志位 flags 下选择回复选项 k 时，场景五压力变化的精确分布 [(压力变化, 概率), ...]。"""
+    reply = overtime.reply
+    party = bool(flags & FLAG_PARTY)
+    replied = bool(reply.flags[k] & FLAG_REPLY)
+    counts = range(overtime.sms_min, overtime.sms_max + 1)
+    dist = {}
+    for count in counts:
+        p_count = 1.0 / len(counts)
+        values = overtime.sms_values[:count]
+        relieve_p = overtime.relieve_prob if replied else 0.0
+        for relieved in itertools.product((False, True), repeat=count if replied else 0):
+            p = p_count
+            total = reply.stress[k]
+            for i, base in enumerate(values):
+                if party:
+                    base *= overtime.party_factor
+                if replied and relieved[i]:
+                    base -= base * overtime.relieve_ratio
+                    p *= relieve_p
+                elif replied:
+                    p *= 1.0 - relieve_p
+                total += base
+            key = round(total, ROUND)
+            dist[key] = dist.get(key, 0.0) + p
+    return sorted(dist.items())
+
+
+def _is_bad(stress, bad_threshold, bad_inclusive):
+    return stress >= bad_threshold if bad_inclusive else stress > bad_threshold
+
+
+class _Solver:
+    def __init__(self, model, objective, bad_threshold, bad_inclusive):
+        if objective not in OBJECTIVES:
+            raise ValueError(f"未知目标: {objective}，可选: {', '.join(OBJECTIVES)}")
+        self.model = model
+        self.objective = objective
+        self.bad_threshold = bad_threshold
+        self.bad_inclusive = bad_inclusive
+        self.memo = {}
+        self.policy = {}
+        self._ot_cache = {}
+
+    def key(self, value):
+        """按目标比较 (p_bad, mean)。"""
+        p_bad, mean = value
+        return (round(p_bad, ROUND), mean) if self.objective == "p_bad" else (round(mean, ROUND), p_bad)
+
+    def overtime(self, flags, k):
+        ck = (flags & FLAG_PARTY, k)
+        if ck not in self._ot_cache:
+            self._ot_cache[ck] = overtime_distribution(self.model.overtime, flags, k)
+        return self._ot_cache[ck]
+
+    def terminal(self, flags, stress):
+        """所有普通任务结束后：若有场景五则选择最优的回复选项。返回 ((p_bad, mean), 选项或 None)。"""
+        ot = self.model.overtime
+        if ot is None:
+            return (float(_is_bad(stress, self.bad_threshold, self.bad_inclusive)), stress), None
+        best = None
+        for k in range(len(ot.reply.labels)):
+            dist = self.overtime(flags, k)
+            p_bad = sum(p for v, p in dist if _is_bad(stress + v, self.bad_threshold, self.bad_inclusive))
+            mean = stress + sum(v * p for v, p in dist)
+            if best is None or self.key((p_bad, mean)) < self.key(best[0]):
+                best = ((p_bad, mean), k)
+        return best
+
+    def value(self, i, time, flags, stress):
+        state = (i, time, flags, stress)
+        if state in self.memo:
+            return self.memo[state]
+        model = self.model
+        if i == len(model.tasks):
+            result, k = self.terminal(flags, stress)
+        else:
+            task = model.tasks[i]
+            k = None
+            if time is not None and time <= 0:
+                result = self.value(i + 1, time, flags, stress)
+            else:
+                best = None
+                for j in range(len(task.labels)):
+                    if task.probs[j] <= 0:
+                        continue   # 概率为 0 的选项在游戏中不会出现
+                    t = None if time is None else round(time - task.time_cost[j], ROUND)
+                    v = self.value(i + 1, t, flags | task.flags[j], round(stress + task.stress[j], ROUND))
+                    if best is None or self.key(v) < self.key(best[0]):
+                        best = (v, j)
+                (p_bad, mean), k = best
+                a = task.appear
+                if a < 1:
+                    skip = self.value(i + 1, time, flags, stress)
+                    result = (a * p_bad + (1 - a) * skip[0], a * mean + (1 - a) * skip[1])
+                else:
+                    result = (p_bad, mean)
+        self.policy[state] = k
+        self.memo[state] = result
+        return result
+
+
+def solve_policy(model, objective="mean", bad_threshold=60, bad_inclusive=True):
+    """
+    求 model（compiler.CompiledModel，如 demo_4.compile_model()）的最优选择策略，返回 dict：
+      objective、mean（该策略下最终压力的期望）、p_bad（坏结局概率）、
+      plan（所有任务都出现时的选择路线 [(任务名, 选项标签), ...]，最后一项为场景五的回复）、
+      final_stress（路线在场景五之前的累计压力）、policy（{(任务下标, 剩余时间, 标志位, 累计压力): 选项下标}，
+      任务下标 = 任务数 时为场景五的回复选项）、states（状态数）
+    缺省的坏结局定义与 demo_4 相同：压力 >= 60。
+    """
+    solver = _Solver(model, objective, bad_threshold, bad_inclusive)
+    time = None if model.time_budget is None else float(model.time_budget)
+    p_bad, mean = solver.value(0, time, 0, 0.0)
+
+    plan = []
+    state = (0, time, 0, 0.0)
+    for i, task in enumerate(model.tasks):
+        j = solver.policy[state]
+        if j is None:
+            plan.append((task.name, None))   # 时间不足，任务跳过
+            state = (i + 1,) + state[1:]
+            continue
+        t = None if state[1] is None else round(state[1] - task.time_cost[j], ROUND)
+        plan.append((task.name, task.labels[j]))
+        state = (i + 1, t, state[2] | task.flags[j], round(state[3] + task.stress[j], ROUND))
+    if model.overtime is not None:
+        plan.append((model.overtime.reply.name, model.overtime.reply.labels[solver.policy[state]]))
+
+    return {
+        "objective": objective,
+        "mean": mean,
+        "p_bad": p_bad,
+        "plan": plan,
+        "final_stress": state[3],
+        "policy": solver.policy,
+        "states": len(solver.memo),
+    }
+
+
+def format_result(result):
+    lines = [f"目标 {result['objective']}: 期望压力 {result['mean']:.3f}，坏结局概率 {result['p_bad']:.4f}"
+             f"（{result['states']} 个状态）"]
+    for name, label in result["plan"]:
+        lines.append(f"  {name} -> {label if label is not None else '(时间不足，跳过)'}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import demo_4
+    model = demo_4.compile_model()
+    for objective in OBJECTIVES:
+        result = solve_policy(model, objective)
+        print(format_result(result))
+    if math.isclose(solve_policy(model, "p_bad")["p_bad"], 1.0):
+        print("按当前参数，无论如何选择都无法达到好结局（压力 < 60）")
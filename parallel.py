@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+
+import engines
+from online_stats import OnlineStats
+
+# ========== 多进程并行运行器 ==========
+# 把 rounds 天平均切成 workers 份，每份使用 SeedSequence(seed).spawn(workers) 中
+# 各自独立的子种子，按份的顺序拼接结果。因此 (seed, workers) 相同时结果逐位一致，
+# 与进程调度顺序无关。每份内部再按 SHARD_CHUNK 天分批运行（子种子继续 spawn），
+# 以便只返回统计量时内存占用与天数无关。
+
+SHARD_CHUNK = 1 << 18
+
+
+def split_rounds(rounds, workers):
+    """把 rounds 切成 workers 份，前 rounds % workers 份各多 1 天。"""
+    base, extra = divmod(rounds, workers)
+    return [base + (1 if i < extra else 0) for i in range(workers)]
+
+
+def _iter_shard(name, rounds, seed_seq, kwargs):
+    """逐批产出一份的结果数组。"""
+    n_chunks = max(1, -(-rounds // SHARD_CHUNK))
+    for n, ss in zip(split_rounds(rounds, n_chunks), seed_seq.spawn(n_chunks)):
+        yield engines.run_engine(name, n, ss, **kwargs)
+
+
+def _run_shard(args):
+    name, rounds, seed_seq, kwargs = args
+    return np.concatenate(list(_iter_shard(name, rounds, seed_seq, kwargs)))
+
+
+def _run_shard_stats(args):
+    name, rounds, seed_seq, kwargs, stats_kwargs = args
+    stats = OnlineStats(**stats_kwargs)
+    for chunk in _iter_shard(name, rounds, seed_seq, kwargs):
+        stats.update(chunk)
+    return stats
+
+
+def _shards(rounds, workers, seed):
+    workers = max(1, min(workers or os.cpu_count() or 1, max(rounds, 1)))
+    seed_seqs = np.random.SeedSequence(seed).spawn(workers)
+    return list(zip(split_rounds(rounds, workers), seed_seqs))
+
+
+def _map(func, jobs):
+    if len(jobs) == 1:
+        return [func(job) for job in jobs]
+    from concurrent.futures import ProcessPoolExecutor   # 只在多进程时导入（减少启动时间）
+    with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+        return list(pool.map(func, jobs))
+
+
+def run_parallel(engine, rounds, workers=None, seed=None, **kwargs):
+    """
+    用进程池并行运行引擎 engine（见 engines.ENGINES），返回 rounds 天的最终压力数组。
+      - workers: 进程数，缺省为 CPU 核数；workers=1 时在当前进程内运行
+      - seed: 总种子；为 None 时每次运行都取新的随机熵
+      - kwargs: 透传给引擎（如 demo1 的 desired_mean / desired_std）
+    """
+    jobs = [(engine, n, ss, kwargs) for n, ss in _shards(rounds, workers, seed)]
+    return np.concatenate(_map(_run_shard, jobs))
+
+
+def run_parallel_stats(engine, rounds, workers=None, seed=None, stats_kwargs=None, **kwargs):
+    """
+    与 run_parallel 相同，但每个进程只返回 OnlineStats，合并后返回，
+    主进程与各进程的内存占用都与 rounds 无关。同一 (seed, workers) 的统计结果
+    与 run_parallel 返回数组的统计结果一致。
+      - stats_kwargs: 传给 OnlineStats 的参数（直方图范围、坏结局阈值等）
+    """
+    stats_kwargs = stats_kwargs or {}
+    jobs = [(engine, n, ss, kwargs, stats_kwargs) for n, ss in _shards(rounds, workers, seed)]
+    stats = OnlineStats(**stats_kwargs)
+    for shard_stats in _map(_run_shard_stats, jobs):
+        stats.merge(shard_stats)
+    return stats
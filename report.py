@@ -0,0 +1,100 @@
+import json
+
+# ========== 报告：由分箱计数绘图（无界面后端）并输出 JSON 摘要 ==========
+# 各 demo 的结果都累计在 OnlineStats 中，这里只用它的直方图计数与统计量：
+#   - 直方图、参考线（100 压力线、50/150 区间等）、标题统计量都由分箱计数绘制，
+#     耗时与模拟天数无关
+#   - 直接使用 Agg 画布（matplotlib.figure.Figure），不经过 pyplot，不弹出窗口，
+#     也不改变全局后端，可在没有显示器的服务器上运行
+#   - 同时把统计量与分箱计数写成 JSON，供看板使用，也可以之后用 render_summary 重新绘图
+# matplotlib 只在真正绘图时才导入。
+
+DEFAULT_PNG = "simulation_results.png"
+DEFAULT_JSON = "simulation_results.json"
+DEFAULT_BINS = 30
+FONT_RC = {
+    "font.sans-serif": ["SimHei", "DejaVu Sans"],   # 黑体显示中文，缺少时回退
+    "axes.unicode_minus": False,                    # 正常显示负号
+}
+
+
+def summarize(stats, bins=DEFAULT_BINS, offset=0.0, extra=None):
+    """
+    OnlineStats 的摘要 dict（可直接写成 JSON）：
+    stats.summary() 的各项、坏结局 / 区间的定义、histogram（counts 与 edges，edges 已加上 offset），
+    以及 extra 中的附加字段。
+    """
+    counts, edges = stats.histogram(bins=bins)
+    summary = stats.summary()
+    summary.update({
+        "bad_threshold": stats.bad_threshold,
+        "bad_inclusive": stats.bad_inclusive,
+        "band": list(stats.band),
+        "offset": offset,
+        "histogram": {
+            "counts": [int(c) for c in counts],
+            "edges": [float(e) + offset for e in edges],
+        },
+    })
+    if extra:
+        summary.update(extra)
+    return summary
+
+
+def render_histogram(counts, edges, path=DEFAULT_PNG, title="", xlabel=None, ylabel=None, vlines=(),
+                     figsize=(8, 6)):
+    """
+    由分箱计数绘制直方图并保存到 path（不显示窗口）。
+    vlines: [(x, 图例文字或 None, 线型), ...]，红色参考线。
+    """
+    import matplotlib
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    with matplotlib.rc_context(FONT_RC):
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        widths = [b - a for a, b in zip(edges[:-1], edges[1:])]
+        ax.bar(edges[:-1], counts, width=widths, align="edge", edgecolor="black")
+        labelled = False
+        for x, label, linestyle in vlines:
+            ax.axvline(x=x, color="red", linestyle=linestyle, linewidth=1, label=label)
+            labelled = labelled or label is not None
+        if xlabel:
+            ax.set_xlabel(xlabel)
+        if ylabel:
+            ax.set_ylabel(ylabel)
+        ax.set_title(title)
+        if labelled:
+            ax.legend()
+        fig.tight_layout()
+        fig.savefig(path)
+    return path
+
+
+def render_summary(summary, path=DEFAULT_PNG, **kwargs):
+    """用 summarize() 的结果（或读回的 JSON）重新绘图，kwargs 同 render_histogram。"""
+    hist = summary["histogram"]
+    return render_histogram(hist["counts"], hist["edges"], path, **kwargs)
+
+
+def write_json(summary, path=DEFAULT_JSON):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def report(stats, png_path=DEFAULT_PNG, json_path=DEFAULT_JSON, bins=DEFAULT_BINS, offset=0.0,
+           title="", xlabel=None, ylabel=None, vlines=(), figsize=(8, 6), extra=None):
+    """
+    报告阶段：由 stats 的分箱计数绘图保存到 png_path，并把摘要写入 json_path
+    （任一路径为 None 时跳过该项）。返回摘要 dict。
+    """
+    summary = summarize(stats, bins, offset, extra)
+    if png_path is not None:
+        render_summary(summary, png_path, title=title, xlabel=xlabel, ylabel=ylabel, vlines=vlines,
+                       figsize=figsize)
+    if json_path is not None:
+        write_json(summary, json_path)
+    return summary
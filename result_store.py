@@ -0,0 +1,201 @@
+import json
+import os
+
+import numpy as np
+
+import batch_engine
+from compiler import FLAG_PARTY, FLAG_REPLY, model_fingerprint
+
+# ========== 分块二进制结果存储：逐日明细、内存映射读取、断点续跑 ==========
+# 审计需要每一天的明细，但不能把几亿天放进 Python 列表或打印 log_lines。这里：
+#   - 每天一条定长记录（numpy 结构化 dtype）：最终压力、各场景压力、是否赴约、是否回复、
+#     回复选项、短信条数、结局（0 好 / 1 坏）
+#   - 按 chunk_size 天一块，每块一个 .bin 文件（原始字节，无头部），可用 np.memmap 零拷贝读取
+#   - manifest.json 记录模型指纹、dtype、种子与已完成的块；每块先写临时文件再改名，
+#     写完才登记到 manifest，中断后重新调用 run_to_store 会从最后一个完整的块继续
+#   - 第 i 块使用 SeedSequence(entropy, spawn_key=(i,))，与是否中断、从哪里继续无关，
+#     因此续跑的结果与一次跑完逐位一致
+
+MANIFEST = "manifest.json"
+STORE_VERSION = 1
+CHUNK_SIZE = 1 << 20
+
+
+def record_dtype(model):
+    """model 对应的定长记录类型（场景数决定 scene_stress 的长度）。"""
+    n_scenes = len(model.scenes) + (model.overtime is not None)
+    return np.dtype([
+        ("stress", "<f8"),
+        ("scene_stress", "<f8", (n_scenes,)),
+        ("is_party", "u1"),
+        ("replied", "u1"),
+        ("reply", "i1"),        # 场景五回复任务的选项下标，没有场景五时为 -1
+        ("sms_count", "u1"),
+        ("ending", "u1"),       # 0 好结局，1 坏结局
+    ])
+
+
+def scene_names(model):
+    names = [name for name, _ in model.scenes]
+    if model.overtime is not None:
+        names.append("场景五：下班后加班")
+    return names
+
+
+def _chunk_records(model, n, seed_seq, dtype, bad_threshold, bad_inclusive):
+    record = {}
+    rng = np.random.default_rng(seed_seq)
+    stress = batch_engine.evaluate_draws(model, batch_engine.draw_uniforms(model, n, rng), record)
+    out = np.empty(n, dtype=dtype)
+    out["stress"] = stress
+    out["scene_stress"] = record["scene_stress"].T
+    out["is_party"] = (record["flags"] & FLAG_PARTY) != 0
+    out["replied"] = (record["flags"] & FLAG_REPLY) != 0
+    out["reply"] = record.get("reply", -1)
+    out["sms_count"] = record.get("sms_count", 0)
+    out["ending"] = (stress >= bad_threshold) if bad_inclusive else (stress > bad_threshold)
+    return out
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _load_manifest(path):
+    with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _new_manifest(model, rounds, seed, chunk_size, dtype, bad_threshold, bad_inclusive):
+    return {
+        "version": STORE_VERSION,
+        "model": model_fingerprint(model),
+        "dtype": [list(d) for d in dtype.descr],
+        "scenes": scene_names(model),
+        "rounds": rounds,
+        "chunk_size": chunk_size,
+        "entropy": str(np.random.SeedSequence(seed).entropy),
+        "bad_threshold": bad_threshold,
+        "bad_inclusive": bad_inclusive,
+        "chunks": [],
+        "complete": False,
+    }
+
+
+def _check_resume(manifest, model, rounds, seed, chunk_size, dtype, bad_threshold, bad_inclusive):
+    if manifest.get("version") != STORE_VERSION:
+        raise ValueError(f"存储版本 {manifest.get('version')} 与当前版本 {STORE_VERSION} 不同")
+    if manifest["model"] != model_fingerprint(model):
+        raise ValueError("已有存储对应的模型与当前模型不同，不能续跑（请换一个目录）")
+    if np.dtype([tuple(d) for d in manifest["dtype"]]) != dtype:
+        raise ValueError("已有存储的记录格式与当前模型不同，不能续跑")
+    for key, value in (("rounds", rounds), ("chunk_size", chunk_size), ("bad_threshold", bad_threshold),
+                       ("bad_inclusive", bad_inclusive)):
+        if manifest[key] != value:
+            raise ValueError(f"已有存储的 {key}={manifest[key]}，与本次的 {value} 不同，不能续跑")
+    if seed is not None and str(np.random.SeedSequence(seed).entropy) != manifest["entropy"]:
+        raise ValueError(f"已有存储的种子熵为 {manifest['entropy']}，与本次的 seed={seed} 不同，不能续跑")
+
+
+def run_to_store(model, path, rounds, seed=None, chunk_size=CHUNK_SIZE, bad_threshold=100, bad_inclusive=False,
+                 progress=None):
+    """
+    用批量引擎模拟 rounds 天，逐块写入目录 path，返回 manifest。
+    path 中已有未完成的同一任务时从断点继续；已完成时直接返回。续跑时 seed 可省略（以 manifest 中
+    保存的种子熵为准），显式给出的 seed 必须与之相同，否则抛出 ValueError。
+    progress: 回调 progress(已完成天数, rounds)，每写完一块调用一次。
+    """
+    if rounds < 0 or chunk_size < 1:
+        raise ValueError("rounds 必须 >= 0，chunk_size 必须 >= 1")
+    dtype = record_dtype(model)
+    os.makedirs(path, exist_ok=True)
+    manifest_path = os.path.join(path, MANIFEST)
+    if os.path.exists(manifest_path):
+        manifest = _load_manifest(path)
+        _check_resume(manifest, model, rounds, seed, chunk_size, dtype, bad_threshold, bad_inclusive)
+    else:
+        manifest = _new_manifest(model, rounds, seed, chunk_size, dtype, bad_threshold, bad_inclusive)
+        _write_json(manifest_path, manifest)
+
+    entropy = int(manifest["entropy"])
+    done = sum(c["n"] for c in manifest["chunks"])
+    while done < rounds:
+        i = len(manifest["chunks"])
+        n = min(chunk_size, rounds - done)
+        out = _chunk_records(model, n, np.random.SeedSequence(entropy, spawn_key=(i,)), dtype,
+                             bad_threshold, bad_inclusive)
+        name = f"chunk_{i:06d}.bin"
+        tmp = os.path.join(path, name + ".tmp")
+        out.tofile(tmp)
+        os.replace(tmp, os.path.join(path, name))
+        manifest["chunks"].append({"file": name, "n": n})
+        done += n
+        manifest["complete"] = done >= rounds
+        _write_json(manifest_path, manifest)
+        if progress is not None:
+            progress(done, rounds)
+    if not manifest["complete"]:
+        manifest["complete"] = True
+        _write_json(manifest_path, manifest)
+    return manifest
+
+
+class ResultStore:
+    """
+    只读打开一个结果目录，每块用 np.memmap 映射（不读入内存）：
+        store = ResultStore("runs/demo2")
+        for chunk in store.iter_chunks():
+            chunk["stress"].mean(), chunk["is_party"].sum(), ...
+    """
+    def __init__(self, path):
+        self.path = path
+        self.manifest = _load_manifest(path)
+        self.dtype = np.dtype([tuple(d) for d in self.manifest["dtype"]])
+        self.scenes = self.manifest["scenes"]
+        self._offsets = np.cumsum([0] + [c["n"] for c in self.manifest["chunks"]])
+        for c in self.manifest["chunks"]:
+            size = os.path.getsize(os.path.join(path, c["file"]))
+            if size != c["n"] * self.dtype.itemsize:
+                raise ValueError(f"{c['file']} 的大小为 {size} 字节，应为 {c['n'] * self.dtype.itemsize}")
+
+    def __len__(self):
+        return int(self._offsets[-1])
+
+    @property
+    def complete(self):
+        return self.manifest["complete"]
+
+    def chunk(self, i):
+        """第 i 块的内存映射数组（结构化数组，字段见 record_dtype）。"""
+        c = self.manifest["chunks"][i]
+        return np.memmap(os.path.join(self.path, c["file"]), dtype=self.dtype, mode="r", shape=(c["n"],))
+
+    def iter_chunks(self):
+        for i in range(len(self.manifest["chunks"])):
+            yield self.chunk(i)
+
+    def __getitem__(self, day):
+        """第 day 天的记录（全局下标）。"""
+        if not 0 <= day < len(self):
+            raise IndexError(day)
+        i = int(np.searchsorted(self._offsets, day, side="right")) - 1
+        return self.chunk(i)[day - self._offsets[i]]
+
+    def column(self, field):
+        """把某个字段的全部天数拼成一个数组（会读入内存）。"""
+        if len(self) == 0:
+            return np.zeros(0, dtype=self.dtype[field])
+        return np.concatenate([np.asarray(c[field]) for c in self.iter_chunks()])
+
+    def stats(self, **stats_kwargs):
+        """按块累计最终压力的 OnlineStats（常数内存）；stats_kwargs 可覆盖清单中的坏结局设置。"""
+        from online_stats import OnlineStats
+        kwargs = {"bad_threshold": self.manifest["bad_threshold"],
+                  "bad_inclusive": self.manifest["bad_inclusive"], **stats_kwargs}
+        stats = OnlineStats(**kwargs)
+        for c in self.iter_chunks():
+            stats.update(c["stress"])
+        return stats
@@ -0,0 +1,257 @@
+import gc
+import hashlib
+import json
+import math
+import os
+import pickle
+
+import compiler
+from compiler import EFFECTS
+
+# ========== 场景文件：JSON / TOML 读取、校验、编译与磁盘缓存 ==========
+# 场景原本写死在代码里（demo_2 / demo_3 的 SCENES，demo_4 的 build_game_scenes）。
+# 这里从文件读取场景，格式与 SCENES 相同（选项效果见 compiler.EFFECTS），另加时间预算与场景五：
+#   {
+#     "time_budget": 10,                         # 可选，缺省不限时
+#     "scenes": [{"name": "场景一", "tasks": [
+#         {"name": "是否吃早餐", "appear_prob": 1.0, "options": [
+#             {"label": "A. 吃", "prob": 0.8, "time_cost": 0.5, "stress": 5}, ...]}]}],
+#     "overtime": {                              # 可选，缺省没有场景五
+#         "reply_options": [{"label": "A. 回复", "prob": 0.5, "time_cost": 0.5, "stress": 5,
+#                            "effects": ["reply"]}, ...],
+#         "sms_values": [10, 15, 8, 6], "sms_min": 2, "sms_max": 4,
+#         "party_factor": 1.2, "relieve_prob": 0.7, "relieve_ratio": 0.2}
+#   }
+# 读取流程：文件字节的 sha1（连同 LOADER_VERSION）作为键 -> 进程内缓存 -> 磁盘缓存（pickle 的
+# CompiledModel）-> 解析、校验、编译并写入缓存。内容不变时再次读取不解析也不校验。
+# 读取 pickle 可以执行任意代码，因此磁盘缓存缺省放在只有当前用户可写的目录
+# （$XDG_CACHE_HOME 或 ~/.cache 下的 stress_sim/scenarios，权限 0700），而不是场景文件旁边；
+# 显式传入的 cache_dir 也只应指向自己可信的目录。
+
+LOADER_VERSION = 2
+CACHE_APP_DIR = os.path.join("stress_sim", "scenarios")
+OVERTIME_DEFAULTS = {"sms_min": 2, "sms_max": compiler.SMS_COUNT, "party_factor": 1.2, "relieve_prob": 0.7,
+                     "relieve_ratio": 0.2}
+
+_MODEL_CACHE = {}
+
+
+# ========== 校验 ==========
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _require(data, key, where, kind):
+    if not isinstance(data, dict):
+        raise ValueError(f"{where} 应为对象")
+    if key not in data:
+        raise ValueError(f"{where} 缺少字段 {key}")
+    return _check_type(data[key], f"{where}.{key}", kind)
+
+
+def _check_type(value, where, kind):
+    if kind == "number" and not _is_number(value):
+        raise ValueError(f"{where} 应为有限的数字，实际为 {value!r}")
+    if kind == "int" and (not isinstance(value, int) or isinstance(value, bool)):
+        raise ValueError(f"{where} 应为整数，实际为 {value!r}")
+    if kind == "str" and (not isinstance(value, str) or not value):
+        raise ValueError(f"{where} 应为非空字符串，实际为 {value!r}")
+    if kind == "list" and not isinstance(value, list):
+        raise ValueError(f"{where} 应为数组")
+    if kind == "dict" and not isinstance(value, dict):
+        raise ValueError(f"{where} 应为对象")
+    return value
+
+
+def _check_keys(data, allowed, where):
+    extra = set(data) - set(allowed)
+    if extra:
+        raise ValueError(f"{where} 含未知字段: {', '.join(sorted(extra))}")
+
+
+def _parse_effects(names, where):
+    return compiler.effect_flags(_check_type(names, where, "list"), where)
+
+
+def _parse_task(data, where):
+    _check_type(data, where, "dict")
+    _check_keys(data, ("name", "appear_prob", "options"), where)
+    name = _require(data, "name", where, "str")
+    appear = _check_type(data.get("appear_prob", 1.0), f"{where}.appear_prob", "number")
+    options = _require(data, "options", where, "list")
+    labels, weights, stress, time_cost, flags = [], [], [], [], []
+    for j, opt in enumerate(options):
+        w = f"{where}.options[{j}]"
+        _check_type(opt, w, "dict")
+        _check_keys(opt, ("label", "prob", "time_cost", "stress", "effects"), w)
+        labels.append(_require(opt, "label", w, "str"))
+        weights.append(_require(opt, "prob", w, "number"))
+        stress.append(_require(opt, "stress", w, "number"))
+        time_cost.append(_check_type(opt.get("time_cost", 0), f"{w}.time_cost", "number"))
+        flags.append(_parse_effects(opt.get("effects", []), f"{w}.effects"))
+    if len(set(labels)) != len(labels):
+        raise ValueError(f"{where} 的选项标签重复")
+    try:
+        compiler.check_task(name, appear, weights, stress)
+    except ValueError as e:
+        raise ValueError(f"{where}: {e}") from None
+    return compiler.CompiledTask(name, appear, labels, weights, stress, time_cost, flags)
+
+
+def _parse_overtime(data, where):
+    _check_type(data, where, "dict")
+    _check_keys(data, ("reply_options", "sms_values") + tuple(OVERTIME_DEFAULTS), where)
+    reply = _parse_task({"name": "加班短信回复", "options": _require(data, "reply_options", where, "list")},
+                        f"{where}.reply_options")
+    sms_values = _require(data, "sms_values", where, "list")
+    for j, value in enumerate(sms_values):
+        _check_type(value, f"{where}.sms_values[{j}]", "number")
+    p = dict(OVERTIME_DEFAULTS)
+    for key in OVERTIME_DEFAULTS:
+        if key in data:
+            p[key] = _check_type(data[key], f"{where}.{key}", "int" if key.startswith("sms_") else "number")
+    if not 0 <= p["sms_min"] <= p["sms_max"] <= len(sms_values):
+        raise ValueError(f"{where}: 需要 0 <= sms_min <= sms_max <= len(sms_values)")
+    for key in ("relieve_prob", "relieve_ratio"):
+        if not 0 <= p[key] <= 1:
+            raise ValueError(f"{where}.{key} 必须在 [0, 1] 内")
+    return compiler.CompiledOvertime(reply, sms_values, p["sms_min"], p["sms_max"], p["party_factor"],
+                                     p["relieve_prob"], p["relieve_ratio"])
+
+
+def compile_scenario(data, source="scenario"):
+    """校验场景数据（已解析的 dict）并编译为 compiler.CompiledModel；不合法时抛出 ValueError（含字段路径）。"""
+    _check_type(data, source, "dict")
+    _check_keys(data, ("name", "time_budget", "scenes", "overtime"), source)
+    time_budget = data.get("time_budget")
+    if time_budget is not None:
+        _check_type(time_budget, f"{source}.time_budget", "number")
+    scenes = []
+    for i, scene in enumerate(_require(data, "scenes", source, "list")):
+        where = f"{source}.scenes[{i}]"
+        _check_type(scene, where, "dict")
+        _check_keys(scene, ("name", "tasks"), where)
+        tasks = [_parse_task(t, f"{where}.tasks[{j}]")
+                 for j, t in enumerate(_require(scene, "tasks", where, "list"))]
+        scenes.append((_require(scene, "name", where, "str"), tasks))
+    overtime = None
+    if data.get("overtime") is not None:
+        overtime = _parse_overtime(data["overtime"], f"{source}.overtime")
+    return compiler.CompiledModel(scenes, overtime, time_budget)
+
+
+# ========== 读取与缓存 ==========
+
+def parse_file(path, raw=None):
+    """按扩展名解析 .json / .toml 文件为 dict（raw 为已读入的字节时不再读文件）。"""
+    if raw is None:
+        with open(path, "rb") as f:
+            raw = f.read()
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".json":
+        return json.loads(raw.decode("utf-8"))
+    if ext == ".toml":
+        try:
+            import tomllib
+        except ImportError:
+            raise ValueError("读取 TOML 需要 Python 3.11+（tomllib）") from None
+        return tomllib.loads(raw.decode("utf-8"))
+    raise ValueError(f"不支持的场景文件类型: {ext}（仅支持 .json / .toml）")
+
+
+def content_key(raw, ext):
+    h = hashlib.sha1()
+    h.update(f"{LOADER_VERSION}:{ext}:".encode())
+    h.update(raw)
+    return h.hexdigest()
+
+
+def default_cache_dir():
+    """当前用户私有的缓存目录：$XDG_CACHE_HOME/stress_sim/scenarios，缺省 ~/.cache/stress_sim/scenarios。"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, CACHE_APP_DIR)
+
+
+def load_scenario(path, cache_dir=None, use_cache=True):
+    """
+    读取场景文件并返回 compiler.CompiledModel。
+      - cache_dir: 磁盘缓存目录，缺省为 default_cache_dir()（当前用户私有）
+      - use_cache=False 时总是重新解析、校验、编译（也不写缓存）
+    缓存以文件内容的哈希为键，文件改动后自动失效；缓存文件损坏时重新编译并覆盖。
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    ext = os.path.splitext(path)[1].lower()
+    if not use_cache:
+        return compile_scenario(parse_file(path, raw), os.path.basename(path))
+
+    key = content_key(raw, ext)
+    if key in _MODEL_CACHE:
+        return _MODEL_CACHE[key]
+    cache_dir = cache_dir or default_cache_dir()
+    cache_path = os.path.join(cache_dir, f"{key}.pickle")
+    model = None
+    if os.path.exists(cache_path):
+        gc.disable()   # 一次性创建大量小对象，暂停循环垃圾回收可使反序列化快约一倍
+        try:
+            with open(cache_path, "rb") as f:
+                model = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            model = None
+        finally:
+            gc.enable()
+    if model is None:
+        model = compile_scenario(parse_file(path, raw), os.path.basename(path))
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        tmp = cache_path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_path)
+    _MODEL_CACHE[key] = model
+    return model
+
+
+def clear_memory_cache():
+    _MODEL_CACHE.clear()
+
+
+# ========== 导出：把已有 demo 的模型写成场景文件 ==========
+
+def _effect_names(flag):
+    return [name for name, bit in EFFECTS.items() if flag & bit]
+
+
+def _task_data(task):
+    return [{"label": label, "prob": prob, "time_cost": cost, "stress": stress, "effects": _effect_names(flag)}
+            for label, prob, cost, stress, flag in zip(task.labels, task.weights, task.time_cost, task.stress,
+                                                       task.flags)]
+
+
+def model_to_scenario(model):
+    """CompiledModel -> 场景 dict（选项效果按编译出的标志位写出），可用 json.dump 保存后由 load_scenario 读回。"""
+    data = {
+        "time_budget": model.time_budget,
+        "scenes": [{"name": name, "tasks": [{"name": t.name, "appear_prob": t.appear, "options": _task_data(t)}
+                                            for t in tasks]}
+                   for name, tasks in model.scenes],
+    }
+    ot = model.overtime
+    if ot is not None:
+        data["overtime"] = {
+            "reply_options": _task_data(ot.reply),
+            "sms_values": list(ot.sms_values),
+            "sms_min": ot.sms_min,
+            "sms_max": ot.sms_max,
+            "party_factor": ot.party_factor,
+            "relieve_prob": ot.relieve_prob,
+            "relieve_ratio": ot.relieve_ratio,
+        }
+    return data
+
+
+def dump_scenario(model, path):
+    """把 model 写成 JSON 场景文件。"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(model_to_scenario(model), f, ensure_ascii=False, indent=2)
+    return path
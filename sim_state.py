@@ -0,0 +1,84 @@
+import numpy as np
+
+from compiler import FLAG_PARTY, FLAG_REPLY
+
+# ========== 单日仿真状态 ==========
+# 原先 demo_1 / demo_4 通过模块全局变量 IS_PARTY 在场景之间传递“是否已赴约”，
+# 同一进程内无法同时（多线程 / 交替）模拟多天。现在每一天使用一个独立的状态对象：
+#   - flags: 整数标志位（compiler.FLAG_PARTY / FLAG_REPLY）
+#   - time: 剩余时间（None 表示不限时）
+#   - stress: 累计压力
+# 场景、短信任务只读写传入的状态，不再依赖全局变量。
+# BatchDayState 是同样的状态按数组存放 N 天，供批量引擎使用。
+
+
+class DayState:
+    __slots__ = ("flags", "time", "stress")
+
+    def __init__(self, time=None, stress=0, flags=0):
+        self.flags = flags
+        self.time = time
+        self.stress = stress
+
+    def set_flag(self, flag):
+        self.flags |= flag
+
+    def has_flag(self, flag):
+        return bool(self.flags & flag)
+
+    @property
+    def is_party(self):
+        """是否已答应赴约（场景五短信压力上调）"""
+        return bool(self.flags & FLAG_PARTY)
+
+    @property
+    def replied(self):
+        """是否回复了加班短信"""
+        return bool(self.flags & FLAG_REPLY)
+
+    def out_of_time(self):
+        """剩余时间不足，普通任务不再执行"""
+        return self.time is not None and self.time <= 0
+
+    def apply(self, stress_change, time_cost=0):
+        """记录一次选择的结果：累加压力、扣除时间。"""
+        self.stress += stress_change
+        if self.time is not None:
+            self.time -= time_cost
+
+
+class BatchDayState:
+    """N 天的状态，字段与 DayState 相同，但都是长度为 n 的数组。"""
+    def __init__(self, n, time=None):
+        self.n = n
+        self.flags = np.zeros(n, dtype=np.int64)
+        self.time = None if time is None else np.full(n, float(time))
+        self.stress = np.zeros(n)
+
+    def set_flag(self, flag, mask):
+        """对 mask 为 True 的那些天置标志位（mask 也可以是标志位数组）。"""
+        self.flags |= np.where(mask, flag, 0)
+
+    def has_flag(self, flag):
+        return (self.flags & flag) != 0
+
+    @property
+    def is_party(self):
+        return self.has_flag(FLAG_PARTY)
+
+    @property
+    def replied(self):
+        return self.has_flag(FLAG_REPLY)
+
+    def has_time(self):
+        """还有剩余时间的天（不限时则全部为 True）"""
+        if self.time is None:
+            return np.ones(self.n, dtype=bool)
+        return self.time > 0
+
+    def apply(self, mask, stress_change, time_cost=0.0, flags=0):
+        """对 mask 为 True 的天累加压力、扣除时间、置标志位。"""
+        self.stress += np.where(mask, stress_change, 0.0)
+        self.flags |= np.where(mask, flags, 0)
+        if self.time is not None:
+            self.time -= np.where(mask, time_cost, 0.0)
@@ -0,0 +1,105 @@
+import argparse
+import json
+import sys
+
+# ========== 命令行入口：只算数字时快速启动 ==========
+# 选择引擎（demo_1~demo_4 的规则，逐日循环或批量）、天数、种子、进程数与输出格式：
+#   python simulate.py batch2 --rounds 1000000 --seed 1
+#   python simulate.py demo4 --rounds 100000 --workers 4 --format json
+#   python simulate.py batch3 --calibrated --plot simulation_results.png
+# 本模块顶层只导入标准库；numpy / 引擎在解析参数之后才导入，matplotlib 只在 --plot 时导入。
+# 结果与 parallel.run_parallel_stats 相同：(seed, workers) 相同时逐位一致。
+
+ENGINE_HELP = {
+    "demo1": "demo_1 逐日循环",
+    "demo2": "demo_2 逐日循环",
+    "demo3": "demo_3 逐日循环",
+    "demo4": "demo_4 概率模式逐日循环",
+    "batch2": "demo_2 规则的批量引擎",
+    "batch3": "demo_3 规则的批量引擎",
+    "batch4": "demo_4 规则的批量引擎",
+}
+# 各引擎的坏结局定义（demo_4 为压力 >= 60，其余为 > 100）
+ENGINE_STATS = {
+    "demo4": {"bad_threshold": 60, "bad_inclusive": True},
+    "batch4": {"bad_threshold": 60, "bad_inclusive": True},
+}
+# 各引擎接受的额外参数
+ENGINE_KWARGS = {
+    "demo1": ("desired_mean", "desired_std"),
+    "demo3": ("desired_std", "calibrated"),
+    "batch3": ("desired_std", "calibrated"),
+}
+FORMATS = ("text", "json")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="按 demo 规则模拟压力分布（只输出数字时不导入 matplotlib）")
+    parser.add_argument("engine", choices=list(ENGINE_HELP),
+                        help="; ".join(f"{k}: {v}" for k, v in ENGINE_HELP.items()))
+    parser.add_argument("--rounds", type=int, default=10000, help="模拟天数（缺省 10000）")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子（缺省不固定）")
+    parser.add_argument("--workers", type=int, default=1, help="进程数（缺省 1，在当前进程内运行）")
+    parser.add_argument("--format", choices=FORMATS, default="text", help="输出格式")
+    parser.add_argument("--plot", nargs="?", const="simulation_results.png", default=None, metavar="PATH",
+                        help="同时绘制直方图（缺省路径 simulation_results.png）")
+    parser.add_argument("--desired-mean", type=float, default=None, help="demo1 的目标均值")
+    parser.add_argument("--desired-std", type=float, default=None, help="demo1 / demo3 的目标标准差")
+    parser.add_argument("--calibrated", action="store_true", help="demo3：按精确矩校准（真实场景五）")
+    return parser
+
+
+def engine_kwargs(args):
+    """命令行参数中该引擎用得到的部分。"""
+    kwargs = {}
+    for key in ENGINE_KWARGS.get(args.engine, ()):
+        value = getattr(args, key)
+        if value is not None and value is not False:
+            kwargs[key] = value
+    return kwargs
+
+
+def run(engine, rounds, seed=None, workers=1, **kwargs):
+    """模拟 rounds 天，返回 OnlineStats（坏结局定义按引擎选择）。"""
+    import parallel
+    return parallel.run_parallel_stats(engine, rounds, workers=workers, seed=seed,
+                                       stats_kwargs=ENGINE_STATS.get(engine, {}), **kwargs)
+
+
+def format_text(engine, stats):
+    s = stats.summary()
+    return (f"{engine}: {s['count']} 天 => mean={s['mean']:.4f}, std={s['std']:.4f}, "
+            f"P(坏结局)={s['p_bad']:.5f}, [75,125] 内 {s['in_band_ratio']:.2%}, "
+            f"p05/p50/p95={s['p05']:.2f}/{s['p50']:.2f}/{s['p95']:.2f}")
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.rounds < 1:
+        parser.error("--rounds 必须 >= 1")
+    if args.workers < 1:
+        parser.error("--workers 必须 >= 1")
+
+    stats = run(args.engine, args.rounds, args.seed, args.workers, **engine_kwargs(args))
+
+    if args.format == "json":
+        import report
+        summary = report.summarize(stats, extra={"engine": args.engine, "seed": args.seed,
+                                                 "workers": args.workers})
+        json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print(format_text(args.engine, stats))
+
+    if args.plot is not None:
+        import report
+        report.report(stats, png_path=args.plot, json_path=None,
+                      title=f"{args.engine}: {stats.count} 天, mean={stats.mean:.2f}, std={stats.std:.2f}",
+                      xlabel="累计压力", ylabel="次数")
+        print(f"绘图已保存为 {args.plot}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
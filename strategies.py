@@ -0,0 +1,281 @@
+import abc
+import itertools
+import time
+
+import numpy as np
+
+import batch_engine
+from compiler import FLAG_PARTY, FLAG_REPLY
+from sim_state import BatchDayState
+
+# ========== 玩家策略库：多个策略在同一批随机数上批量比较 ==========
+# run_game_auto 只评估一种行为（按 prob 抽选）。这里把“玩家怎么选”抽象成策略：
+#   strategy.choose(i, task, state, u) -> 该任务内的选项下标（标量，或按每天状态给出的长度 n 数组）
+#     i: 任务下标（i == len(model.tasks) 为场景五的回复任务），task: CompiledTask
+#     state: BatchDayState（做这个选择之前的压力 / 剩余时间 / 标志位），u: 该任务的抽选均匀数
+#     返回 None 表示按选项概率抽选（与批量引擎的缺省行为逐位一致）
+# 评估时每块天数只抽一次随机数（任务出现、短信条数、短信缓解等），所有策略共用
+# （公共随机数），策略之间的差异不含抽样噪声；每个策略在一块上只是一次向量化计算。
+# 第 c 块使用 SeedSequence(entropy, spawn_key=(c,))；workers > 1 时按策略分给多个进程，
+# 各进程按相同种子重新抽取同样的随机数，结果与 workers 无关。
+# 策略会被发送到子进程，需可 pickle（不要用 lambda 作为评分函数）。
+
+CHUNK_SIZE = 1 << 18
+SORT_KEYS = ("mean", "p_bad", "time_left")
+
+
+class Strategy(abc.ABC):
+    """策略基类：子类实现 choose。name 用于结果表。"""
+    name = "策略"
+
+    @abc.abstractmethod
+    def choose(self, i, task, state, u):
+        """返回该任务内的选项下标（标量或长度 n 的数组），None 表示按概率抽选。"""
+
+
+class ProbStrategy(Strategy):
+    """按选项的 prob 抽选，即 run_game_auto 的行为。"""
+    def __init__(self, name="按概率"):
+        self.name = name
+
+    def choose(self, i, task, state, u):
+        return None
+
+
+class FixedStrategy(Strategy):
+    """
+    固定选择：choices 为 {任务名: 选项标签}，如 {"是否回复老板短信": "A. 回复"}；
+    未列出的任务交给 fallback（缺省按概率抽选）。
+    """
+    def __init__(self, name, choices, fallback=None):
+        self.name = name
+        self.choices = dict(choices)
+        self.fallback = fallback or ProbStrategy()
+        self._index = {}
+
+    def choose(self, i, task, state, u):
+        label = self.choices.get(task.name)
+        if label is None:
+            return self.fallback.choose(i, task, state, u)
+        key = (task.name, label)
+        if key not in self._index:
+            if label not in task.labels:
+                raise ValueError(f"任务 {task.name} 没有选项 {label}，可选: {', '.join(task.labels)}")
+            self._index[key] = task.labels.index(label)
+        return self._index[key]
+
+
+def _score_stress(task, j):
+    return task.stress[j]
+
+
+def _score_time(task, j):
+    return task.time_cost[j]
+
+
+def _score_stress_per_time(task, j):
+    cost = task.time_cost[j]
+    return task.stress[j] / cost if cost > 0 else float("inf")
+
+
+SCORES = {
+    "stress": _score_stress,                    # 压力变化最小
+    "time": _score_time,                        # 耗时最少
+    "stress_per_time": _score_stress_per_time,  # 单位时间压力最小
+}
+
+
+class GreedyStrategy(Strategy):
+    """
+    贪心：每个任务选评分最小的选项（同分取靠前的）。score 为 SCORES 中的名字，
+    或模块级函数 score(task, 选项下标) -> 数值。
+    """
+    def __init__(self, score="stress", name=None):
+        if isinstance(score, str):
+            if score not in SCORES:
+                raise ValueError(f"未知评分: {score}，可选: {', '.join(SCORES)}")
+            self.name = name or f"贪心({score})"
+            score = SCORES[score]
+        else:
+            self.name = name or f"贪心({score.__name__})"
+        self.score = score
+        self._index = {}
+
+    def choose(self, i, task, state, u):
+        # 按任务本身缓存（而不是任务下标 i）：同名任务在不同模型中压力 / 耗时可能不同，一并作为键
+        key = (task.name, tuple(task.labels), tuple(task.stress), tuple(task.time_cost))
+        if key not in self._index:
+            scores = [self.score(task, j) for j in range(len(task.labels))]
+            self._index[key] = min(range(len(scores)), key=scores.__getitem__)
+        return self._index[key]
+
+
+class ThresholdStrategy(Strategy):
+    """
+    按当前累计压力二选一：压力 < threshold 时选 below，否则选 above（两者都是选项标签）。
+    其余任务交给 fallback（缺省按概率抽选）。例：压力不高时才赴约。
+    """
+    def __init__(self, name, task_name, threshold, below, above, fallback=None):
+        self.name = name
+        self.task_name = task_name
+        self.threshold = threshold
+        self.below = below
+        self.above = above
+        self.fallback = fallback or ProbStrategy()
+
+    def choose(self, i, task, state, u):
+        if task.name != self.task_name:
+            return self.fallback.choose(i, task, state, u)
+        for label in (self.below, self.above):
+            if label not in task.labels:
+                raise ValueError(f"任务 {task.name} 没有选项 {label}，可选: {', '.join(task.labels)}")
+        return np.where(state.stress < self.threshold, task.labels.index(self.below), task.labels.index(self.above))
+
+
+def all_tasks(model):
+    """model 中可供选择的全部任务（普通任务 + 场景五的回复任务）。"""
+    tasks = list(model.tasks)
+    if model.overtime is not None:
+        tasks.append(model.overtime.reply)
+    return tasks
+
+
+def fixed_plans(model):
+    """枚举每个任务各选一个选项的全部固定路线（选项数之积个 FixedStrategy）。"""
+    tasks = all_tasks(model)
+    plans = []
+    for labels in itertools.product(*(t.labels for t in tasks)):
+        name = " / ".join(label.split(".")[0] for label in labels)
+        plans.append(FixedStrategy(name, {t.name: label for t, label in zip(tasks, labels)}))
+    return plans
+
+
+def default_strategies(model):
+    """
+    一组常用策略：按概率、各贪心、总是 / 从不回复短信、总是 / 从不赴约、按压力决定是否赴约，
+    以及全部固定路线。“回复”/“赴约”选项按编译出的标志位（选项声明的 effects）查找。
+    """
+    strategies = [ProbStrategy()] + [GreedyStrategy(score) for score in SCORES]
+    ot = model.overtime
+    if ot is not None:
+        reply = ot.reply
+        yes = [label for label, flag in zip(reply.labels, reply.flags) if flag & FLAG_REPLY]
+        no = [label for label in reply.labels if label not in yes]
+        if yes:
+            strategies.append(FixedStrategy("总是回复短信", {reply.name: yes[0]}))
+        if no:
+            strategies.append(FixedStrategy("从不回复短信", {reply.name: no[0]}))
+    for task in model.tasks:
+        party = [label for label, flag in zip(task.labels, task.flags) if flag & FLAG_PARTY]
+        if not party:
+            continue
+        other = [label for label in task.labels if label not in party][0]
+        strategies.append(FixedStrategy("总是赴约", {task.name: party[0]}))
+        strategies.append(FixedStrategy("从不赴约", {task.name: other}))
+        for threshold in (30, 40, 50):
+            strategies.append(ThresholdStrategy(f"压力<{threshold}才赴约", task.name, threshold, party[0], other))
+    return strategies + fixed_plans(model)
+
+
+def evaluate_strategy(model, strategy, draws):
+    """在一份随机数上评估一个策略，返回 (最终压力数组, 结束时剩余时间数组或 None, 标志位数组)。"""
+    state = BatchDayState(draws["n"], model.time_budget)
+    stress = batch_engine.evaluate_draws(model, draws, policy=strategy.choose, state=state)
+    return stress, state.time, state.flags
+
+
+class _Totals:
+    __slots__ = ("n", "s1", "s2", "bad", "time", "party", "replied")
+
+    def __init__(self):
+        self.n = 0
+        self.s1 = self.s2 = self.time = 0.0
+        self.bad = self.party = self.replied = 0
+
+    def update(self, stress, time_left, flags, bad_threshold, bad_inclusive):
+        self.n += len(stress)
+        self.s1 += float(stress.sum())
+        self.s2 += float(np.dot(stress, stress))
+        self.bad += int(np.count_nonzero((stress >= bad_threshold) if bad_inclusive else (stress > bad_threshold)))
+        if time_left is not None:
+            self.time += float(time_left.sum())
+        self.party += int(np.count_nonzero(flags & FLAG_PARTY))
+        self.replied += int(np.count_nonzero(flags & FLAG_REPLY))
+
+    def row(self, name, timed):
+        mean = self.s1 / self.n
+        return {
+            "name": name,
+            "mean": mean,
+            "std": float(np.sqrt(max(self.s2 / self.n - mean * mean, 0.0))),
+            "p_bad": self.bad / self.n,
+            "time_left": self.time / self.n if timed else None,
+            "party_rate": self.party / self.n,
+            "reply_rate": self.replied / self.n,
+        }
+
+
+def _evaluate_job(args):
+    model, strategies, rounds, entropy, chunk_size, bad_threshold, bad_inclusive = args
+    totals = [_Totals() for _ in strategies]
+    for c, start in enumerate(range(0, rounds, chunk_size)):
+        n = min(chunk_size, rounds - start)
+        rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=(c,)))
+        draws = batch_engine.draw_uniforms(model, n, rng)
+        for strategy, total in zip(strategies, totals):
+            stress, time_left, flags = evaluate_strategy(model, strategy, draws)
+            total.update(stress, time_left, flags, bad_threshold, bad_inclusive)
+    return [total.row(s.name, model.time_budget is not None) for s, total in zip(strategies, totals)]
+
+
+def evaluate_strategies(model, strategies, rounds, seed=None, workers=1, chunk_size=CHUNK_SIZE, bad_threshold=60,
+                        bad_inclusive=True):
+    """
+    在同一批随机数上评估全部策略，每个策略 rounds 天。返回 dict：
+      rows（与 strategies 同序，每行 name、mean、std、p_bad、time_left（平均剩余时间，不限时为 None）、
+      party_rate、reply_rate）、rounds、elapsed
+    缺省的坏结局定义与 demo_4 相同：压力 >= 60。
+    """
+    if rounds < 1 or chunk_size < 1:
+        raise ValueError("rounds 与 chunk_size 必须 >= 1")
+    names = [s.name for s in strategies]
+    if len(set(names)) != len(names):
+        raise ValueError("策略名重复")
+    start = time.perf_counter()
+    entropy = np.random.SeedSequence(seed).entropy
+    workers = max(1, min(workers, len(strategies)))
+    groups = [strategies[w::workers] for w in range(workers)]
+    jobs = [(model, group, rounds, entropy, chunk_size, bad_threshold, bad_inclusive) for group in groups]
+    if workers == 1:
+        results = [_evaluate_job(job) for job in jobs]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_evaluate_job, jobs))
+    by_name = {row["name"]: row for rows in results for row in rows}
+    return {"rows": [by_name[name] for name in names], "rounds": rounds, "elapsed": time.perf_counter() - start}
+
+
+def format_table(rows, sort_by="mean", limit=None):
+    """按 sort_by（mean / p_bad / time_left）升序排列的对比表文本。"""
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"未知排序字段: {sort_by}，可选: {', '.join(SORT_KEYS)}")
+    rows = sorted(rows, key=lambda r: (r[sort_by] is None, r[sort_by] or 0.0, r["mean"]))
+    if limit is not None:
+        rows = rows[:limit]
+    width = max([len(r["name"]) for r in rows] + [4])
+    lines = [f"{'策略':<{width}}  {'平均压力':>8}  {'标准差':>7}  {'P(坏结局)':>9}  {'剩余时间':>8}  {'赴约':>6}  {'回复':>6}"]
+    for r in rows:
+        time_left = "-" if r["time_left"] is None else f"{r['time_left']:.2f}"
+        lines.append(f"{r['name']:<{width}}  {r['mean']:>8.2f}  {r['std']:>7.2f}  {r['p_bad']:>9.4f}  "
+                     f"{time_left:>8}  {r['party_rate']:>6.2%}  {r['reply_rate']:>6.2%}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import demo_4
+    model = demo_4.compile_model()
+    strategies = default_strategies(model)
+    result = evaluate_strategies(model, strategies, rounds=1000000, seed=0)
+    print(format_table(result["rows"], limit=20))
+    print(f"{len(strategies)} 个策略 × {result['rounds']} 天，耗时 {result['elapsed']:.1f}s")
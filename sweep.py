@@ -0,0 +1,311 @@
+import copy
+import hashlib
+import itertools
+import json
+import math
+import os
+
+import numpy as np
+
+import batch_engine
+from compiler import model_fingerprint
+from online_stats import OnlineStats
+
+# ========== 参数扫描：公共随机数 + 结果缓存 ==========
+# 一次调用评估一组参数配置，不再需要改模块常量后重跑脚本。
+#   - 每个配置编译成一个 CompiledModel（demo1 为 4 个场景变体的混合），用批量引擎模拟
+#   - 公共随机数：形状相同的模型共用同一份均匀随机数（batch_engine.draw_uniforms），
+#     各配置之间的差异只来自参数本身，比较配置时方差很小
+#   - 结果按“编译后模型 + rounds + seed”的哈希缓存（内存，可选磁盘目录），重复扫描直接返回；
+#     seed 为 None 时每次结果不同，不缓存
+#
+# 可扫描的参数：
+#   sms_a / sms_b（demo2）、relieve_prob / relieve_ratio / sms_party_factor（全部 demo）、
+#   desired_std（demo1、demo3），以及选项概率 "prob:任务名/选项标签"
+#   （设置后同一任务其余选项按比例缩放，保持概率之和为 1；同一任务只应设置一个选项）
+
+SWEEP_SEED = 20240601
+PROB_PREFIX = "prob:"
+OVERTIME_KEYS = ("sms_a", "sms_b", "relieve_prob", "relieve_ratio", "sms_party_factor")
+
+DEMO_KEYS = {
+    "demo1": {"desired_std", "relieve_prob", "relieve_ratio", "sms_party_factor"},
+    "demo2": set(OVERTIME_KEYS),
+    "demo3": {"desired_std", "relieve_prob", "relieve_ratio", "sms_party_factor"},
+    "demo4": {"relieve_prob", "relieve_ratio", "sms_party_factor"},
+}
+DEMO_STATS = {
+    "demo1": {},
+    "demo2": {},
+    "demo3": {},
+    "demo4": {"bad_threshold": 60, "bad_inclusive": True},
+}
+
+_RESULT_CACHE = {}
+
+
+def grid(**axes):
+    """参数网格：grid(relieve_prob=[0.5, 0.7], sms_b=[2, 3]) -> 4 个参数 dict。"""
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[k] for k in names))]
+
+
+def _split_params(demo, params):
+    """拆分为 (普通参数, {(任务名, 选项标签): 概率})，并检查参数名。"""
+    if demo not in DEMO_KEYS:
+        raise ValueError(f"不支持的 demo: {demo}，可选 {sorted(DEMO_KEYS)}")
+    plain, probs = {}, {}
+    for key, value in params.items():
+        if key.startswith(PROB_PREFIX):
+            task_name, sep, label = key[len(PROB_PREFIX):].partition("/")
+            if not sep:
+                raise ValueError(f"选项概率参数应为 'prob:任务名/选项标签'，收到 {key}")
+            if not 0.0 <= value <= 1.0:
+                raise ValueError(f"{key}={value} 不在 [0,1] 内")
+            probs[(task_name, label)] = value
+        elif key in DEMO_KEYS[demo]:
+            plain[key] = value
+        else:
+            raise ValueError(f"{demo} 不支持参数 {key}，可选 {sorted(DEMO_KEYS[demo])} 或 {PROB_PREFIX}任务名/选项标签")
+    return plain, probs
+
+
+def _rescale(labels, probs, label, value):
+    """把 label 的概率设为 value，其余选项按比例缩放，返回新的概率列表。"""
+    if label not in labels:
+        raise ValueError(f"找不到选项 {label}")
+    i = labels.index(label)
+    rest = sum(p for j, p in enumerate(probs) if j != i)
+    out = []
+    for j, p in enumerate(probs):
+        if j == i:
+            out.append(value)
+        elif rest > 0:
+            out.append(p * (1.0 - value) / rest)
+        else:
+            out.append((1.0 - value) / (len(probs) - 1))
+    return out
+
+
+def _set_dict_probs(task_dicts, probs):
+    """按 {(任务名, 标签): 概率} 修改 SCENES 风格的任务 dict（原地）。"""
+    found = set()
+    for tdata in task_dicts:
+        for (task_name, label), value in probs.items():
+            if tdata["name"] != task_name:
+                continue
+            labels = [opt["label"] for opt in tdata["options"]]
+            new = _rescale(labels, [opt["prob"] for opt in tdata["options"]], label, value)
+            for opt, p in zip(tdata["options"], new):
+                opt["prob"] = p
+            found.add((task_name, label))
+    return found
+
+
+def _set_object_probs(tasks, probs):
+    """按 {(任务名, 标签): 概率} 修改 demo_1 / demo_4 的 Task 对象（原地，并重建别名表）。"""
+    found = set()
+    for task in tasks:
+        for (task_name, label), value in probs.items():
+            if task.description != task_name:
+                continue
+            labels = list(task.options)
+            new = _rescale(labels, [task.options[k]["prob"] for k in labels], label, value)
+            for k, p in zip(labels, new):
+                task.options[k]["prob"] = p
+            task.refresh_alias()
+            found.add((task_name, label))
+    return found
+
+
+def build_models(demo, params):
+    """
+    按参数 dict 编译某个 demo 的模型（不修改模块里的 SCENES / 全局参数），返回 [(权重, 模型), ...]。
+    demo1 每天先随机决定场景三的额外任务，对应 4 个等概率的场景变体（各自分配压力），
+    一天的结果是这 4 个模型的混合；其余 demo 只有一个权重为 1 的模型。
+    """
+    import compiler
+    plain, probs = _split_params(demo, params)
+    found = set()
+    if demo == "demo1":
+        import demo_1
+        desired_std = plain.get("desired_std", demo_1.DESIRED_STD)
+        models = []
+        for variant in demo_1.EXTRA_VARIANTS:
+            scenes = demo_1.build_scenes(desired_std, variant)
+            found |= _set_object_probs([t for sc in scenes[:4] for t in sc.tasks] + [scenes[4].tasks[0]], probs)
+            demo_1.assign_stress(scenes, desired_std)   # 压力取决于选项概率，改概率后重新分配
+            models.append((1.0 / len(demo_1.EXTRA_VARIANTS), demo_1.compile_model(scenes, params=plain)))
+    elif demo == "demo2":
+        import demo_2
+        scenes = copy.deepcopy(demo_2.SCENES)
+        reply = {"name": "加班短信回复", "options": copy.deepcopy(demo_2.REPLY_OPTIONS)}
+        found = _set_dict_probs([t for sc in scenes for t in sc["tasks"]] + [reply], probs)
+        overtime = demo_2.overtime_params()
+        overtime.update(plain)
+        models = [(1.0, compiler.compile_scenes(scenes, reply_options=reply["options"], params=overtime))]
+    elif demo == "demo3":
+        # 按 demo_3 的精确矩校准（真实场景五）分配压力，再用扫描的场景五参数编译：
+        # 改 relieve_prob 等参数时压力不重新校准，结果反映参数本身的影响
+        import calibrate
+        import demo_3
+        scenes = copy.deepcopy(demo_3.base_scenes())
+        reply = {"name": "加班短信回复", "options": copy.deepcopy(demo_3.REPLY_OPTIONS)}
+        found = _set_dict_probs([t for sc in scenes for t in sc["tasks"]] + [reply], probs)
+        result = calibrate.calibrate_scenes(scenes, reply["options"], demo_3.overtime_params(),
+                                            desired_std=plain.get("desired_std", demo_3.DESIRED_STD),
+                                            overtime_var_ratio=demo_3.overtime_var_ratio())
+        overtime = dict(result["params"])
+        overtime.update((k, v) for k, v in plain.items() if k != "desired_std")
+        models = [(1.0, compiler.compile_scenes(result["scenes"], reply_options=result["reply_options"],
+                                                params=overtime))]
+    else:
+        import demo_4
+        scenes = demo_4.build_game_scenes()
+        found = _set_object_probs([t for sc in scenes[:-1] for t in sc.tasks] + [scenes[-1].reply_task], probs)
+        models = [(1.0, demo_4.compile_model(scenes=scenes, params=plain))]
+    missing = set(probs) - found
+    if missing:
+        raise ValueError(f"{demo} 中找不到这些任务 / 选项: {sorted(missing)}")
+    return models
+
+
+def build_model(demo, params):
+    """只有一个模型的 demo（demo2 / demo3 / demo4）：按参数 dict 编译模型，见 build_models。"""
+    models = build_models(demo, params)
+    if len(models) != 1:
+        raise ValueError(f"{demo} 的一天由 {len(models)} 个场景变体混合而成，请用 build_models")
+    return models[0][1]
+
+
+def _allocate(rounds, weights):
+    """把 rounds 天按权重分给各模型（最大余数法，总数恰为 rounds）。"""
+    exact = [rounds * w / sum(weights) for w in weights]
+    counts = [int(math.floor(x)) for x in exact]
+    order = sorted(range(len(weights)), key=lambda j: counts[j] - exact[j])
+    for j in order[:rounds - sum(counts)]:
+        counts[j] += 1
+    return counts
+
+
+def _cache_key(demo, models, rounds, seed, chunk_size):
+    """缓存键；seed 为 None 时每次结果都不同，不缓存（返回 None）。"""
+    if seed is None:
+        return None
+    raw = json.dumps([demo, [(w, model_fingerprint(m)) for w, m in models], rounds, seed, chunk_size])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _load_cached(key, cache_dir):
+    if key in _RESULT_CACHE:
+        return _RESULT_CACHE[key]
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, f"{key}.json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                _RESULT_CACHE[key] = json.load(f)
+            return _RESULT_CACHE[key]
+    return None
+
+
+def _store(key, result, cache_dir):
+    _RESULT_CACHE[key] = result
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(os.path.join(cache_dir, f"{key}.json"), "w", encoding="utf-8") as f:
+            json.dump(result, f)
+
+
+def clear_cache():
+    """清空内存中的结果缓存（磁盘缓存需手动删除目录）。"""
+    _RESULT_CACHE.clear()
+
+
+def _summarize(stats):
+    return {
+        "count": stats.count,
+        "mean": stats.mean,
+        "std": stats.std,
+        "p_bad": stats.p_bad,
+        "in_band_ratio": stats.in_band_ratio,
+    }
+
+
+def run_sweep(demo, param_sets, rounds=100000, seed=SWEEP_SEED, chunk_size=batch_engine.CHUNK_SIZE,
+              cache_dir=None):
+    """
+    评估一组参数配置，返回结果表：每个配置一行 dict，
+    包含 params、count、mean、std、p_bad、in_band_ratio、key（缓存键）、cached（是否命中缓存）。
+      - demo: "demo1" / "demo2" / "demo3" / "demo4"
+      - param_sets: 参数 dict 的列表（可用 grid() 生成）
+      - seed: 所有配置共用的随机种子（公共随机数），缓存也依赖它；为 None 时不使用缓存（key 为 None）
+      - cache_dir: 磁盘缓存目录；为 None 时只缓存在内存
+    demo1 的 rounds 天按权重分给 4 个场景变体（分层抽样），各变体的统计合并为一行。
+    """
+    configs = [build_models(demo, params) for params in param_sets]
+    keys = [_cache_key(demo, models, rounds, seed, chunk_size) for models in configs]
+
+    # 未命中缓存的配置按 (模型形状, 天数) 分组，每组共用同一份随机数
+    results = {}
+    cached = set()
+    groups = {}
+    parts = {}
+    for c, (key, models) in enumerate(zip(keys, configs)):
+        hit = None if key is None else _load_cached(key, cache_dir)
+        if hit is not None:
+            results[c] = hit
+            cached.add(c)
+            continue
+        counts = _allocate(rounds, [w for w, _ in models])
+        parts[c] = [OnlineStats(**DEMO_STATS[demo]) for _ in models]
+        for j, ((_, model), n) in enumerate(zip(models, counts)):
+            if n > 0:
+                groups.setdefault((batch_engine.draw_shape(model), n), []).append((c, j, model))
+
+    for (_, n_days), members in groups.items():
+        rng = np.random.default_rng(seed)
+        done = 0
+        while done < n_days:
+            n = min(chunk_size, n_days - done)
+            draws = batch_engine.draw_uniforms(members[0][2], n, rng)
+            for c, j, model in members:
+                parts[c][j].update(batch_engine.evaluate_draws(model, draws))
+            done += n
+
+    for c, stats in parts.items():
+        total = stats[0]
+        for part in stats[1:]:
+            total.merge(part)
+        results[c] = _summarize(total)
+        if keys[c] is not None:
+            _store(keys[c], results[c], cache_dir)
+
+    rows = []
+    for c, (params, key) in enumerate(zip(param_sets, keys)):
+        row = {"params": dict(params)}
+        row.update(results[c])
+        row["key"] = key
+        row["cached"] = c in cached
+        rows.append(row)
+    return rows
+
+
+def format_table(rows):
+    """把 run_sweep 的结果格式化为文本表格。"""
+    names = []
+    for row in rows:
+        for k in row["params"]:
+            if k not in names:
+                names.append(k)
+    header = names + ["mean", "std", "p_bad", "in_band"]
+    lines = ["\t".join(header)]
+    for row in rows:
+        cells = [str(row["params"].get(k, "")) for k in names]
+        cells += [f"{row['mean']:.3f}", f"{row['std']:.3f}", f"{row['p_bad']:.4f}", f"{row['in_band_ratio']:.4f}"]
+        lines.append("\t".join(cells))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    table = run_sweep("demo2", grid(relieve_prob=[0.5, 0.7, 0.9], sms_party_factor=[1.0, 1.2, 1.5]))
+    print(format_table(table))
@@ -0,0 +1,44 @@
+import math
+
+import numpy as np
+
+import batch_engine
+import demo_2
+import demo_3
+import demo_4
+import engines
+
+# 批量引擎与逐日循环使用不同的随机数，只能按统计量比较：均值差在 5 个标准误以内，标准差相差不超过 3%。
+
+
+def _assert_agree(loop, batch):
+    se = math.hypot(loop.std() / math.sqrt(len(loop)), batch.std() / math.sqrt(len(batch)))
+    assert abs(loop.mean() - batch.mean()) < 5 * se
+    assert abs(loop.std() - batch.std()) < 0.03 * batch.std()
+
+
+def test_demo2_batch_matches_day_loop():
+    loop = engines.run_engine("demo2", 20000, np.random.SeedSequence(1))
+    batch = batch_engine.simulate_days(demo_2.compile_model(), 200000, seed=1)
+    _assert_agree(loop, batch)
+
+
+def test_demo3_batch_matches_day_loop():
+    model = demo_3.build_model()
+    loop = engines.run_engine("demo3", 20000, np.random.SeedSequence(2), calibrated=True)
+    batch = batch_engine.simulate_days(model, 200000, seed=2)
+    _assert_agree(loop, batch)
+
+
+def test_demo4_batch_matches_day_loop():
+    # demo_4 限时 10 小时：检验时间预算截断在两种引擎中一致
+    loop = engines.run_engine("demo4", 10000, np.random.SeedSequence(3))
+    batch = batch_engine.simulate_days(demo_4.compile_model(), 200000, seed=3)
+    _assert_agree(loop, batch)
+
+
+def test_simulate_days_is_deterministic():
+    model = demo_2.compile_model()
+    a = batch_engine.simulate_days(model, 50000, seed=4, chunk_size=20000)
+    b = batch_engine.simulate_days(model, 50000, seed=4, chunk_size=20000)
+    assert np.array_equal(a, b)
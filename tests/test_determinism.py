@@ -0,0 +1,58 @@
+import random
+
+import numpy as np
+
+import demo_2
+import demo_4
+import engines
+import parallel
+import strategies
+
+# 固定种子下的可复现性：多进程分片、公共随机数的策略评估与 workers 无关，
+# 进程内运行的逐日引擎不改变全局 random 的状态。
+
+
+def _shard_results(engine, rounds, workers, seed):
+    """按 parallel 的分片规则在当前进程内逐片运行（每片不超过 SHARD_CHUNK 天，只 spawn 一个子种子）。"""
+    return np.concatenate([engines.run_engine(engine, n, ss.spawn(1)[0])
+                           for n, ss in zip(parallel.split_rounds(rounds, workers),
+                                            np.random.SeedSequence(seed).spawn(workers))])
+
+
+def test_run_parallel_matches_in_process_shards():
+    result = parallel.run_parallel("batch2", 30000, workers=2, seed=3)
+    assert np.array_equal(result, _shard_results("batch2", 30000, 2, 3))
+    assert np.array_equal(result, parallel.run_parallel("batch2", 30000, workers=2, seed=3))
+
+
+def test_day_loop_in_worker_matches_in_process():
+    # workers=2 时在子进程中运行逐日循环（各自重新播种全局 random），结果与当前进程内逐片运行一致
+    result = parallel.run_parallel("demo2", 4000, workers=2, seed=5)
+    assert np.array_equal(result, _shard_results("demo2", 4000, 2, 5))
+    assert np.array_equal(parallel.run_parallel("demo2", 4000, workers=1, seed=5), _shard_results("demo2", 4000, 1, 5))
+
+
+def test_engine_restores_global_random():
+    random.seed(9)
+    expected = random.random()
+    random.seed(9)
+    engines.run_engine("demo2", 500, np.random.SeedSequence(1))
+    assert random.random() == expected
+
+
+def test_strategies_independent_of_workers():
+    model = demo_4.compile_model()
+    chosen = strategies.default_strategies(model)[:6]
+    kwargs = dict(rounds=20000, seed=21, chunk_size=7000)
+    one = strategies.evaluate_strategies(model, chosen, workers=1, **kwargs)["rows"]
+    two = strategies.evaluate_strategies(model, chosen, workers=2, **kwargs)["rows"]
+    assert one == two
+
+
+def test_strategies_share_random_numbers():
+    # 公共随机数：按概率抽选的策略与批量引擎缺省行为逐位一致
+    model = demo_2.compile_model()
+    rng = np.random.default_rng(1)
+    draws = strategies.batch_engine.draw_uniforms(model, 10000, rng)
+    stress, _, _ = strategies.evaluate_strategy(model, strategies.ProbStrategy(), draws)
+    assert np.array_equal(stress, strategies.batch_engine.evaluate_draws(model, draws))
@@ -0,0 +1,52 @@
+import math
+
+import batch_engine
+import demo_2
+import demo_3
+import demo_4
+import exact_solver
+
+# 精确分布与蒙特卡洛（批量引擎，固定种子）比较：均值差在 5 个标准误以内，
+# 标准差相差不超过 2%，坏结局概率差在 5 个标准误以内。
+
+ROUNDS = 400000
+
+
+def _assert_matches(exact, sample, threshold, bad_inclusive=False):
+    n = len(sample)
+    assert abs(sample.mean() - exact["mean"]) < 5 * exact["std"] / math.sqrt(n)
+    assert abs(sample.std() - exact["std"]) < 0.02 * exact["std"]
+    p = exact["p_bad"]
+    p_hat = ((sample >= threshold) if bad_inclusive else (sample > threshold)).mean()
+    assert abs(p_hat - p) < 5 * math.sqrt(max(p * (1 - p), 1e-6) / n)
+    assert abs(sum(exact["probs"]) - 1.0) < 1e-9
+
+
+def test_demo2_exact_matches_monte_carlo():
+    model = demo_2.compile_model()
+    exact = exact_solver.solve_day(model, threshold=90)
+    _assert_matches(exact, batch_engine.simulate_days(model, ROUNDS, seed=11), 90)
+
+
+def test_demo3_calibrated_exact_moments():
+    model = demo_3.build_model()
+    exact = exact_solver.solve_day(model, threshold=30)
+    assert abs(exact["mean"]) < 1e-9
+    assert abs(exact["std"] - demo_3.DESIRED_STD) < 1e-6
+    _assert_matches(exact, batch_engine.simulate_days(model, ROUNDS, seed=12), 30)
+
+
+def test_demo4_timed_exact_matches_monte_carlo():
+    # 时间预算会截断任务时，solve_day 改用 (剩余时间, 压力) 的联合分布
+    model = demo_4.compile_model(current_time=3)
+    exact = exact_solver.solve_day(model, threshold=100, bad_inclusive=True)
+    assert exact["p_truncated"] > 0
+    _assert_matches(exact, batch_engine.simulate_days(model, ROUNDS, seed=13), 100, bad_inclusive=True)
+
+
+def test_bad_inclusive_counts_threshold():
+    model = demo_4.compile_model()
+    strict = exact_solver.solve_day(model, threshold=100)
+    inclusive = exact_solver.solve_day(model, threshold=100, bad_inclusive=True)
+    at_threshold = sum(q for v, q in zip(strict["values"], strict["probs"]) if v == 100)
+    assert math.isclose(inclusive["p_bad"] - strict["p_bad"], at_threshold, abs_tol=1e-12)
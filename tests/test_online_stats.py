@@ -0,0 +1,26 @@
+import json
+
+import numpy as np
+import pytest
+
+import online_stats
+
+
+def test_empty_summary_is_valid_json():
+    summary = online_stats.OnlineStats().summary()
+    assert summary["count"] == 0
+    assert summary["min"] is None and summary["max"] is None
+    json.loads(json.dumps(summary, allow_nan=False))
+
+
+def test_merge_matches_single_update():
+    values = np.random.default_rng(3).normal(100, 25, 10000)
+    whole = online_stats.OnlineStats()
+    whole.update(values)
+    parts = online_stats.OnlineStats()
+    for chunk in np.array_split(values, 7):
+        part = online_stats.OnlineStats()
+        part.update(chunk)
+        parts.merge(part)
+    for key, value in whole.summary().items():
+        assert parts.summary()[key] == pytest.approx(value)
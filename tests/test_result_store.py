@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pytest
+
+import demo_2
+import result_store
+
+ROUNDS = 5000
+CHUNK = 1000
+
+
+class _Interrupt(Exception):
+    pass
+
+
+def _interrupt_after(days):
+    def progress(done, rounds):
+        if done >= days:
+            raise _Interrupt
+    return progress
+
+
+def _chunk_bytes(path):
+    manifest = result_store.ResultStore(path).manifest
+    out = []
+    for c in manifest["chunks"]:
+        with open(os.path.join(path, c["file"]), "rb") as f:
+            out.append(f.read())
+    return out
+
+
+def test_resume_is_bit_identical(tmp_path):
+    model = demo_2.compile_model()
+    full = str(tmp_path / "full")
+    result_store.run_to_store(model, full, ROUNDS, seed=7, chunk_size=CHUNK)
+
+    resumed = str(tmp_path / "resumed")
+    with pytest.raises(_Interrupt):
+        result_store.run_to_store(model, resumed, ROUNDS, seed=7, chunk_size=CHUNK, progress=_interrupt_after(2 * CHUNK))
+    assert not result_store.ResultStore(resumed).complete
+    # 续跑时不给 seed：以 manifest 中保存的种子熵为准
+    result_store.run_to_store(model, resumed, ROUNDS, chunk_size=CHUNK)
+
+    store = result_store.ResultStore(resumed)
+    assert store.complete and len(store) == ROUNDS
+    assert _chunk_bytes(resumed) == _chunk_bytes(full)
+    assert np.array_equal(store.column("stress"), result_store.ResultStore(full).column("stress"))
+
+
+def test_resume_rejects_different_seed(tmp_path):
+    model = demo_2.compile_model()
+    path = str(tmp_path / "run")
+    with pytest.raises(_Interrupt):
+        result_store.run_to_store(model, path, ROUNDS, seed=7, chunk_size=CHUNK, progress=_interrupt_after(CHUNK))
+    with pytest.raises(ValueError):
+        result_store.run_to_store(model, path, ROUNDS, seed=8, chunk_size=CHUNK)
+    result_store.run_to_store(model, path, ROUNDS, seed=7, chunk_size=CHUNK)
+    assert result_store.ResultStore(path).complete
+
+
+def test_stats_overrides_manifest_settings(tmp_path):
+    model = demo_2.compile_model()
+    path = str(tmp_path / "run")
+    result_store.run_to_store(model, path, ROUNDS, seed=7, chunk_size=CHUNK)
+    store = result_store.ResultStore(path)
+    stress = store.column("stress")
+    stats = store.stats(bad_threshold=80)
+    assert stats.count == ROUNDS
+    assert stats.summary()["p_bad"] == pytest.approx(np.mean(stress > 80))
@@ -0,0 +1,75 @@
+import sys
+
+# ========== 日志追踪：off / sampled / full ==========
+# 逐日循环原本每天都构建 log_lines 并全部打印。Tracer 决定哪些天需要日志：
+#   - TRACE_OFF:     不追踪，start_day() 返回 None，调用方据此跳过所有字符串格式化
+#   - TRACE_SAMPLED: 每 every 天追踪 1 天（第 0、every、2*every ... 天）
+#   - TRACE_FULL:    每天都追踪
+# 被追踪的日子沿用原来的日志文本格式；path 为 None 时输出到 stdout，
+# 否则通过带缓冲的文件写入。
+
+TRACE_OFF = "off"
+TRACE_SAMPLED = "sampled"
+TRACE_FULL = "full"
+TRACE_MODES = (TRACE_OFF, TRACE_SAMPLED, TRACE_FULL)
+
+BUFFER_SIZE = 1 << 20   # 写文件时的缓冲区大小（字节）
+
+
+class Tracer:
+    def __init__(self, mode=TRACE_FULL, every=1000, path=None, buffer_size=BUFFER_SIZE):
+        if mode not in TRACE_MODES:
+            raise ValueError(f"未知追踪模式: {mode}，可选: {', '.join(TRACE_MODES)}")
+        if every < 1:
+            raise ValueError("every 必须 >= 1")
+        self.mode = mode
+        self.every = every
+        self.path = path
+        self.day = 0
+        self._file = None
+        if path is not None and mode != TRACE_OFF:
+            self._file = open(path, "w", encoding="utf-8", buffering=buffer_size)
+
+    def start_day(self):
+        """
+        开始新的一天。本日需要追踪时返回一个空的 log_lines 列表，
+        否则返回 None（调用方应跳过日志格式化）。
+        """
+        day = self.day
+        self.day += 1
+        if self.mode == TRACE_FULL:
+            return []
+        if self.mode == TRACE_SAMPLED and day % self.every == 0:
+            return []
+        return None
+
+    def end_day(self, log_lines):
+        """输出本日日志；log_lines 为 None（本日未追踪）时什么也不做。"""
+        if log_lines is None:
+            return
+        text = "\n".join(log_lines) + "\n"
+        if self._file is not None:
+            self._file.write(text)
+        else:
+            sys.stdout.write(text)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def make_tracer(trace):
+    """
+    把 run_simulations_and_plot 的 trace 参数转换为 Tracer：
+    可以是 Tracer 实例、模式名（"off" / "sampled" / "full"），或 None（等同 "full"）。
+    """
+    if isinstance(trace, Tracer):
+        return trace
+    return Tracer(trace or TRACE_FULL)
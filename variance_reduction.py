@@ -0,0 +1,227 @@
+import itertools
+import math
+
+import numpy as np
+
+import batch_engine
+from compiler import FLAG_PARTY
+
+# ========== 方差缩减：用更少的模拟天数得到同样精度的均值 / 坏结局概率 ==========
+# 都在 compiler.CompiledModel 上、基于 batch_engine.draw_uniforms / evaluate_draws 实现：
+#   - naive: 普通蒙特卡洛（对照组）
+#   - antithetic: 对偶变量，每组随机数 u 同时使用 1-u（短信条数取对称值），按“对”取平均
+#   - stratified: 按离散分支分层——出现概率在 (0,1) 之间的任务是否出现（如场景三额外任务）、
+#     是否赴约（含 FLAG_PARTY 选项的任务选中哪一侧）、短信条数；各层概率可精确算出，
+#     按比例分配天数，层内条件抽样
+#   - control_variate: 控制变量，用每个任务（忽略时间预算）、回复任务的压力与短信条数，
+#     它们的期望可解析得到；回归系数由样本估计
+# 每个估计量都报告方差缩减因子 VRF =（普通蒙特卡洛同样天数的方差）/（该估计量的方差），
+# 即达到同样精度时普通蒙特卡洛需要的天数倍数。
+
+
+def _is_bad(values, bad_threshold, bad_inclusive):
+    return (values >= bad_threshold) if bad_inclusive else (values > bad_threshold)
+
+
+def _row(method, days, mean, var_mean, p_bad, var_p, naive_var, naive_var_p):
+    """汇总一行结果；naive_var* 为单天结果的方差（普通蒙特卡洛每天的方差）。"""
+    def vrf(naive_v, v):
+        if v > 0:
+            return naive_v / days / v
+        return math.inf if naive_v > 0 else math.nan   # 两者都为 0：结果恒定，因子无意义
+
+    return {
+        "method": method,
+        "days": days,
+        "mean": mean,
+        "mean_se": math.sqrt(var_mean),
+        "p_bad": p_bad,
+        "p_bad_se": math.sqrt(var_p),
+        "vrf_mean": vrf(naive_var, var_mean),
+        "vrf_p_bad": vrf(naive_var_p, var_p),
+    }
+
+
+def naive(model, n, rng, bad_threshold=100, bad_inclusive=False):
+    y = batch_engine.evaluate_draws(model, batch_engine.draw_uniforms(model, n, rng))
+    b = _is_bad(y, bad_threshold, bad_inclusive).astype(float)
+    return _row("naive", n, y.mean(), y.var(ddof=1) / n, b.mean(), b.var(ddof=1) / n,
+                y.var(ddof=1), b.var(ddof=1))
+
+
+# ---------- 对偶变量 ----------
+def antithetic_draws(model, draws):
+    """把一份随机数变为对偶的一份：所有均匀数 u -> 1-u，短信条数 c -> sms_min + sms_max - c。"""
+    anti = {"n": draws["n"], "appear": 1.0 - draws["appear"], "pick": 1.0 - draws["pick"]}
+    if "reply" in draws:
+        ot = model.overtime
+        anti["reply"] = 1.0 - draws["reply"]
+        anti["sms_count"] = ot.sms_min + ot.sms_max - draws["sms_count"]
+        anti["relieve"] = 1.0 - draws["relieve"]
+    return anti
+
+
+def antithetic(model, n, rng, bad_threshold=100, bad_inclusive=False):
+    """n 天 = n/2 对；估计量方差按“对的平均值”计算。"""
+    m = max(2, n // 2)
+    draws = batch_engine.draw_uniforms(model, m, rng)
+    y1 = batch_engine.evaluate_draws(model, draws)
+    y2 = batch_engine.evaluate_draws(model, antithetic_draws(model, draws))
+    pair = (y1 + y2) / 2
+    b1 = _is_bad(y1, bad_threshold, bad_inclusive).astype(float)
+    b2 = _is_bad(y2, bad_threshold, bad_inclusive).astype(float)
+    pair_b = (b1 + b2) / 2
+    both = np.concatenate([y1, y2])
+    both_b = np.concatenate([b1, b2])
+    return _row("antithetic", 2 * m, pair.mean(), pair.var(ddof=1) / m, pair_b.mean(), pair_b.var(ddof=1) / m,
+                both.var(ddof=1), both_b.var(ddof=1))
+
+
+# ---------- 分层抽样 ----------
+def strata_variables(model):
+    """
+    离散分支变量列表，每项 (种类, 下标, [(取值, 概率), ...])：
+      ("appear", i, ...)：第 i 个任务是否出现（0 < appear < 1）
+      ("party", i, ...)：第 i 个任务是否选中含 FLAG_PARTY 的选项
+      ("sms", None, ...)：短信条数
+    """
+    variables = []
+    for i, task in enumerate(model.tasks):
+        if 0.0 < task.appear < 1.0:
+            variables.append(("appear", i, [(True, task.appear), (False, 1.0 - task.appear)]))
+    for i, task in enumerate(model.tasks):
+        p_party = sum(p for p, f in zip(task.probs, task.flags) if f & FLAG_PARTY)
+        if 0.0 < p_party < 1.0:
+            variables.append(("party", i, [(True, p_party), (False, 1.0 - p_party)]))
+    ot = model.overtime
+    if ot is not None and ot.sms_max > ot.sms_min:
+        p = 1.0 / (ot.sms_max - ot.sms_min + 1)
+        variables.append(("sms", None, [(c, p) for c in range(ot.sms_min, ot.sms_max + 1)]))
+    return variables
+
+
+def _conditional_pick(model, i, in_set, n, rng):
+    """第 i 个任务的选项均匀数，条件为选中的选项属于（或不属于）含 FLAG_PARTY 的那些选项。"""
+    task = model.tasks[i]
+    probs = np.array(task.probs)
+    lo = np.concatenate([[0.0], np.cumsum(probs)[:-1]])
+    mask = np.array([bool(f & FLAG_PARTY) == in_set for f in task.flags])
+    weights = np.where(mask, probs, 0.0)
+    cum = np.cumsum(weights) / weights.sum()
+    k = np.minimum(np.searchsorted(cum, rng.random(n), side="right"), len(cum) - 1)
+    return lo[k] + rng.random(n) * probs[k]
+
+
+def _stratum_draws(model, stratum, n, rng):
+    draws = batch_engine.draw_uniforms(model, n, rng)
+    for (kind, i, _), value in stratum:
+        if kind == "appear":
+            a = model.tasks[i].appear
+            u = rng.random(n)
+            draws["appear"][i] = u * a if value else a + u * (1.0 - a)
+        elif kind == "party":
+            draws["pick"][i] = _conditional_pick(model, i, value, n, rng)
+        else:
+            draws["sms_count"] = np.full(n, value)
+    return draws
+
+
+def stratified(model, n, rng, bad_threshold=100, bad_inclusive=False):
+    """按 strata_variables 的全部组合分层，按层概率比例分配天数（每层至少 2 天）。"""
+    variables = strata_variables(model)
+    mean = var_mean = p_bad = var_p = 0.0
+    m1 = m2 = q1 = 0.0   # 用于估计单天结果的总体方差
+    days = 0
+    for combo in itertools.product(*(values for _, _, values in variables)):
+        w = math.prod(p for _, p in combo)
+        if w <= 0:
+            continue
+        stratum = [(var, value) for var, (value, _) in zip(variables, combo)]
+        n_h = max(2, int(round(n * w)))
+        y = batch_engine.evaluate_draws(model, _stratum_draws(model, stratum, n_h, rng))
+        b = _is_bad(y, bad_threshold, bad_inclusive).astype(float)
+        mean += w * y.mean()
+        var_mean += w * w * y.var(ddof=1) / n_h
+        p_bad += w * b.mean()
+        var_p += w * w * b.var(ddof=1) / n_h
+        m1 += w * y.mean()
+        m2 += w * (y.var(ddof=1) + y.mean() ** 2)
+        q1 += w * b.mean()
+        days += n_h
+    return _row("stratified", days, mean, var_mean, p_bad, var_p, m2 - m1 * m1, q1 * (1 - q1))
+
+
+# ---------- 控制变量 ----------
+def control_values(model, draws):
+    """
+    控制变量矩阵（形状 (n, 控制变量数)）与它们的精确期望：
+    每个任务的压力（只看出现 / 选项抽取，不考虑时间预算）、回复任务的压力、短信条数。
+    """
+    cols, means = [], []
+    for i, task in enumerate(model.tasks):
+        appear = draws["appear"][i] < task.appear
+        k = batch_engine._pick_task(model, i, draws["pick"][i])
+        cols.append(np.where(appear, model.stress[k], 0.0))
+        means.append(task.appear * sum(p * s for p, s in zip(task.probs, task.stress)))
+    ot = model.overtime
+    if ot is not None:
+        k = batch_engine.pick_options(draws["reply"], ot.reply.probs)
+        cols.append(np.asarray(ot.reply.stress, dtype=float)[k])
+        means.append(sum(p * s for p, s in zip(ot.reply.probs, ot.reply.stress)))
+        cols.append(draws["sms_count"].astype(float))
+        means.append((ot.sms_min + ot.sms_max) / 2)
+    c = np.column_stack(cols)
+    keep = c.std(axis=0) > 0   # 去掉恒定不变的列（如只有一个选项的任务）
+    return c[:, keep], np.asarray(means)[keep]
+
+
+def _cv_estimate(y, c, mu):
+    """多元控制变量：y - (c - mu)·β，β 由最小二乘估计；返回 (估计值, 估计量方差)。"""
+    n = len(y)
+    cc = c - c.mean(axis=0)
+    beta, *_ = np.linalg.lstsq(cc, y - y.mean(), rcond=None)
+    adjusted = y - (c - mu) @ beta
+    resid_var = ((y - y.mean()) - cc @ beta).var(ddof=c.shape[1] + 1)
+    return adjusted.mean(), resid_var / n
+
+
+def control_variate(model, n, rng, bad_threshold=100, bad_inclusive=False):
+    draws = batch_engine.draw_uniforms(model, n, rng)
+    y = batch_engine.evaluate_draws(model, draws)
+    b = _is_bad(y, bad_threshold, bad_inclusive).astype(float)
+    c, mu = control_values(model, draws)
+    mean, var_mean = _cv_estimate(y, c, mu)
+    p_bad, var_p = _cv_estimate(b, c, mu)
+    return _row("control_variate", n, mean, var_mean, p_bad, var_p, y.var(ddof=1), b.var(ddof=1))
+
+
+ESTIMATORS = {
+    "naive": naive,
+    "antithetic": antithetic,
+    "stratified": stratified,
+    "control_variate": control_variate,
+}
+
+
+def compare(model, n=100000, seed=None, bad_threshold=100, bad_inclusive=False, methods=None):
+    """用每种估计量各模拟约 n 天，返回结果行的列表（含方差缩减因子）。"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for name in methods or ESTIMATORS:
+        if name not in ESTIMATORS:
+            raise ValueError(f"未知估计量: {name}，可选: {', '.join(ESTIMATORS)}")
+        rows.append(ESTIMATORS[name](model, n, rng, bad_threshold, bad_inclusive))
+    return rows
+
+
+def format_table(rows):
+    lines = ["method\tdays\tmean±se\tVRF(mean)\tp_bad±se\tVRF(p_bad)"]
+    for r in rows:
+        lines.append(f"{r['method']}\t{r['days']}\t{r['mean']:.4f}±{r['mean_se']:.4f}\t{r['vrf_mean']:.2f}"
+                     f"\t{r['p_bad']:.5f}±{r['p_bad_se']:.5f}\t{r['vrf_p_bad']:.2f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import demo_2
+    print(format_table(compare(demo_2.compile_model(), n=200000, seed=0)))